@@ -0,0 +1,85 @@
+import json
+import os
+import zlib
+from time import sleep
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "test_data", "benchmark")
+# Used as template for every work OpenAlex returns
+WORK_PLACEHOLDER_ID = "W1000000001"
+WORK_PLACEHOLDER_DOI = "10.5555/benchmark.1"
+
+
+def load_fixture(name: str) -> Dict:
+    with open(os.path.join(FIXTURES_DIRECTORY, f"{name}.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+class ReplayAdapter(HTTPAdapter):
+    """This answers the requests of the bot from the fixtures in test_data/benchmark
+    instead of the network. Mount it on the session of the bot.
+
+    Every requested DOI exists in OpenAlex and none in Wikidata, so every row
+    of a benchmark CSV is prepared. Half of the referenced works are found
+    in Wikidata, authors and venues always are.
+    :param latency is slept per request in seconds to imitate the network"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.requests = 0
+        # The template is serialized once so answering is a string replace
+        self.work_template = json.dumps(load_fixture("work"))
+        self.cirrussearch_hit = json.dumps(load_fixture("cirrussearch_hit"))
+        self.cirrussearch_miss = json.dumps(load_fixture("cirrussearch_miss"))
+        self.wdqs_no_results = json.dumps(load_fixture("wdqs_no_results"))
+
+    @staticmethod
+    def __stable_number__(value: str) -> int:
+        return zlib.crc32(value.encode())
+
+    def __work__(self, openalex_id: str, doi: str) -> str:
+        return self.work_template.replace(WORK_PLACEHOLDER_ID, openalex_id).replace(WORK_PLACEHOLDER_DOI, doi)
+
+    def __openalex__(self, filter_: str) -> str:
+        key, values = filter_.split(":", 1)
+        works: List[str] = []
+        for value in values.split("|"):
+            if key == "doi":
+                works.append(self.__work__(f"W{self.__stable_number__(value)}", value))
+            elif key == "openalex_id":
+                works.append(self.__work__(value, f"10.5555/reference.{value.lower()}"))
+            else:
+                raise ValueError(f"Filter {key} is not replayed")
+        return '{"meta": {"count": %d}, "results": [%s]}' % (len(works), ", ".join(works))
+
+    def __cirrussearch__(self, query_string: str) -> str:
+        if query_string.startswith("10.5555/reference.") and self.__stable_number__(query_string) % 2 == 1:
+            return self.cirrussearch_miss
+        return self.cirrussearch_hit.replace('"Q100"', f'"Q{self.__stable_number__(query_string)}"')
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if self.latency > 0:
+            sleep(self.latency)
+        self.requests += 1
+        url = urlparse(request.url)
+        if url.netloc == "api.openalex.org":
+            body = self.__openalex__(parse_qs(url.query)["filter"][0])
+        elif url.path.endswith("/sparql"):
+            body = self.wdqs_no_results
+        elif url.path.endswith("/api.php"):
+            body = self.__cirrussearch__(parse_qs(request.body)["srsearch"][0])
+        else:
+            raise ValueError(f"No fixture for {request.url}")
+        response = Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = body.encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
@@ -0,0 +1,220 @@
+"""Offline benchmarks of the item preparation path.
+
+Run from the root of the repository with a config.py present:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --sizes 1000,100000 --latency-ms 20
+
+All HTTP requests are answered by ReplayAdapter from the fixtures in
+test_data/benchmark and nothing is uploaded, so no account or network is needed.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable, List
+
+from openalexapi import Work
+from pydantic import BaseModel
+from rich import print
+from rich.table import Table
+from wikibaseintegrator import WikibaseIntegrator
+
+import config
+from benchmarks.replay_adapter import ReplayAdapter, load_fixture
+from openalexbot import OpenAlexBot
+from openalexbot.slim_work import SlimWork
+
+# Every setting that would reach a service, a file or the keyboard
+OFFLINE_CONFIG = dict(
+    cache_enabled=False,
+    doi_index_path=None,
+    export_format=None,
+    journal_enabled=False,
+    metrics_json_path=None,
+    metrics_prometheus_path=None,
+    openalex_snapshot_path=None,
+    orcid_index_path=None,
+    press_enter_to_continue=False,
+    rate_limits={host: 1e9 for host in ("api.openalex.org", "query.wikidata.org", "www.wikidata.org")},
+    streaming_csv=False,
+    upload_enabled=False,
+    use_test_wikidata=False,
+    venue_index_path=None,
+)
+
+
+class BenchmarkBot(OpenAlexBot):
+    def __setup_wikibaseintegrator__(self):
+        # Preparing items does not need a login
+        self.wbi = WikibaseIntegrator()
+
+
+class Result(BaseModel):
+    name: str
+    operations: int
+    seconds: float
+    # Number of HTTP requests answered by the ReplayAdapter
+    requests: int
+
+
+class MemoryResult(BaseModel):
+    name: str
+    works: int
+    bytes_per_work: float
+    seconds: float
+
+
+def measure_works(name: str, count: int, function: Callable[[bytes], object]) -> MemoryResult:
+    """Keep count works parsed from the JSON of the fixture alive and measure what they allocated"""
+    raw = json.dumps(load_fixture("work")).encode()
+    tracemalloc.start()
+    start = perf_counter()
+    works = [function(raw) for _ in range(count)]
+    seconds = perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del works
+    return MemoryResult(name=name, works=count, bytes_per_work=allocated / count, seconds=seconds)
+
+
+def write_synthetic_csv(path: str, size: int):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["doi"])
+        for number in range(size):
+            writer.writerow([f"https://doi.org/10.5555/benchmark.{number}"])
+
+
+def new_bot(filename: str, latency: float) -> BenchmarkBot:
+    bot = BenchmarkBot(
+        email="benchmark@example.com",
+        filename=filename,
+        http_adapter=ReplayAdapter(latency=latency),
+    )
+    bot.__setup_wikibaseintegrator__()
+    return bot
+
+
+def benchmark_method(name: str, iterations: int, latency: float,
+                     function: Callable[[BenchmarkBot, Work], object]) -> Result:
+    bot = new_bot(filename="unused.csv", latency=latency)
+    work = SlimWork(load_fixture("work")) if config.slim_works else Work(**load_fixture("work"))
+    # Warm up imports and connection setup outside the measurement
+    function(bot, work)
+    bot.qid_memo.clear()
+    requests = bot.http_adapter.requests
+    start = perf_counter()
+    for _ in range(iterations):
+        function(bot, work)
+        # Every iteration pays for its lookups like a new work would
+        bot.qid_memo.clear()
+    return Result(
+        name=name,
+        operations=iterations,
+        seconds=perf_counter() - start,
+        requests=bot.http_adapter.requests - requests,
+    )
+
+
+def benchmark_start(size: int, pipeline: bool, latency: float, directory: str, show_stages: bool) -> Result:
+    filename = os.path.join(directory, f"{size}_dois.csv")
+    if not os.path.exists(filename):
+        write_synthetic_csv(filename, size)
+    config.pipeline_enabled = pipeline
+    bot = new_bot(filename=filename, latency=latency)
+    start = perf_counter()
+    # The bot prints a line per DOI
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot.start()
+    seconds = perf_counter() - start
+    if show_stages:
+        print(bot.metrics.summary_table())
+    mode = "pipeline" if pipeline else "serial"
+    return Result(
+        name=f"start() {mode} {size} DOIs",
+        operations=size,
+        seconds=seconds,
+        requests=bot.http_adapter.requests,
+    )
+
+
+def print_results(results: List[Result]):
+    table = Table(title="Benchmarks")
+    for column in ("Benchmark", "Operations", "Seconds", "Operations/s", "ms/operation", "Requests"):
+        table.add_column(column, justify="left" if column == "Benchmark" else "right")
+    for result in results:
+        table.add_row(
+            result.name,
+            str(result.operations),
+            f"{result.seconds:.2f}",
+            f"{result.operations / result.seconds:.1f}",
+            f"{result.seconds / result.operations * 1000:.2f}",
+            str(result.requests),
+        )
+    print(table)
+
+
+def print_memory_results(results: List[MemoryResult]):
+    table = Table(title="Memory per work")
+    for column in ("Class", "Works", "Bytes/work", "Seconds", "Works/s"):
+        table.add_column(column, justify="left" if column == "Class" else "right")
+    for result in results:
+        table.add_row(
+            result.name,
+            str(result.works),
+            f"{result.bytes_per_work:.0f}",
+            f"{result.seconds:.2f}",
+            f"{result.works / result.seconds:.1f}",
+        )
+    print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000",
+                        help="comma separated numbers of DOIs in the synthetic CSVs for start()")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="iterations of the benchmarks of single methods")
+    parser.add_argument("--works", type=int, default=10000,
+                        help="number of parsed works kept alive when comparing the memory of SlimWork and Work")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="simulated network latency per request")
+    parser.add_argument("--mode", choices=("serial", "pipeline", "both"), default="both",
+                        help="which import path start() is benchmarked with")
+    parser.add_argument("--show-stages", action="store_true",
+                        help="print the run summary of the bot after every start()")
+    arguments = parser.parse_args()
+    for key, value in OFFLINE_CONFIG.items():
+        setattr(config, key, value)
+    logging.getLogger().setLevel(logging.WARNING)
+    latency = arguments.latency_ms / 1000
+    results = [
+        benchmark_method("__prepare_new_item__", arguments.iterations, latency,
+                         lambda bot, work: bot.__prepare_new_item__(doi="10.5555/benchmark.1", work=work, wbi=bot.wbi)),
+        benchmark_method("__prepare_authors__", arguments.iterations, latency,
+                         lambda bot, work: bot.__prepare_authors__(work=work)),
+        benchmark_method("__prepare_cites_works__", arguments.iterations, latency,
+                         lambda bot, work: bot.__prepare_cites_works__(
+                             work=work, reference=bot.__prepare_reference_claim__(work=work))),
+    ]
+    modes = [False, True] if arguments.mode == "both" else [arguments.mode == "pipeline"]
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(size) for size in arguments.sizes.split(",")):
+            for pipeline in modes:
+                results.append(benchmark_start(size, pipeline, latency, directory, arguments.show_stages))
+    print_results(results)
+    print_memory_results([
+        measure_works("Work", arguments.works, lambda raw: Work(**json.loads(raw))),
+        measure_works("SlimWork", arguments.works, SlimWork.parse),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,131 @@ password = ""
 
 use_test_wikidata = True
 press_enter_to_continue = True
+# False only prepares the items, the journal records them as dry_run.
+# A resumed dry run skips them and a real run imports them
 upload_enabled = False
 loglevel = logging.INFO
-user_agent = "OpenAlexBot run by User:So9q"
\ No newline at end of file
+user_agent = "OpenAlexBot run by User:So9q"
+# OpenAlex accepts at most 50 values in an OR-filter
+openalex_batch_size = 50
+# Number of DOIs checked for existence in Wikidata per SPARQL query,
+# the missing ones are then fetched from OpenAlex in chunks of openalex_batch_size
+wikidata_resolver_batch_size = 200
+# The query service compares DOIs case-sensitively and only the upper and lowercase forms are asked for.
+# DOIs it does not find are searched with CirrusSearch, which ignores the case, so mixed-case DOIs
+# in Wikidata are not imported twice. False trusts the query service and saves a search per new DOI
+wikidata_resolver_cirrussearch_fallback = True
+
+# Persistent cache of CirrusSearch lookups, kept apart per Wikibase so
+# use_test_wikidata never reuses the answers of Wikidata
+cache_enabled = True
+cache_path = "lookup_cache.sqlite"
+# Time to live in seconds per key type
+cache_ttls = dict(
+    doi=30 * 86400,
+    issn_l=90 * 86400,
+    orcid=30 * 86400,
+    other=7 * 86400,
+)
+# Lookups without a match are retried sooner because the item might get created
+cache_negative_ttl = 86400
+cache_max_entries = 1000000
+# CirrusSearch answers remembered in memory during a run, the least recently used are forgotten first
+qid_memo_max_entries = 500000
+
+# Number of threads resolving the references of works, shared by all prepare workers
+reference_workers = 8
+# Maximum number of requests per second per host
+rate_limits = {
+    "api.openalex.org": 10,
+    "query.wikidata.org": 1,
+    "test.wikidata.org": 5,
+    "www.wikidata.org": 5,
+}
+# Maximum number of requests per second to hosts missing in rate_limits
+default_rate_limit = 1.0
+# Number of pooled connections per host, should be at least the number of threads,
+# that is the pipeline_workers plus reference_workers
+http_pool_size = 20
+# Retries of a request when the server is overloaded or throttles us
+max_retries = 8
+# See https://www.mediawiki.org/wiki/Manual:Maxlag_parameter
+maxlag = 5
+
+# Run the import as concurrent stages. Only used when press_enter_to_continue is False
+pipeline_enabled = True
+# Number of threads per stage
+pipeline_workers = dict(
+    resolve=1,
+    fetch=2,
+    prepare=4,
+    upload=1,
+)
+# Maximum number of pending inputs per stage
+pipeline_queue_size = 100
+
+# Stream the DOIs from the CSV instead of loading it with pandas.
+# Supports .gz and .zst files and "-" for stdin
+streaming_csv = False
+
+# Record the outcome of every DOI so an interrupted run can be resumed
+journal_enabled = True
+journal_path = "journal.sqlite"
+
+# Local index of ISSN-L and ISSN to QID, see the README. None disables it
+venue_index_path = None
+# Local index of ORCID to QID, see the README. None disables it
+orcid_index_path = None
+# Local index of DOI to QID, see the README. None disables it
+doi_index_path = None
+# An older index is ignored because too many new items would be missing
+doi_index_max_age_days = 7
+
+# Read works from a local copy of the OpenAlex snapshot instead of the API.
+# A file or a directory of JSON-lines, gzipped files need the indexed_gzip package. None uses the API
+openalex_snapshot_path = None
+# Offsets of the works in the snapshot, new and changed snapshot files are indexed at startup.
+# The seek points into gzipped files are kept in a directory next to it.
+openalex_snapshot_index_path = "openalex_snapshot_index.sqlite"
+
+# Write prepared items to a file instead of uploading them.
+# "ndjson" can be uploaded later with OpenAlexBot.upload_export(),
+# "quickstatements" is QuickStatements v1. None uploads directly
+export_format = None
+export_path = "items.ndjson"
+
+# A summary table of the run is always printed at the end.
+# These also write it for dashboards, None disables them
+metrics_json_path = None
+# Point this at the textfile collector directory of the node exporter
+metrics_prometheus_path = None
+
+# Language detection of the labels is seeded so a title always gets the same language
+language_detection_seed = 0
+# Processes detecting the languages of a chunk of works at once, the pool is kept for the whole run.
+# 1 detects them one by one while preparing the items
+language_detection_processes = 1
+
+# Add the missing claims to items that already exist in Wikidata instead of skipping them.
+# sync() always does
+update_existing_items = False
+
+# OpenAlexBot.sync() processes the works changed in OpenAlex since the last sync.
+# The date of the last sync and the works that failed in it are kept here
+sync_state_path = "sync_state.json"
+# Where the first sync starts e.g. "2022-03-01"
+sync_start_date = None
+# Limits the sync with more OpenAlex filters e.g. "concepts.id:C71924100" or "host_venue.id:V123"
+sync_filter = None
+
+# Import the references of the works that are missing in Wikidata too.
+# They are created before the works citing them so cites work can link to them
+citation_crawl_enabled = False
+# 1 imports the missing references, 2 also their missing references and so on
+citation_crawl_max_depth = 1
+# Maximum number of references added during the whole run
+citation_crawl_max_works = 10000
+
+# Keep only the fields the bot uses of every OpenAlex work in memory, parsed with orjson.
+# That takes roughly a quarter of the memory. False uses the full openalexapi.Work
+slim_works = True
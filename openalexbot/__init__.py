@@ -1,23 +1,48 @@
+import json
 import logging
-from datetime import datetime, timezone
-from typing import Set, Optional, List, Union
-from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Set, Optional, List, Union, Dict, Iterable, Iterator, Tuple
+from urllib.parse import unquote, urlparse
 
-import langdetect as langdetect  # type: ignore
 import pandas as pd  # type: ignore
-from openalexapi import OpenAlex, Work
+from openalexapi import Work
 from pandas import DataFrame, Series  # type: ignore
-from purl import URL  # type: ignore
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+from requests import Session
+from requests.adapters import HTTPAdapter
 from rich import print
 from wikibaseintegrator import WikibaseIntegrator, wbi_config, wbi_login, entities
 from wikibaseintegrator import datatypes
 from wikibaseintegrator.models import Claim
+from wikibaseintegrator.wbi_exceptions import MaxRetriesReachedException
 from wikibaseintegrator.wbi_helpers import mediawiki_api_call_helper
 
 import config
-from openalexbot.enums import StatedIn, Property
-from openalexbot.work_type_to_qid import WorkTypeToQid
+from openalexbot.citation_crawler import CitationCrawler
+from openalexbot.enums import Property, Outcome, ExportFormat
+from openalexbot.doi_index import DoiIndex
+from openalexbot.doi_reader import DoiReader
+from openalexbot.helpers import chunks, normalize_doi, openalex_id_without_prefix, unique_normalized_dois
+from openalexbot.import_pipeline import ImportPipeline, Stage
+from openalexbot.item_exporter import ItemExporter
+from openalexbot.item_updater import ItemUpdater
+from openalexbot.journal import Journal
+from openalexbot.language_detector import LanguageDetector
+from openalexbot.lookup_cache import LookupCache
+from openalexbot.lru_memo import MISSING, LruMemo
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+from openalexbot.openalex_snapshot import OpenAlexSnapshot
+from openalexbot.orcid_index import OrcidIndex
+from openalexbot.reference_builder import ReferenceBuilder
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+from openalexbot.run_metrics import RunMetrics
+from openalexbot.sync_state import SyncState
+from openalexbot.wikidata_doi_resolver import WikidataDoiResolver
+from openalexbot.venue_index import VenueIndex
+from openalexbot.work_type_to_qid import WorkTypeToQid, is_supported, work_type_of
 
 logging.basicConfig(level=config.loglevel)
 logger = logging.getLogger(__name__)
@@ -28,12 +53,48 @@ class OpenAlexBot(BaseModel):
     This class takes a CSV as input
     The column "query_string" is then processed row by row
     It supports both "naked" dois and with prefix.
+    The CSV can be compressed with gzip or zstd and "-" reads it from stdin
+    when streaming_csv is enabled in the config.
+    Instead of a CSV sync() processes the works changed in OpenAlex since the last sync.
     """
     dataframe: Optional[DataFrame]
     dois: Optional[Set[str]]
     email: EmailStr
-    filename: str
+    filename: Optional[str]
     doi_series: Optional[Series]
+    doi_index: Optional[DoiIndex]
+    doi_index_checked: bool = False
+    # Claims of the existing items being updated by DOI, see __fetch_works__
+    existing_claims: Dict[str, Dict[str, List[Dict]]] = {}
+    # QIDs of the existing items being updated by DOI, see __skip_existing_dois__
+    existing_qids: Dict[str, str] = {}
+    exporter: Optional[ItemExporter]
+    fetcher: Optional[Union[OpenAlexBatchFetcher, OpenAlexSnapshot]]
+    journal: Optional[Journal]
+    language_detector: Optional[LanguageDetector]
+    lookup_cache: Optional[LookupCache]
+    # Threads of the CirrusSearch lookups shared by all prepare workers, see __search_dois__
+    lookup_executor: Optional[ThreadPoolExecutor]
+    metrics: RunMetrics = Field(default_factory=RunMetrics)
+    reference_builder: ReferenceBuilder = Field(default_factory=ReferenceBuilder)
+    scheduler: Optional[RequestScheduler]
+    http_adapter: Optional[HTTPAdapter]
+    item_updater: Optional[ItemUpdater]
+    orcid_index: Optional[OrcidIndex]
+    session: Optional[Session]
+    venue_index: Optional[VenueIndex]
+    wbi: Optional[WikibaseIntegrator]
+    # Works paged through by sync() waiting to be processed by DOI
+    prefetched_works: Dict[str, Work] = {}
+    # Referenced works fetched by the citation crawl by OpenAlex ID without prefix,
+    # kept until the works of the crawled chunk are prepared
+    crawled_works: Dict[str, Work] = {}
+    # DOIs that failed in this run and did not succeed later, see sync()
+    failed_dois: Set[str] = set()
+    # Overrides update_existing_items of the config for this bot, see sync()
+    update_existing_items: Optional[bool]
+    # query string -> QID or None, see __resolve_qid__
+    qid_memo: LruMemo = Field(default_factory=lambda: LruMemo(max_entries=config.qid_memo_max_entries))
 
     def __drop_empty_values__(self):
         self.dataframe = self.dataframe.dropna()
@@ -62,26 +123,20 @@ class OpenAlexBot(BaseModel):
     def __found_using_cirrussearch__(self, doi: str) -> bool:
         if doi is None:
             raise ValueError("Did not get what we need")
-        result = self.__call_cirrussearch_api__(query_string=doi)
-        # logger.info(f"result from CirrusSearch: {result}")
-        if config.loglevel == logging.DEBUG:
-            print(result)
-        if "query" in result:
-            query = result["query"]
-            if "search" in query:
-                search = query["search"]
-                if len(search) > 0:
-                    # Found 1 match!
-                    # qid = search[0]["title"]
-                    return True
-                    # exit()
-                else:
-                    return False
+        return self.__resolve_qid__(query_string=doi) is not None
 
-    def __call_cirrussearch_api__(self, query_string: str) -> dict:
+    def __call_cirrussearch_api__(self, query_string: str, purpose: str = "doi") -> dict:
         """This calls the cirrussearch API.
         :param query_string can be a doi or use special filters like "haswbstatement:P31=QID"
+        :param purpose names the lookup in the run metrics e.g. "orcid"
         """
+        cache = self.__get_lookup_cache__()
+        # The answers of Wikidata and test.wikidata.org are kept apart
+        wikibase = urlparse(wbi_config.config["MEDIAWIKI_API_URL"]).netloc
+        if cache is not None:
+            result = cache.get(query_string, wikibase=wikibase)
+            if result is not None:
+                return result
         params = dict(
             # format="json",
             action="query",
@@ -90,35 +145,203 @@ class OpenAlexBot(BaseModel):
             srlimit=1,
             srsearch=query_string
         )
-        return mediawiki_api_call_helper(
-            data=params,
-            allow_anonymous=True
-        )
+        with self.metrics.measure(f"cirrussearch_{purpose}"):
+            result = self.__get_scheduler__().request(
+                "POST",
+                wbi_config.config["MEDIAWIKI_API_URL"],
+                mediawiki=True,
+                data=params,
+                headers={"User-Agent": config.user_agent},
+            ).json()
+        if "error" in result:
+            raise ValueError(f"Got error from the MediaWiki API: {result['error']}")
+        if cache is not None and "query" in result:
+            cache.set(
+                query_string,
+                wikibase=wikibase,
+                result=result,
+                negative=len(result["query"].get("search", [])) == 0
+            )
+        return result
+
+    def __get_fetcher__(self) -> Union[OpenAlexBatchFetcher, OpenAlexSnapshot]:
+        if self.fetcher is None and config.openalex_snapshot_path is not None:
+            self.fetcher = OpenAlexSnapshot(
+                path=config.openalex_snapshot_path,
+                index_path=config.openalex_snapshot_index_path,
+            )
+            self.fetcher.build_index()
+        elif self.fetcher is None:
+            self.fetcher = OpenAlexBatchFetcher(
+                email=self.email,
+                chunk_size=config.openalex_batch_size,
+                scheduler=self.__get_scheduler__(),
+            )
+        return self.fetcher
+
+    def __get_scheduler__(self) -> RequestScheduler:
+        if self.scheduler is None:
+            self.scheduler = RequestScheduler(
+                rate_limiter=RateLimiter(rates=config.rate_limits, default_rate=config.default_rate_limit),
+                session=self.__get_session__(),
+                max_retries=config.max_retries,
+                maxlag=config.maxlag,
+                metrics=self.metrics,
+            )
+        return self.scheduler
+
+    def __get_session__(self) -> Session:
+        """The session is shared by all outbound requests of the run
+        so connections are pooled and kept alive"""
+        if self.session is None:
+            self.session = Session()
+            self.session.headers.update({"User-Agent": config.user_agent})
+            adapter = self.__get_http_adapter__()
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        return self.session
+
+    def __get_http_adapter__(self) -> HTTPAdapter:
+        if self.http_adapter is None:
+            # Retries are handled by the scheduler
+            self.http_adapter = HTTPAdapter(
+                pool_connections=config.http_pool_size,
+                pool_maxsize=config.http_pool_size,
+                max_retries=0,
+            )
+        return self.http_adapter
+
+    def __get_venue_index__(self) -> Optional[VenueIndex]:
+        if config.venue_index_path is not None and self.venue_index is None:
+            self.venue_index = VenueIndex(path=config.venue_index_path)
+        return self.venue_index
+
+    def __get_doi_index__(self) -> Optional[DoiIndex]:
+        """Returns the index unless it is disabled or too old to be trusted"""
+        if config.doi_index_path is not None and not self.doi_index_checked:
+            self.doi_index_checked = True
+            doi_index = DoiIndex(path=config.doi_index_path)
+            if doi_index.is_stale(max_age=timedelta(days=config.doi_index_max_age_days)):
+                logger.warning(f"The DOI index {config.doi_index_path} is stale, not using it")
+                doi_index.close()
+            else:
+                self.doi_index = doi_index
+        return self.doi_index
+
+    def __get_orcid_index__(self) -> Optional[OrcidIndex]:
+        if config.orcid_index_path is not None and self.orcid_index is None:
+            self.orcid_index = OrcidIndex(path=config.orcid_index_path)
+        return self.orcid_index
+
+    def __get_exporter__(self) -> Optional[ItemExporter]:
+        if config.export_format is not None and self.exporter is None:
+            self.exporter = ItemExporter(
+                path=config.export_path,
+                format=ExportFormat(config.export_format),
+            )
+        return self.exporter
+
+    def __get_item_updater__(self) -> ItemUpdater:
+        if self.item_updater is None:
+            self.item_updater = ItemUpdater(
+                mediawiki_api_url=wbi_config.config["MEDIAWIKI_API_URL"],
+                scheduler=self.__get_scheduler__(),
+            )
+        return self.item_updater
+
+    def __get_journal__(self) -> Optional[Journal]:
+        if config.journal_enabled and self.journal is None:
+            self.journal = Journal(path=config.journal_path, dry_run=self.dry_run())
+        return self.journal
+
+    def __updates_existing_items__(self) -> bool:
+        if self.update_existing_items is not None:
+            return self.update_existing_items
+        return config.update_existing_items
+
+    @staticmethod
+    def dry_run() -> bool:
+        """Items are only prepared when they are neither uploaded nor exported"""
+        return not config.upload_enabled and config.export_format is None
+
+    def __get_language_detector__(self) -> LanguageDetector:
+        if self.language_detector is None:
+            self.language_detector = LanguageDetector(
+                seed=config.language_detection_seed,
+                processes=config.language_detection_processes,
+            )
+        return self.language_detector
+
+    def __get_lookup_executor__(self) -> ThreadPoolExecutor:
+        if self.lookup_executor is None:
+            self.lookup_executor = ThreadPoolExecutor(
+                max_workers=config.reference_workers, thread_name_prefix="lookup"
+            )
+        return self.lookup_executor
+
+    def __get_lookup_cache__(self) -> Optional[LookupCache]:
+        if config.cache_enabled and self.lookup_cache is None:
+            self.lookup_cache = LookupCache(
+                path=config.cache_path,
+                ttls=config.cache_ttls,
+                negative_ttl=config.cache_negative_ttl,
+                max_entries=config.cache_max_entries,
+            )
+        return self.lookup_cache
 
     def __get_first_qid_from_cirrussearch__(self, query_string: str) -> Union[str, bool]:
         if query_string is None:
             raise ValueError("Did not get what we need")
-        result = self.__call_cirrussearch_api__(query_string=query_string)
+        qid = self.__resolve_qid__(query_string=query_string)
+        if qid is not None:
+            return qid
+        else:
+            return False
+
+    def __resolve_qid__(self, query_string: str, purpose: str = "doi") -> Optional[str]:
+        """Returns the QID of the first CirrusSearch match or None.
+        Answers are memoized so a run never asks the same question twice."""
+        if query_string is None:
+            raise ValueError("Did not get what we need")
+        qid = self.qid_memo.get(query_string, MISSING)
+        if qid is not MISSING:
+            self.metrics.add_cache_lookups("qid_memo", hits=1)
+            return qid
+        self.metrics.add_cache_lookups("qid_memo", misses=1)
+        result = self.__call_cirrussearch_api__(query_string=query_string, purpose=purpose)
         # logger.info(f"result from CirrusSearch: {result}")
         if config.loglevel == logging.DEBUG:
             print(result)
-        if "query" in result:
-            query = result["query"]
-            if "search" in query:
-                search = query["search"]
-                if len(search) > 0:
-                    # Found match!
-                    qid = search[0]["title"]
-                    return qid
-                else:
-                    return False
+        qid = None
+        search = result.get("query", {}).get("search", [])
+        if len(search) > 0:
+            # Found match!
+            qid = search[0]["title"]
+        self.qid_memo.set(query_string, qid)
+        return qid
 
     def __import_new_item__(
             self, doi: str, work: Work, wbi: WikibaseIntegrator
     ):
         if (doi, work, wbi) is None:
             raise ValueError("Did not get what we need")
-        self.__upload_new_item__(item=self.__prepare_new_item__(doi=doi, work=work, wbi=wbi))
+        item = self.__prepare_item__(doi=doi, work=work, wbi=wbi)
+        if item is not None:
+            # Writing sets the id of a new item so this is decided before
+            is_update = item.id is not None
+            new_item = self.__upload_new_item__(item=item, doi=doi)
+            if new_item is not None:
+                self.__remember_new_item__(doi=doi, qid=new_item.id, updated=is_update)
+
+    def __remember_new_item__(self, doi: str, qid: str, updated: bool = False):
+        # Later works citing this one should link to the new item
+        self.qid_memo.set(doi, qid)
+        self.__record__(doi=doi, outcome=Outcome.UPDATED if updated else Outcome.IMPORTED, qid=qid)
+
+    def __record__(self, doi: str, outcome: Outcome, qid: str = None):
+        self.failed_dois.discard(doi)
+        if self.journal is not None:
+            self.journal.record(doi=doi, outcome=outcome, qid=qid)
 
     def __prepare_authors__(self, work: Work) -> Optional[List[Claim]]:
         """
@@ -135,6 +358,11 @@ class OpenAlexBot(BaseModel):
         authors = []
         logger.info(f"Found {len(work.authorships)} authorships to process")
         ordinal = 1
+        # All ORCIDs of the work are looked up at once
+        qids = self.__resolve_orcids__(
+            orcids=[authorship.author.orcid_id for authorship in work.authorships
+                    if authorship.author.orcid is not None]
+        )
         for authorship in work.authorships:
             if authorship.author.orcid is not None:
                 id = authorship.author.id
@@ -148,8 +376,8 @@ class OpenAlexBot(BaseModel):
                     prop_nr=Property.SERIES_ORDINAL.value,
                     value=str(ordinal)
                 )
-                qid = self.__get_first_qid_from_cirrussearch__(query_string=orcid)
-                if qid:
+                qid = qids[orcid]
+                if qid is not None:
                     author = datatypes.Item(
                         prop_nr=Property.AUTHOR.value,
                         value=qid,
@@ -167,41 +395,85 @@ class OpenAlexBot(BaseModel):
                 ordinal += 1
         return authors
 
+    def __resolve_orcids__(self, orcids: List[str]) -> Dict[str, Optional[str]]:
+        """Returns the QID or None for every ORCID.
+        The local index is asked first and CirrusSearch only for the misses"""
+        found = {}
+        if self.__get_orcid_index__() is not None:
+            found = self.orcid_index.get_many(orcids)
+        qids = {}
+        for orcid in orcids:
+            qid = found.get(OrcidIndex.normalize(orcid))
+            if qid is None:
+                qid = self.__resolve_qid__(query_string=orcid, purpose="orcid")
+            qids[orcid] = qid
+        return qids
+
     def __prepare_cites_works__(self, work: Work, reference: List[Claim]):
         if (work, reference) is None:
             raise ValueError("did not get what we need")
         logger.info("Preparing cites works claims")
-        oa = OpenAlex(email=self.email)
-        cites_works: List[datatypes.Item] = []
+        ids = [openalex_id_without_prefix(id) for id in work.referenced_works]
+        referenced_works = {id: self.crawled_works[id] for id in ids if id in self.crawled_works}
+        missing_ids = [id for id in ids if id not in referenced_works]
+        if len(missing_ids) > 0:
+            with self.metrics.measure("openalex_fetch_references"):
+                referenced_works.update(self.__get_fetcher__().get_works_by_openalex_ids(missing_ids))
+        dois = []
         for referenced_work_url in work.referenced_works:
-            referenced_work = oa.get_single_work(referenced_work_url)
-            # print(referenced_work.dict())
-            doi = referenced_work.ids.doi_id
-            if doi is not None:
-                if self.__found_using_cirrussearch__(doi):
-                    qid = self.__get_first_qid_from_cirrussearch__(doi)
-                    logger.info(f"qid found for this reference: {qid}")
-                    # exit()
-                    cites_work = datatypes.Item(
-                        prop_nr=Property.CITES_WORK.value,
-                        value=qid,
-                        references=[reference]
-                    )
-                    cites_works.append(
-                        cites_work
-                    )
-                else:
-                    # TODO decide whether to import transitive references also
-                    logger.warning(f"Reference DOI '{doi}' not found in Wikidata")
-            else:
+            referenced_work = referenced_works.get(openalex_id_without_prefix(referenced_work_url))
+            if referenced_work is None:
+                logger.warning(f"OpenAlex ID {referenced_work_url} not found in OpenAlex, skipping")
+            elif referenced_work.ids.doi is None:
                 # TODO decide whether to import these
                 logger.warning(f"DOI was None for OpenAlex ID {referenced_work_url} "
                                f"with ids {referenced_work.ids}, skipping")
+            else:
+                dois.append(normalize_doi(referenced_work.ids.doi))
+        qids = self.__resolve_dois__(dois=dois)
+        cites_works: List[datatypes.Item] = []
+        for doi, qid in zip(dois, qids):
+            if qid is not None:
+                logger.info(f"qid found for this reference: {qid}")
+                cites_work = datatypes.Item(
+                    prop_nr=Property.CITES_WORK.value,
+                    value=qid,
+                    references=[reference]
+                )
+                cites_works.append(
+                    cites_work
+                )
+            else:
+                # See citation_crawl_enabled in the config to import these too
+                logger.warning(f"Reference DOI '{doi}' not found in Wikidata")
         logger.debug(f"Generated {len(cites_works)} cited works")
         # if config.loglevel == logging.DEBUG:
         #     print(cites_works)
         return cites_works
 
+    def __resolve_dois__(self, dois: List[str]) -> List[Optional[str]]:
+        """Returns the QID or None for every DOI in the same order.
+        The local index is asked first and CirrusSearch only for the misses"""
+        found = {}
+        if self.__get_doi_index__() is not None:
+            found = self.doi_index.get_many(dois)
+        missing_dois = [doi for doi in dois if doi not in found]
+        found.update(zip(missing_dois, self.__search_dois__(missing_dois)))
+        return [found[doi] for doi in dois]
+
+    def __search_dois__(self, dois: List[str]) -> List[Optional[str]]:
+        """Returns the QID or None for every DOI in the same order using CirrusSearch"""
+        # The lookups are independent so we run them concurrently.
+        # The pool is shared so the prepare workers together never run more than
+        # reference_workers lookups and the connection pool is not exceeded.
+        # map() returns the results in input order so the claims stay deterministic.
+        # The lookups are measured on the pool threads, so the wait for them is a stage
+        # of its own instead of counting as local work of the calling stage.
+        if config.reference_workers > 1 and len(dois) > 1:
+            with self.metrics.measure("lookup_pool_wait"):
+                return list(self.__get_lookup_executor__().map(self.__resolve_qid__, dois))
+        return [self.__resolve_qid__(doi) for doi in dois]
+
     def __prepare_instance_of__(self, work: Work, reference: List[Claim]):
         if (work, reference) is None:
             raise ValueError("did not get what we need")
@@ -216,18 +488,46 @@ class OpenAlexBot(BaseModel):
         else:
             raise ValueError(f"type_qid was None")
 
+    def __prepare_item__(self, doi: str, work: Work, wbi: WikibaseIntegrator) -> Optional[entities.Item]:
+        """Returns a new item or in update mode the missing claims of an existing item.
+        None means the existing item lacks nothing"""
+        item = self.__prepare_new_item__(doi=doi, work=work, wbi=wbi)
+        qid = self.existing_qids.pop(doi, None)
+        if qid is None:
+            return item
+        claims = self.__get_item_updater__().missing_claims(
+            existing_claims=self.existing_claims.pop(doi, {}), item=item
+        )
+        if len(claims) == 0:
+            print(f"DOI: '{doi}' is already in Wikidata as {qid} with all claims, skipping")
+            self.__record__(doi=doi, outcome=Outcome.ALREADY_PRESENT, qid=qid)
+            return None
+        logger.info(f"Adding {len(claims)} missing claims to {qid}")
+        update = wbi.item.new(id=qid)
+        update.add_claims(claims)
+        return update
+
     def __prepare_new_item__(
             self, doi: str, work: Work, wbi: WikibaseIntegrator
     ) -> entities.Item:
         """This method converts OpenAlex data into a new Wikidata item"""
         if (doi, work, wbi) is None:
             raise ValueError("Did not get what we need")
-        # TODO language of display name using langdetect and set dynamically
-        detected_language = langdetect.detect(work.display_name)
+        with self.metrics.measure("prepare_claims"):
+            return self.__prepare_claims__(doi=doi, work=work, wbi=wbi)
+
+    def __prepare_claims__(
+            self, doi: str, work: Work, wbi: WikibaseIntegrator
+    ) -> entities.Item:
+        with self.metrics.measure("langdetect"):
+            # Newer OpenAlex works have the language, the model of older versions lacks it
+            detected_language = self.__get_language_detector__().detect(
+                title=work.display_name, language=getattr(work, "language", None)
+            )
         logger.info(f"Detected language {detected_language} for '{work.display_name}'")
         item = wbi.item.new()
         item.labels.set(detected_language, work.display_name)
-        item.descriptions.set("en", f"scientific article from {work.publication_year}")
+        item.descriptions.set("en", WorkTypeToQid(work=work).get_description())
         # Prepare claims
         # TODO convert redacted from OpenAlex work to claim
         # TODO convert oa status from OpenAlex work to claim?
@@ -262,7 +562,11 @@ class OpenAlexBot(BaseModel):
         issn_l = work.host_venue.issn_l
         if issn_l is None:
             raise ValueError(f"issn_l of {work.id} was None")
-        result = self.__get_first_qid_from_cirrussearch__(f"haswbstatement:P7363={issn_l}")
+        result = None
+        if self.__get_venue_index__() is not None:
+            result = self.venue_index.get(issn_l)
+        if result is None:
+            result = self.__resolve_qid__(f"haswbstatement:{Property.ISSN_L.value}={issn_l}", purpose="issn")
         if result is not None:
             published_in = datatypes.Item(
                 prop_nr=Property.PUBLISHED_IN.value,
@@ -273,45 +577,11 @@ class OpenAlexBot(BaseModel):
         else:
             raise ValueError(f"Venue with ISSN-L {issn_l} not found in Wikidata")
 
-    @staticmethod
-    def __prepare_reference_claim__(id: str = None, work: Work = None) -> List[Claim]:
+    def __prepare_reference_claim__(self, id: str = None, work: Work = None) -> List[Claim]:
+        """:param id of the author or concept the reference is for, defaults to the work"""
         if work is None:
             raise ValueError("did not get what we need")
-        logger.info("Preparing reference claim")
-        # Prepare reference
-        if id is not None:
-            id_without_prefix = URL(id).path_segment(0)
-            logger.info(f"Using OpenAlex id: {id_without_prefix} extracted from {id}")
-            openalex_id = datatypes.ExternalID(
-                prop_nr=Property.OPENALEX_ID.value,
-                value=id_without_prefix
-            )
-        else:
-            # Fallback to the work id as id
-            logger.info(f"Using OpenAlex id: {work.id_without_prefix}")
-            openalex_id = datatypes.ExternalID(
-                prop_nr=Property.OPENALEX_ID.value,
-                value=work.id_without_prefix
-            )
-        retrieved_date = datatypes.Time(
-            prop_nr="P813",  # Fetched today
-            time=datetime.utcnow().replace(
-                tzinfo=timezone.utc
-            ).replace(
-                hour=0,
-                minute=0,
-                second=0,
-            ).strftime("+%Y-%m-%dT%H:%M:%SZ")
-        )
-        stated_in = datatypes.Item(
-            prop_nr="P248",
-            value=StatedIn.OPENALEX.value
-        )
-        claims = []
-        for claim in (retrieved_date, stated_in, openalex_id):
-            if claim is not None:
-                claims.append(claim)
-        return claims
+        return self.reference_builder.build(openalex_id=id if id is not None else work.id)
 
     def __prepare_single_value_claims__(self, doi: str, work: Work, reference: List[Claim]):
         if (work, doi, reference) is None:
@@ -403,69 +673,433 @@ class OpenAlexBot(BaseModel):
                 subjects.append(subject)
         return subjects
 
-    def __process_dois__(self):
+    def __process_dois__(self, dois: Iterable[str], skip_completed: bool = True, skip_existing: bool = True):
+        """:param dois are normalized and unique
+        :param skip_completed skips the DOIs completed according to the journal
+        :param skip_existing skips the DOIs in Wikidata, False when the caller checked them already"""
         if self.email is None:
             raise ValueError("self.email was None")
-        oa = OpenAlex(email=self.email)
+        if self.wbi is None:
+            self.__setup_wikibaseintegrator__()
+        if self.__get_journal__() is not None and skip_completed:
+            dois = self.journal.skip_completed(dois)
+        # Works we already have are checked before any Wikidata lookup,
+        # the others are checked as soon as they are fetched
+        dois = (doi for doi in dois if doi not in self.prefetched_works
+                or self.__has_supported_type__(doi=doi, work=self.prefetched_works[doi]))
+        # Existence is checked for larger chunks than OpenAlex accepts in one filter,
+        # the missing DOIs are then fetched in chunks of openalex_batch_size
+        doi_chunks = chunks(dois, config.wikidata_resolver_batch_size)
+        resolve = partial(self.__resolve_stage__, skip_existing=skip_existing)
+        if config.pipeline_enabled and not config.press_enter_to_continue:
+            self.__run_pipeline__(doi_chunks=doi_chunks, resolve=resolve)
+        else:
+            missing_chunks = (missing for chunk in doi_chunks for missing in resolve(dois=chunk))
+            for missing_dois in missing_chunks:
+                for doi, work in self.__fetch_works__(dois=missing_dois):
+                    logger.info("Starting import")
+                    try:
+                        self.__import_new_item__(doi=doi, work=work, wbi=self.wbi)
+                    except Exception as e:
+                        self.__handle_failure__(doi=doi, error=e)
+                    if config.press_enter_to_continue:
+                        input("press enter to continue")
+
+    def __crawl_and_process_dois__(self, dois: Iterable[str]):
+        """Imports the works together with their references missing in Wikidata.
+        The references are imported first so the citing items can link to them"""
+        if self.wbi is None:
+            self.__setup_wikibaseintegrator__()
+        crawler = CitationCrawler(
+            max_depth=config.citation_crawl_max_depth,
+            max_works=config.citation_crawl_max_works,
+            fetch_works=self.__fetch_referenced_works__,
+            get_existing_dois=self.__get_crawled_existing_dois__,
+            chunk_size=config.openalex_batch_size,
+        )
+        if self.__get_journal__() is not None:
+            dois = self.journal.skip_completed(dois)
+        for chunk in chunks(dois, config.openalex_batch_size):
+            seeds = self.__fetch_works__(dois=self.__skip_existing_dois__(dois=chunk))
+            with self.metrics.measure("citation_crawl"):
+                levels = crawler.crawl(seeds=seeds)
+            for level in levels:
+                self.prefetched_works.update(level)
+                # The seeds were checked above and the crawler only adds references missing in Wikidata
+                self.__process_dois__(dois=[doi for doi, _ in level], skip_completed=False, skip_existing=False)
+            self.crawled_works.clear()
+
+    def __fetch_referenced_works__(self, ids: List[str]) -> Dict[str, Work]:
+        """Fetches references for the crawl and keeps them for __prepare_cites_works__"""
+        with self.metrics.measure("openalex_fetch_references"):
+            works = self.__get_fetcher__().get_works_by_openalex_ids(ids)
+        self.crawled_works.update(works)
+        return works
+
+    def __get_crawled_existing_dois__(self, dois: List[str]) -> Dict[str, str]:
+        """Returns the DOIs of references that exist in Wikidata with their QID.
+        Items created in this run are known from the memo even if the query service lags behind.
+        The answers are memoized so __prepare_cites_works__ does not look them up again"""
+        existing_dois = {doi: qid for doi, qid in ((doi, self.qid_memo.get(doi)) for doi in dois) if qid is not None}
+        remaining_dois = [doi for doi in dois if doi not in existing_dois]
+        if len(remaining_dois) > 0:
+            found = self.__get_existing_dois__(dois=remaining_dois)
+            for doi in remaining_dois:
+                self.qid_memo.set(doi, found.get(doi))
+            existing_dois.update(found)
+        return existing_dois
+
+    def __run_pipeline__(self, doi_chunks: Iterable[List[str]], resolve: Callable[[List[str]], List[List[str]]]):
+        """Runs the stages of the import concurrently.
+        Chunks of DOIs are checked against Wikidata first
+        so we never fetch OpenAlex data for works we are going to skip."""
+        workers = config.pipeline_workers
+        pipeline = ImportPipeline(
+            stages=[
+                Stage(name="resolve", function=resolve, workers=workers["resolve"]),
+                Stage(name="fetch", function=self.__fetch_works__, workers=workers["fetch"]),
+                Stage(name="prepare", function=self.__prepare_stage__, workers=workers["prepare"]),
+                Stage(name="upload", function=self.__upload_stage__, workers=workers["upload"]),
+            ],
+            queue_size=config.pipeline_queue_size,
+        )
+        pipeline.run(source=doi_chunks)
+
+    def __resolve_stage__(self, dois: List[str], skip_existing: bool = True) -> List[List[str]]:
+        if skip_existing:
+            dois = self.__skip_existing_dois__(dois=dois)
+        return list(chunks(dois, config.openalex_batch_size))
+
+    def __prepare_stage__(self, doi_and_work: Tuple[str, Work]) -> List[Tuple[str, entities.Item]]:
+        doi, work = doi_and_work
+        logger.info(f"Preparing new item for {doi}")
+        try:
+            item = self.__prepare_item__(doi=doi, work=work, wbi=self.wbi)
+            return [(doi, item)] if item is not None else []
+        except Exception as e:
+            self.__handle_failure__(doi=doi, error=e)
+            return []
+
+    def __upload_stage__(self, doi_and_item: Tuple[str, entities.Item]) -> List:
+        doi, item = doi_and_item
+        try:
+            is_update = item.id is not None
+            new_item = self.__upload_new_item__(item=item, doi=doi)
+            if new_item is not None:
+                self.__remember_new_item__(doi=doi, qid=new_item.id, updated=is_update)
+        except Exception as e:
+            self.__handle_failure__(doi=doi, error=e)
+        return []
+
+    def __handle_failure__(self, doi: str, error: Exception):
+        """With a journal the failure is recorded and the run continues.
+        The DOI is then retried on the next run."""
+        if self.journal is None:
+            raise error
+        logger.exception(f"Import of DOI '{doi}' failed", exc_info=error)
+        self.failed_dois.add(doi)
+        self.journal.record(doi=doi, outcome=Outcome.FAILED, reason=f"{type(error).__name__}: {error}")
+
+    def __skip_existing_dois__(self, dois: List[str]) -> List[str]:
+        """Returns the DOIs that are not in Wikidata yet.
+        In update mode the existing DOIs are returned too and their QIDs remembered"""
+        with self.metrics.measure("resolve_existing"):
+            existing_dois = self.__get_existing_dois__(dois=dois)
+        missing_dois = []
+        for doi in dois:
+            if doi in existing_dois and self.__updates_existing_items__():
+                self.existing_qids[doi] = existing_dois[doi]
+                missing_dois.append(doi)
+            elif doi in existing_dois:
+                self.prefetched_works.pop(doi, None)
+                print(f"DOI: '{doi}' is already in Wikidata as {existing_dois[doi]}, skipping")
+                self.__record__(doi=doi, outcome=Outcome.ALREADY_PRESENT, qid=existing_dois[doi])
+            else:
+                missing_dois.append(doi)
+        return missing_dois
+
+    def __has_supported_type__(self, doi: str, work: Work) -> bool:
+        if is_supported(work):
+            return True
+        print(f"DOI '{doi}' has the unsupported type '{work_type_of(work)}', skipping")
+        self.prefetched_works.pop(doi, None)
+        self.existing_qids.pop(doi, None)
+        self.__record__(doi=doi, outcome=Outcome.UNSUPPORTED_TYPE)
+        return False
+
+    def __fetch_works__(self, dois: List[str]) -> List[Tuple[str, Work]]:
+        """Returns the DOIs found in OpenAlex together with their work"""
+        if len(dois) == 0:
+            return []
+        works = {doi: self.prefetched_works.pop(doi) for doi in dois if doi in self.prefetched_works}
+        remaining_dois = [doi for doi in dois if doi not in works]
+        if len(remaining_dois) > 0:
+            with self.metrics.measure("openalex_fetch"):
+                works.update(self.__get_fetcher__().get_works_by_dois(remaining_dois))
+        found = []
+        for doi in dois:
+            logger.debug(f"Working on query_string: '{doi}'")
+            work = works.get(doi)
+            if work is not None:
+                logger.info(f"Found Work in OpenAlex with id {work.id}")
+                # print(work.dict())
+                if self.__has_supported_type__(doi=doi, work=work):
+                    found.append((doi, work))
+            elif doi in self.existing_qids:
+                print(f"DOI '{doi}' not found in OpenAlex, not updating it")
+                self.__record__(doi=doi, outcome=Outcome.ALREADY_PRESENT, qid=self.existing_qids.pop(doi))
+            else:
+                print(f"DOI '{doi}' not found in OpenAlex and Wikidata")
+                self.__record__(doi=doi, outcome=Outcome.MISSING_IN_OPENALEX)
+        qids = {doi: self.existing_qids[doi] for doi, _ in found if doi in self.existing_qids}
+        if len(qids) > 0:
+            # The claims of all existing items of the chunk are fetched at once
+            with self.metrics.measure("wbgetentities"):
+                claims = self.__get_item_updater__().get_claims(qids.values())
+            for doi, qid in qids.items():
+                self.existing_claims[doi] = claims.get(qid, {})
+        if config.language_detection_processes > 1 and len(found) > 0:
+            # Detecting the whole chunk at once lets a process pool share the work,
+            # the preparation of each item then finds the language in the memo
+            with self.metrics.measure("langdetect_batch"):
+                self.__get_language_detector__().detect_many(
+                    titles=[work.display_name for _, work in found if getattr(work, "language", None) is None],
+                )
+        return found
+
+    def __setup_wikibaseintegrator__(self):
         wbi_config.config["USER_AGENT_DEFAULT"] = config.user_agent
         if config.use_test_wikidata:
             wbi_config.config["WIKIBASE_URL"] = "http://test.wikidata.org"
-        wbi = WikibaseIntegrator(login=wbi_login.Login(
+            # Lookups, logins and writes all go to the test instance
+            wbi_config.config["MEDIAWIKI_API_URL"] = "https://test.wikidata.org/w/api.php"
+        login = wbi_login.Login(
             user=config.bot_username,
             password=config.password
-        ), )
-        processed_dois = set()
-        for doi in self.dois:
-            logger.debug(f"Working on query_string: '{doi}'")
-            doi = doi.replace("https://doi.org/", "")
-            if "http" in doi:
-                raise ValueError(f"http found in this DOI after "
-                                 f"removing the prefix: {doi}")
-            if doi not in processed_dois:
-                work = oa.get_single_work(f"doi:{doi}")
-                if work is not None:
-                    logger.info(f"Found Work in OpenAlex with id {work.id}")
-                    # print(work.dict())
-                    if not self.__found_using_cirrussearch__(doi):
-                        logger.info("Starting import")
-                        self.__import_new_item__(doi=doi, work=work, wbi=wbi)
-                    else:
-                        print(f"DOI: '{doi}' is already in Wikidata, skipping")
-                    if config.press_enter_to_continue:
-                        input("press enter to continue")
-                else:
-                    if self.__found_using_cirrussearch__(doi):
-                        print(f"DOI '{doi}' found in Wikidata but not in OpenAlex")
-                    else:
-                        print(f"DOI '{doi}' not found in OpenAlex and Wikidata")
-                processed_dois.add(doi)
+        )
+        # The login brings its own session with the cookies,
+        # we let it use our connection pool
+        login.get_session().mount("https://", self.__get_http_adapter__())
+        login.get_session().mount("http://", self.__get_http_adapter__())
+        self.wbi = WikibaseIntegrator(login=login, )
+
+    def __get_existing_dois__(self, dois: List[str]) -> Dict[str, str]:
+        """Returns the DOIs that already exist in Wikidata with their QID
+        The local index is asked first and Wikidata only for the misses.
+        test.wikidata.org has no query service so CirrusSearch is used there,
+        the MediaWiki API URL points at it when use_test_wikidata is set"""
+        existing_dois = {}
+        if self.__get_doi_index__() is not None:
+            existing_dois = self.doi_index.get_many(dois)
+            dois = [doi for doi in dois if doi not in existing_dois]
+            if len(dois) == 0:
+                return existing_dois
+        if not config.use_test_wikidata:
+            existing_dois.update(WikidataDoiResolver(
+                chunk_size=config.wikidata_resolver_batch_size,
+                scheduler=self.__get_scheduler__(),
+            ).get_qids(dois))
+            # The query service misses DOIs stored in mixed case
+            dois = [doi for doi in dois if doi not in existing_dois]
+        if config.use_test_wikidata or config.wikidata_resolver_cirrussearch_fallback:
+            qids = self.__search_dois__(dois)
+            existing_dois.update((doi, qid) for doi, qid in zip(dois, qids) if qid is not None)
+        return existing_dois
 
     def __read_csv__(self):
         self.dataframe = pd.read_csv(self.filename)
         if config.loglevel == logging.DEBUG:
             self.dataframe.info()
 
-    def __upload_new_item__(self, item: entities.Item):
+    def __upload_new_item__(self, item: entities.Item, doi: str = None) -> Optional[entities.Item]:
         if item is None:
             raise ValueError("Did not get what we need")
-        if config.upload_enabled:
-            new_item = item.write(summary="New item imported from OpenAlex")
-            print(f"Added new item {self.entity_url(new_item.id)}")
+        if self.__get_exporter__() is not None:
+            with self.metrics.measure("export"):
+                self.exporter.export(doi=doi, item=item)
+            self.__record__(doi=doi, outcome=Outcome.EXPORTED)
+            return None
+        elif config.upload_enabled:
+            # write() sets the id on the item itself
+            is_update = item.id is not None
+            # WikibaseIntegrator should give up at once so the scheduler
+            # can back off and slow down instead of sleeping on its own
+            with self.metrics.measure("write"):
+                new_item = self.__get_scheduler__().call(
+                    urlparse(wbi_config.config["MEDIAWIKI_API_URL"]).netloc,
+                    item.write,
+                    summary="Claims imported from OpenAlex" if is_update else "New item imported from OpenAlex",
+                    max_retries=1,
+                    retry_after=0,
+                    maxlag=config.maxlag,
+                    retry_on=(MaxRetriesReachedException,),
+                )
+            print(f"{'Updated' if is_update else 'Added new'} item {self.entity_url(new_item.id)}")
             if config.press_enter_to_continue:
                 input("press enter to continue")
+            return new_item
         else:
             print("skipped upload")
+            self.__record__(doi=doi, outcome=Outcome.DRY_RUN)
+            return None
+
+    def __upload_exported_line__(self, line: str) -> List:
+        exported = json.loads(line)
+        doi = exported["doi"]
+        if self.journal is not None and self.journal.get_outcome(doi) in (Outcome.IMPORTED, Outcome.UPDATED):
+            logger.info(f"DOI '{doi}' was already uploaded, skipping")
+            return []
+        qid = exported["item"].get("id")
+        if qid is not None:
+            # Updates of existing items only carry the missing claims
+            data = dict(action="wbeditentity", id=qid, summary="Claims imported from OpenAlex")
+        else:
+            data = dict(action="wbeditentity", new="item", summary="New item imported from OpenAlex")
+        data["data"] = json.dumps(exported["item"])
+        try:
+            with self.metrics.measure("write"):
+                result = self.__get_scheduler__().call(
+                    urlparse(wbi_config.config["MEDIAWIKI_API_URL"]).netloc,
+                    mediawiki_api_call_helper,
+                    data=data,
+                    login=self.wbi.login,
+                    max_retries=1,
+                    retry_after=0,
+                    maxlag=config.maxlag,
+                    retry_on=(MaxRetriesReachedException,),
+                )
+            print(f"{'Updated' if qid is not None else 'Added new'} item {self.entity_url(result['entity']['id'])}")
+            self.__remember_new_item__(doi=doi, qid=result["entity"]["id"], updated=qid is not None)
+        except Exception as e:
+            self.__handle_failure__(doi=doi, error=e)
+        return []
+
+    def upload_export(self, filename: str):
+        """Uploads the items of a NDJSON export made with export_format = "ndjson".
+        The items are written concurrently under the edit rate limit of the scheduler"""
+        if not config.upload_enabled:
+            raise ValueError("upload_enabled is False in the config")
+        if config.export_format is not None:
+            raise ValueError("Set export_format to None before uploading an export")
+        self.__setup_wikibaseintegrator__()
+        self.__get_journal__()
+        with open(filename, encoding="utf-8") as file:
+            ImportPipeline(
+                stages=[Stage(
+                    name="upload",
+                    function=self.__upload_exported_line__,
+                    workers=config.pipeline_workers["upload"]
+                )],
+                queue_size=config.pipeline_queue_size,
+            ).run(source=file)
+        if self.journal is not None:
+            logger.info(f"Journal: {self.journal.get_counts()}")
+            self.journal.close()
+        self.__report_metrics__()
+
+    def __report_metrics__(self):
+        print(self.metrics.summary_table())
+        if config.metrics_json_path is not None:
+            self.metrics.write_json(config.metrics_json_path)
+        if config.metrics_prometheus_path is not None:
+            self.metrics.write_prometheus(config.metrics_prometheus_path)
 
     @staticmethod
     def entity_url(qid):
         return f"{wbi_config.config['WIKIBASE_URL']}/wiki/{qid}"
 
+    def __prefetch_works__(self, works: Iterable[Work]) -> Iterator[str]:
+        """Yields the DOI of every work once and keeps the work for __fetch_works__"""
+        without_doi = 0
+        for work in works:
+            if work.ids.doi is None:
+                without_doi += 1
+                continue
+            doi = normalize_doi(work.ids.doi)
+            if doi not in self.prefetched_works:
+                self.prefetched_works[doi] = work
+                yield doi
+        logger.info(f"Skipped {without_doi} changed works without a DOI")
+
+    def sync(self):
+        """Processes the works changed in OpenAlex since the last sync.
+        The first sync starts at sync_start_date in the config.
+        Existing items get the claims they lack and the works that failed
+        are kept in the sync state and retried by the next sync"""
+        state = SyncState(path=config.sync_state_path)
+        since = state.load() or config.sync_start_date
+        if since is None:
+            raise ValueError(f"No high-water mark in {config.sync_state_path}, "
+                             f"set sync_start_date in the config")
+        fetcher = self.__get_fetcher__()
+        if not isinstance(fetcher, OpenAlexBatchFetcher):
+            raise ValueError("Syncing needs the OpenAlex API, set openalex_snapshot_path to None")
+        started = datetime.now(timezone.utc).date().isoformat()
+        # Keeping Wikidata in sync means updating the items that already exist,
+        # only this sync does so and not later runs in the same process
+        update_existing_items = self.update_existing_items
+        self.update_existing_items = True
+        try:
+            retried_dois = state.load_failed_dois()
+            if len(retried_dois) > 0:
+                logger.info(f"Retrying {len(retried_dois)} works that failed in the last sync")
+                self.__process_dois__(dois=retried_dois, skip_completed=False)
+            filter_ = f"from_updated_date:{since}"
+            if config.sync_filter is not None:
+                filter_ += f",{config.sync_filter}"
+            logger.info(f"Syncing works from OpenAlex with filter {filter_}")
+            works = self.metrics.measure_iterable("openalex_sync", fetcher.iterate_works(filter_=filter_))
+            # A changed work is processed again even if the journal has it as completed
+            self.__process_dois__(dois=self.__prefetch_works__(works), skip_completed=False)
+        finally:
+            self.update_existing_items = update_existing_items
+        if len(self.failed_dois) > 0:
+            logger.warning(f"{len(self.failed_dois)} works failed, the next sync retries them")
+        state.save(started, failed_dois=sorted(self.failed_dois))
+        self.__finish__()
+
     def start(self):
-        self.__read_csv__()
-        self.__drop_empty_values__()
-        self.__unquote_dois__()
-        self.__check_and_extract_from_doi_series__()
-        self.__process_dois__()
+        if self.filename is None:
+            raise ValueError("filename was None")
+        if config.streaming_csv:
+            # The rows are read lazily so every row is timed on its own
+            dois = self.metrics.measure_iterable("read_csv", DoiReader(filename=self.filename).read())
+        else:
+            with self.metrics.measure("read_csv"):
+                self.__read_csv__()
+                self.__drop_empty_values__()
+                self.__unquote_dois__()
+                self.__check_and_extract_from_doi_series__()
+            dois = unique_normalized_dois(self.dois)
+        if config.citation_crawl_enabled:
+            self.__crawl_and_process_dois__(dois=dois)
+        else:
+            self.__process_dois__(dois=dois)
+        self.__finish__()
+
+    def __finish__(self):
+        if self.lookup_cache is not None:
+            self.metrics.add_cache_lookups(
+                "lookup_cache", hits=self.lookup_cache.hits, misses=self.lookup_cache.misses
+            )
+            self.lookup_cache.close()
+        if self.journal is not None:
+            logger.info(f"Journal: {self.journal.get_counts()}")
+            self.journal.close()
+        if self.exporter is not None:
+            logger.info(f"Exported {self.exporter.count} items to {self.exporter.path}")
+            self.exporter.close()
+        if isinstance(self.fetcher, OpenAlexSnapshot):
+            self.fetcher.close()
+        for index in (self.doi_index, self.orcid_index, self.venue_index):
+            if index is not None:
+                index.close()
+        if self.language_detector is not None:
+            self.language_detector.close()
+        if self.lookup_executor is not None:
+            self.lookup_executor.shutdown()
+            self.lookup_executor = None
+        self.__report_metrics__()
 
     class Config:
         arbitrary_types_allowed = True
@@ -0,0 +1,62 @@
+import math
+from hashlib import blake2b
+from typing import Iterator
+
+from pydantic import BaseModel, PrivateAttr
+
+
+class BloomFilter(BaseModel):
+    """This is a compact probabilistic set.
+    It never gives false negatives, so a value that is not in the filter
+    is certainly not in the set and the expensive lookup can be skipped."""
+    size: int
+    hash_count: int
+    _bits: bytearray = PrivateAttr()
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        """Returns a filter with the optimal size for the number of values and false positive rate"""
+        capacity = max(1, capacity)
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size=size, hash_count=hash_count)
+
+    def __positions__(self, value: str) -> Iterator[int]:
+        # Double hashing gives us any number of hash functions from one digest
+        digest = blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, value: str):
+        for position in self.__positions__(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self.__positions__(value)
+        )
+
+    def save(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.size.to_bytes(8, "little"))
+            file.write(self.hash_count.to_bytes(8, "little"))
+            file.write(self._bits)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        with open(path, "rb") as file:
+            bloom_filter = cls(
+                size=int.from_bytes(file.read(8), "little"),
+                hash_count=int.from_bytes(file.read(8), "little"),
+            )
+            bloom_filter._bits = bytearray(file.read())
+        if len(bloom_filter._bits) != (bloom_filter.size + 7) // 8:
+            raise ValueError(f"The bloom filter in {path} is truncated")
+        return bloom_filter
@@ -0,0 +1,125 @@
+import heapq
+import logging
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from openalexapi import Work
+from pydantic import BaseModel, PrivateAttr
+
+from openalexbot.helpers import chunks, normalize_doi, openalex_id_without_prefix
+from openalexbot.work_type_to_qid import is_supported
+
+logger = logging.getLogger(__name__)
+
+
+class CitationCrawler(BaseModel):
+    """This follows the references of works to the referenced works
+    that are missing in Wikidata, so they can be imported in the same run.
+
+    The frontier is a priority queue ordered by depth so the closest references
+    are crawled first. The set of visited references is kept across calls of crawl()
+    and max_works limits the number of referenced works added in total.
+    References of a type that is never imported are left out
+    and so are references without an ISSN-L because the published in claim needs it.
+
+    The result is ordered in levels: every work only cites works of earlier levels,
+    so importing level by level creates cited items before the items citing them."""
+    max_depth: int = 1
+    max_works: int = 10000
+    # Returns works by OpenAlex ID without prefix
+    fetch_works: Callable[[List[str]], Dict[str, Work]]
+    # Returns the DOIs that exist in Wikidata with their QID
+    get_existing_dois: Callable[[List[str]], Dict[str, str]]
+    chunk_size: int = 50
+    added_works: int = 0
+    _visited: Set[str] = PrivateAttr(default_factory=set)
+
+    @staticmethod
+    def __is_importable__(work: Work) -> bool:
+        return work.ids.doi is not None and is_supported(work) and work.host_venue.issn_l is not None
+
+    def __expand__(self, batch: List[Tuple[str, Work]], works: Dict[str, Work],
+                   edges: Dict[str, Set[str]]) -> List[str]:
+        """Adds the missing references of the batch and returns their DOIs"""
+        ids = {openalex_id_without_prefix(id) for _, work in batch for id in work.referenced_works}
+        referenced_works: Dict[str, Work] = {}
+        for chunk in chunks(sorted(ids), self.chunk_size):
+            referenced_works.update(self.fetch_works(chunk))
+        dois = {
+            openalex_id: normalize_doi(work.ids.doi)
+            for openalex_id, work in referenced_works.items() if self.__is_importable__(work)
+        }
+        existing_dois = self.get_existing_dois(sorted(set(dois.values()) - self._visited - works.keys()))
+        added = []
+        for citing_doi, work in batch:
+            for id in work.referenced_works:
+                doi = dois.get(openalex_id_without_prefix(id))
+                if doi is None or doi in existing_dois:
+                    continue
+                if doi not in self._visited and doi not in works:
+                    if self.added_works >= self.max_works:
+                        continue
+                    self._visited.add(doi)
+                    self.added_works += 1
+                    works[doi] = referenced_works[openalex_id_without_prefix(id)]
+                    added.append(doi)
+                if doi in works:
+                    edges[citing_doi].add(doi)
+        return added
+
+    @staticmethod
+    def __levels__(works: Dict[str, Work], edges: Dict[str, Set[str]]) -> List[List[Tuple[str, Work]]]:
+        """Orders the works so cited works come in earlier levels than citing works"""
+        remaining = {doi: set(cited) for doi, cited in edges.items()}
+        citing: Dict[str, List[str]] = {doi: [] for doi in works}
+        for doi, cited_dois in remaining.items():
+            for cited_doi in cited_dois:
+                citing[cited_doi].append(doi)
+        level = sorted(doi for doi, cited_dois in remaining.items() if len(cited_dois) == 0)
+        levels = []
+        done = 0
+        while level:
+            levels.append([(doi, works[doi]) for doi in level])
+            done += len(level)
+            next_level = []
+            for cited_doi in level:
+                for doi in citing[cited_doi]:
+                    remaining[doi].discard(cited_doi)
+                    if len(remaining[doi]) == 0:
+                        next_level.append(doi)
+            level = sorted(next_level)
+        if done < len(works):
+            # Works citing each other cannot be ordered, they go last together
+            cycle = sorted(doi for doi, cited_dois in remaining.items() if len(cited_dois) > 0)
+            logger.warning(f"Found {len(cycle)} works in citation cycles")
+            levels.append([(doi, works[doi]) for doi in cycle])
+        return levels
+
+    def crawl(self, seeds: Iterable[Tuple[str, Work]]) -> List[List[Tuple[str, Work]]]:
+        """Returns the seeds and their missing references in levels, see the class docstring.
+        :param seeds are works missing in Wikidata by DOI"""
+        works: Dict[str, Work] = {}
+        edges: Dict[str, Set[str]] = {}
+        frontier: List[Tuple[int, int, str]] = []
+        for doi, work in seeds:
+            works[doi] = work
+            heapq.heappush(frontier, (0, len(works), doi))
+        sequence = len(works)
+        while frontier:
+            depth = frontier[0][0]
+            batch = []
+            # The frontier is expanded in batches of the same depth so references are fetched in bulk
+            while frontier and frontier[0][0] == depth and len(batch) < self.chunk_size:
+                _, _, doi = heapq.heappop(frontier)
+                batch.append((doi, works[doi]))
+                edges[doi] = set()
+            if depth >= self.max_depth:
+                continue
+            for doi in self.__expand__(batch, works, edges):
+                sequence += 1
+                heapq.heappush(frontier, (depth + 1, sequence, doi))
+        for doi in works:
+            edges.setdefault(doi, set())
+        levels = self.__levels__(works, edges)
+        logger.info(f"Crawled {len(works)} works in {len(levels)} levels, "
+                    f"{self.added_works} of at most {self.max_works} references added so far")
+        return levels
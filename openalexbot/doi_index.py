@@ -0,0 +1,72 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import PrivateAttr
+
+from openalexbot.bloom_filter import BloomFilter
+from openalexbot.enums import Property
+from openalexbot.helpers import normalize_doi
+from openalexbot.qid_index import QidIndex
+
+logger = logging.getLogger(__name__)
+
+
+class DoiIndex(QidIndex):
+    """This maps lowercase DOIs to QIDs.
+    A bloom filter stored next to the database answers most misses
+    without touching the disk."""
+    properties: List[str] = [Property.DOI.value]
+    error_rate: float = 0.01
+    _bloom_filter: Optional[BloomFilter] = PrivateAttr(default=None)
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return normalize_doi(value)
+
+    @property
+    def bloom_filter_path(self) -> str:
+        return self.path + ".bloom"
+
+    def __build_bloom_filter__(self) -> BloomFilter:
+        with self._lock:
+            connection = self.__connect__()
+            (count,) = connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+            bloom_filter = BloomFilter.for_capacity(count, self.error_rate)
+            for (value,) in connection.execute("SELECT value FROM entries"):
+                bloom_filter.add(value)
+        bloom_filter.save(self.bloom_filter_path)
+        logger.info(f"Built bloom filter with {count} DOIs")
+        return bloom_filter
+
+    def __get_bloom_filter__(self) -> BloomFilter:
+        if self._bloom_filter is None:
+            if os.path.exists(self.bloom_filter_path):
+                self._bloom_filter = BloomFilter.load(self.bloom_filter_path)
+            else:
+                self._bloom_filter = self.__build_bloom_filter__()
+        return self._bloom_filter
+
+    def is_stale(self, max_age: timedelta) -> bool:
+        """True when the data is older than max_age. A new index built
+        from an old dump is as old as the dump"""
+        dump_date = self.dump_date
+        return dump_date is None or datetime.now(timezone.utc) - dump_date > max_age
+
+    def get(self, value: str) -> Optional[str]:
+        if not self.__get_bloom_filter__().might_contain(self.normalize(value)):
+            return None
+        return super().get(value)
+
+    def get_many(self, values: Iterable[str]) -> Dict[str, str]:
+        bloom_filter = self.__get_bloom_filter__()
+        return super().get_many(
+            value for value in values if bloom_filter.might_contain(self.normalize(value))
+        )
+
+    def upsert(self, rows: Iterable[Tuple[str, str, str]], dump_date: Optional[datetime] = None) -> int:
+        count = super().upsert(rows, dump_date=dump_date)
+        # The filter is sized for the number of entries so we rebuild it
+        self._bloom_filter = self.__build_bloom_filter__()
+        return count
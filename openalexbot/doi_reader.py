@@ -0,0 +1,62 @@
+import csv
+import gzip
+import io
+import logging
+import sys
+from typing import Iterator, TextIO
+from urllib.parse import unquote
+
+from pydantic import BaseModel
+
+from openalexbot.helpers import unique_normalized_dois
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class DoiReader(BaseModel):
+    """This streams the DOIs of a CSV row by row instead of loading the whole file.
+    Files ending in .gz or .zst are decompressed on the fly and "-" means stdin."""
+    filename: str
+    column: str = "doi"
+
+    def __open__(self) -> TextIO:
+        if self.filename == "-":
+            return sys.stdin
+        elif self.filename.endswith(".gz"):
+            return gzip.open(self.filename, "rt", encoding="utf-8", newline="")
+        elif self.filename.endswith(".zst"):
+            if zstandard is None:
+                raise ValueError("Reading .zst files requires the zstandard package")
+            return io.TextIOWrapper(
+                zstandard.ZstdDecompressor().stream_reader(open(self.filename, "rb")),
+                encoding="utf-8",
+                newline="",
+            )
+        else:
+            return open(self.filename, encoding="utf-8", newline="")
+
+    def __read_column__(self) -> Iterator[str]:
+        file = self.__open__()
+        try:
+            reader = csv.DictReader(file)
+            if reader.fieldnames is None or self.column not in reader.fieldnames:
+                raise ValueError(f"No '{self.column}' column found in {self.filename}")
+            rows = 0
+            for row in reader:
+                value = row[self.column]
+                if value:
+                    rows += 1
+                    yield unquote(value)
+            logger.info(f"Read {rows} DOIs from {self.filename}")
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    def read(self) -> Iterator[str]:
+        """Yields normalized DOIs lazily, every DOI only once"""
+        return unique_normalized_dois(self.__read_column__())
@@ -7,19 +7,48 @@ class Property(Enum):
     CITES_WORK = "P2860"
     DOI = "P356"
     INSTANCE_OF = "P31"
+    ISSN = "P236"
+    ISSN_L = "P7363"
     ISSUE = "P433"
     LANGUAGE_OF_WORK = "P407"
     MAIN_SUBJECT = "P921"
     OPENALEX_ID = "P10283"
+    ORCID = "P496"
     PAGES = "P304"
     PMID = "P698"
     PUBLICATION_DATE = "P577"
     PUBLISHED_IN = "P1433"
+    RETRIEVED = "P813"
     SERIES_ORDINAL = "P1545"  # aka author position
     STATED_AS = "P1932"
+    STATED_IN = "P248"
     TITLE = "P1476"
     VOLUME = "P478"
 
 
 class StatedIn(Enum):
     OPENALEX = "Q107507571"
+
+
+class KeyType(Enum):
+    DOI = "doi"
+    ISSN_L = "issn_l"
+    ORCID = "orcid"
+    OTHER = "other"
+
+
+class Outcome(Enum):
+    ALREADY_PRESENT = "already_present"
+    # Prepared but neither uploaded nor exported because upload_enabled is False
+    DRY_RUN = "dry_run"
+    EXPORTED = "exported"
+    FAILED = "failed"
+    IMPORTED = "imported"
+    MISSING_IN_OPENALEX = "missing_in_openalex"
+    UNSUPPORTED_TYPE = "unsupported_type"
+    UPDATED = "updated"
+
+
+class ExportFormat(Enum):
+    NDJSON = "ndjson"
+    QUICKSTATEMENTS = "quickstatements"
@@ -0,0 +1,57 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+DOI_PREFIXES = (
+    "https://doi.org/",
+    "http://doi.org/",
+    "https://dx.doi.org/",
+    "http://dx.doi.org/",
+    "doi:",
+)
+
+
+def normalize_doi(doi: str) -> str:
+    """Strip known prefixes and lowercase the DOI.
+    DOIs are case-insensitive so the lowercase form is used as key everywhere"""
+    if doi is None:
+        raise ValueError("doi was None")
+    doi = doi.strip()
+    for prefix in DOI_PREFIXES:
+        if doi.lower().startswith(prefix):
+            doi = doi[len(prefix):]
+            break
+    return doi.lower()
+
+
+def unique_normalized_dois(dois: Iterable[str]) -> Iterator[str]:
+    """Yields every DOI once in normalized form"""
+    processed_dois = set()
+    for doi in dois:
+        doi = normalize_doi(doi)
+        if "http" in doi:
+            raise ValueError(f"http found in this DOI after "
+                             f"removing the prefix: {doi}")
+        if doi not in processed_dois:
+            processed_dois.add(doi)
+            yield doi
+
+
+def openalex_id_without_prefix(id: str) -> str:
+    """Turns e.g. https://openalex.org/W123 into W123"""
+    if id is None:
+        raise ValueError("id was None")
+    return id[id.rfind("/") + 1:]
+
+
+def chunks(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield lists of at most size elements from the iterable"""
+    if size < 1:
+        raise ValueError("size has to be at least 1")
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
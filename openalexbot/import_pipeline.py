@@ -0,0 +1,108 @@
+import logging
+import threading
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Iterable, List, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the input of a stage
+END = object()
+
+
+class Stage(BaseModel):
+    """A stage calls its function on every input.
+    The function returns an iterable of outputs for the next stage"""
+    name: str
+    function: Callable[[Any], Iterable[Any]]
+    workers: int = 1
+
+
+class ImportPipeline(BaseModel):
+    """This runs stages concurrently connected by bounded queues.
+    A full queue blocks the stage before it, so memory stays flat
+    no matter how large the input is."""
+    stages: List[Stage]
+    queue_size: int = 100
+    _stop: threading.Event = PrivateAttr(default_factory=threading.Event)
+    _errors: List[BaseException] = PrivateAttr(default_factory=list)
+
+    def __put__(self, queue: Queue, item: Any):
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def __take__(self, queue: Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                pass
+        return END
+
+    def __fail__(self, name: str, error: BaseException):
+        logger.exception(f"Stage {name} failed, stopping the pipeline", exc_info=error)
+        self._errors.append(error)
+        self._stop.set()
+
+    def __feed__(self, source: Iterable[Any], output_queue: Queue):
+        try:
+            for item in source:
+                self.__put__(output_queue, item)
+                if self._stop.is_set():
+                    return
+        except BaseException as e:
+            self.__fail__("source", e)
+        self.__put__(output_queue, END)
+
+    def __work__(self, stage: Stage, input_queue: Queue, output_queue: Optional[Queue],
+                 remaining_workers: List[int], lock: threading.Lock):
+        try:
+            while True:
+                item = self.__take__(input_queue)
+                if item is END:
+                    # Let the siblings of this worker see the end too
+                    self.__put__(input_queue, END)
+                    break
+                for output in stage.function(item):
+                    if output_queue is not None:
+                        self.__put__(output_queue, output)
+        except BaseException as e:
+            self.__fail__(stage.name, e)
+        with lock:
+            remaining_workers[0] -= 1
+            last_worker = remaining_workers[0] == 0
+        if last_worker:
+            logger.debug(f"Stage {stage.name} is done")
+            if output_queue is not None:
+                self.__put__(output_queue, END)
+
+    def run(self, source: Iterable[Any]):
+        """Feeds the source through all stages and blocks until everything is processed"""
+        if not self.stages:
+            raise ValueError("No stages to run")
+        queues = [Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(
+            target=self.__feed__, args=(source, queues[0]), name="source", daemon=True
+        )]
+        for index, stage in enumerate(self.stages):
+            output_queue = queues[index + 1] if index + 1 < len(queues) else None
+            remaining_workers = [stage.workers]
+            lock = threading.Lock()
+            for number in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self.__work__,
+                    args=(stage, queues[index], output_queue, remaining_workers, lock),
+                    name=f"{stage.name}-{number}",
+                    daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,110 @@
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, TextIO
+
+from pydantic import BaseModel, PrivateAttr
+from wikibaseintegrator import entities
+
+from openalexbot.enums import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+
+class ItemExporter(BaseModel):
+    """This appends prepared items to a file instead of uploading them.
+    NDJSON keeps the full item JSON together with the DOI so it can be uploaded later
+    with OpenAlexBot.upload_export(). QuickStatements v1 can be pasted into
+    https://quickstatements.toolforge.org/"""
+    path: str
+    format: ExportFormat
+    count: int = 0
+    _file: Optional[TextIO] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @staticmethod
+    def __quote__(text: str) -> str:
+        """Quotes a string for QuickStatements. Tabs and newlines would split
+        the command so they become spaces and quotes are escaped"""
+        for whitespace in ("\r\n", "\r", "\n", "\t"):
+            text = text.replace(whitespace, " ")
+        return '"' + text.replace('"', '\\"') + '"'
+
+    def __quickstatements_value__(self, snak: Dict[str, Any]) -> Optional[str]:
+        if snak.get("snaktype") != "value":
+            return None
+        datavalue = snak["datavalue"]
+        value = datavalue["value"]
+        if datavalue["type"] == "wikibase-entityid":
+            return value["id"]
+        elif datavalue["type"] == "string":
+            return self.__quote__(value)
+        elif datavalue["type"] == "monolingualtext":
+            return f'{value["language"]}:{self.__quote__(value["text"])}'
+        elif datavalue["type"] == "time":
+            return f'{value["time"]}/{value["precision"]}'
+        elif datavalue["type"] == "quantity":
+            return value["amount"]
+        elif datavalue["type"] == "globecoordinate":
+            return f'@{value["latitude"]}/{value["longitude"]}'
+        else:
+            raise ValueError(f"Datavalue type {datavalue['type']} is not supported")
+
+    def __quickstatements_snaks__(self, snaks: Dict[str, List[Dict]], source: bool = False) -> List[str]:
+        columns = []
+        for property_, property_snaks in snaks.items():
+            for snak in property_snaks:
+                value = self.__quickstatements_value__(snak)
+                if value is not None:
+                    # Sources are written as S248 instead of P248
+                    columns.extend([f"S{property_[1:]}" if source else property_, value])
+        return columns
+
+    def to_quickstatements(self, item_json: Dict[str, Any]) -> str:
+        """Converts the JSON of a new item or of the claims to add
+        to an existing item into QuickStatements v1 commands"""
+        if item_json.get("id") is not None:
+            subject = item_json["id"]
+            lines = []
+        else:
+            subject = "LAST"
+            lines = ["CREATE"]
+        for language, label in item_json.get("labels", {}).items():
+            lines.append(f'{subject}\tL{language}\t{self.__quote__(label["value"])}')
+        for language, description in item_json.get("descriptions", {}).items():
+            lines.append(f'{subject}\tD{language}\t{self.__quote__(description["value"])}')
+        for property_, statements in item_json.get("claims", {}).items():
+            for statement in statements:
+                value = self.__quickstatements_value__(statement["mainsnak"])
+                if value is None:
+                    continue
+                columns = [subject, property_, value]
+                columns.extend(self.__quickstatements_snaks__(statement.get("qualifiers", {})))
+                references = statement.get("references", [])
+                if len(references) == 0:
+                    lines.append("\t".join(columns))
+                # Repeating a statement with another source adds another reference
+                for reference in references:
+                    lines.append("\t".join(columns + self.__quickstatements_snaks__(reference["snaks"], source=True)))
+        return "\n".join(lines)
+
+    def export(self, doi: str, item: entities.Item):
+        item_json = item.get_json()
+        if self.format == ExportFormat.NDJSON:
+            text = json.dumps({"doi": doi, "item": item_json}, ensure_ascii=False)
+        else:
+            text = self.to_quickstatements(item_json)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(text + "\n")
+            # Flushing makes every exported item survive a crash
+            self._file.flush()
+            self.count += 1
+        logger.info(f"Exported item for DOI '{doi}' to {self.path}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
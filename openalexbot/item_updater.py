@@ -0,0 +1,105 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel
+from wikibaseintegrator import entities
+from wikibaseintegrator.models import Claim
+
+import config
+from openalexbot.enums import Property
+from openalexbot.helpers import chunks
+from openalexbot.request_scheduler import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+# A work has only one of these, an existing value is never second-guessed
+SINGLE_VALUE_PROPERTIES = {
+    Property.DOI.value,
+    Property.INSTANCE_OF.value,
+    Property.ISSUE.value,
+    Property.PAGES.value,
+    Property.PUBLICATION_DATE.value,
+    Property.PUBLISHED_IN.value,
+    Property.TITLE.value,
+    Property.VOLUME.value,
+}
+# An author is either an item or a name string, the series ordinal tells them apart
+AUTHOR_PROPERTIES = {Property.AUTHOR.value, Property.AUTHOR_NAME_STRING.value}
+
+
+class ItemUpdater(BaseModel):
+    """This finds the claims that an existing item lacks
+    compared to the item prepared from OpenAlex, so only those are written.
+
+    The claims of existing items are fetched with one wbgetentities call per chunk of QIDs."""
+    mediawiki_api_url: str
+    scheduler: RequestScheduler
+    # This is the maximum number of ids wbgetentities accepts
+    chunk_size: int = 50
+
+    def get_claims(self, qids: Iterable[str]) -> Dict[str, Dict[str, List[Dict]]]:
+        """Returns the claims JSON of every existing item by QID"""
+        claims: Dict[str, Dict[str, List[Dict]]] = {}
+        for chunk in chunks(sorted(set(qids)), self.chunk_size):
+            result = self.scheduler.request(
+                "POST",
+                self.mediawiki_api_url,
+                mediawiki=True,
+                data=dict(action="wbgetentities", ids="|".join(chunk), props="claims"),
+                headers={"User-Agent": config.user_agent},
+            ).json()
+            if "error" in result:
+                raise ValueError(f"Got error from the MediaWiki API: {result['error']}")
+            for qid, entity in result.get("entities", {}).items():
+                if "missing" not in entity:
+                    claims[qid] = entity.get("claims", {})
+        logger.info(f"Fetched the claims of {len(claims)} existing items")
+        return claims
+
+    @staticmethod
+    def __value_key__(snak: Dict[str, Any]) -> Optional[str]:
+        """Returns a comparable form of the value of the snak"""
+        if snak.get("snaktype") != "value":
+            return None
+        datavalue = snak["datavalue"]
+        value = datavalue["value"]
+        if datavalue["type"] == "wikibase-entityid":
+            return value["id"]
+        elif datavalue["type"] == "time":
+            return f'{value["time"]}/{value["precision"]}'
+        elif datavalue["type"] == "monolingualtext":
+            return f'{value["language"]}:{value["text"]}'
+        elif datavalue["type"] == "quantity":
+            return value["amount"]
+        else:
+            return str(value)
+
+    def __author_ordinals__(self, claims: Dict[str, List[Dict]]) -> Set[str]:
+        ordinals = set()
+        for property_ in AUTHOR_PROPERTIES:
+            for statement in claims.get(property_, []):
+                for qualifier in statement.get("qualifiers", {}).get(Property.SERIES_ORDINAL.value, []):
+                    ordinals.add(self.__value_key__(qualifier))
+        return ordinals
+
+    def missing_claims(self, existing_claims: Dict[str, List[Dict]], item: entities.Item) -> List[Claim]:
+        """Returns the claims of the prepared item that the existing item lacks"""
+        existing_values = {
+            property_: {self.__value_key__(statement["mainsnak"]) for statement in statements}
+            for property_, statements in existing_claims.items()
+        }
+        author_ordinals = self.__author_ordinals__(existing_claims)
+        missing = []
+        for claim in item.claims:
+            claim_json = claim.get_json()
+            property_ = claim_json["mainsnak"]["property"]
+            if property_ in SINGLE_VALUE_PROPERTIES and property_ in existing_values:
+                continue
+            if property_ in AUTHOR_PROPERTIES:
+                ordinals = {self.__value_key__(qualifier) for qualifier in
+                            claim_json.get("qualifiers", {}).get(Property.SERIES_ORDINAL.value, [])}
+                if ordinals & author_ordinals:
+                    continue
+            if self.__value_key__(claim_json["mainsnak"]) not in existing_values.get(property_, set()):
+                missing.append(claim)
+        return missing
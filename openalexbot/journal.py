@@ -0,0 +1,109 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+from openalexbot.enums import Outcome
+from openalexbot.helpers import chunks
+
+logger = logging.getLogger(__name__)
+
+
+class Journal(BaseModel):
+    """This is a durable record of the outcome of every processed DOI backed by SQLite.
+    It makes it possible to resume a run after a crash without redoing finished work.
+    DOIs that failed are retried on the next run.
+
+    Completed DOIs are looked up per chunk in the primary key index
+    instead of being held in memory, so memory stays flat however large the journal grows."""
+    path: str
+    # A dry run skips the DOIs of earlier dry runs, a real run imports them
+    dry_run: bool = False
+    _connection: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __connect__(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Autocommit so every outcome is on disk as soon as it is recorded
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outcomes ("
+                "doi TEXT PRIMARY KEY, "
+                "outcome TEXT NOT NULL, "
+                "qid TEXT, "
+                "reason TEXT, "
+                "timestamp TEXT NOT NULL)"
+            )
+        return self._connection
+
+    def __retried_outcomes__(self) -> Tuple[str, ...]:
+        if self.dry_run:
+            return (Outcome.FAILED.value,)
+        return Outcome.FAILED.value, Outcome.DRY_RUN.value
+
+    def get_completed(self, dois: List[str]) -> Set[str]:
+        """Returns the DOIs that do not have to be processed again"""
+        retried = self.__retried_outcomes__()
+        with self._lock:
+            rows = self.__connect__().execute(
+                f"SELECT doi FROM outcomes WHERE doi IN ({','.join('?' * len(dois))}) "
+                f"AND outcome NOT IN ({','.join('?' * len(retried))})",
+                (*dois, *retried)
+            )
+            return {row[0] for row in rows}
+
+    def is_completed(self, doi: str) -> bool:
+        return doi in self.get_completed([doi])
+
+    def skip_completed(self, dois: Iterable[str], chunk_size: int = 500) -> Iterator[str]:
+        """Yields the DOIs that are not completed in the order given"""
+        for chunk in chunks(dois, chunk_size):
+            completed = self.get_completed(chunk)
+            for doi in chunk:
+                if doi not in completed:
+                    yield doi
+
+    def record(self, doi: str, outcome: Outcome, qid: str = None, reason: str = None):
+        with self._lock:
+            self.__connect__().execute(
+                "INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?, ?)",
+                (doi, outcome.value, qid, reason, datetime.now(timezone.utc).isoformat())
+            )
+
+    def get_outcome(self, doi: str) -> Optional[Outcome]:
+        with self._lock:
+            row = self.__connect__().execute(
+                "SELECT outcome FROM outcomes WHERE doi = ?", (doi,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Outcome(row[0])
+
+    def get_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.__connect__().execute(
+                "SELECT outcome, COUNT(*) FROM outcomes GROUP BY outcome"
+            )
+            return {outcome: count for outcome, count in rows}
+
+    def merge(self, path: str):
+        """Copies all outcomes of another journal e.g. of a shard into this one"""
+        with self._lock:
+            connection = self.__connect__()
+            connection.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                connection.execute("INSERT OR REPLACE INTO outcomes SELECT * FROM other.outcomes")
+            finally:
+                connection.execute("DETACH DATABASE other")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from langdetect import DetectorFactory, LangDetectException  # type: ignore
+from langdetect.detector_factory import PROFILES_DIRECTORY  # type: ignore
+from pydantic import BaseModel, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Scripts that are written in only one language
+# (first code point, last code point, language code)
+SCRIPT_LANGUAGES = (
+    (0x0370, 0x03FF, "el"),
+    (0x0530, 0x058F, "hy"),
+    (0x0590, 0x05FF, "he"),
+    (0x0E00, 0x0E7F, "th"),
+    (0x10A0, 0x10FF, "ka"),
+    (0x3040, 0x30FF, "ja"),
+    (0xAC00, 0xD7AF, "ko"),
+)
+# Kana or Hangul next to Han characters decides between Chinese, Japanese and Korean
+DECISIVE_LANGUAGES = ("ja", "ko")
+
+
+def script_language(title: str) -> Optional[str]:
+    """Returns the language if every letter of the title is written
+    in a script that belongs to a single language"""
+    languages = set()
+    for character in title:
+        if not character.isalpha():
+            continue
+        code_point = ord(character)
+        for first, last, language in SCRIPT_LANGUAGES:
+            if first <= code_point <= last:
+                languages.add(language)
+                break
+        else:
+            if not 0x4E00 <= code_point <= 0x9FFF:
+                # Latin, Cyrillic, Arabic etc. are shared by many languages
+                return None
+    for language in DECISIVE_LANGUAGES:
+        if language in languages:
+            return language
+    if len(languages) == 1:
+        return languages.pop()
+    return None
+
+
+# Every process of the pool loads the profiles once when it starts
+_process_detector: Optional["LanguageDetector"] = None
+
+
+def _initialize_process(seed: int, default_language: str):
+    global _process_detector
+    _process_detector = LanguageDetector(seed=seed, default_language=default_language, max_entries=0)
+    _process_detector.__get_factory__()
+
+
+def _detect_in_process(title: str) -> str:
+    return _process_detector.__detect_with_profiles__(title)
+
+
+class LanguageDetector(BaseModel):
+    """This detects the language of titles with langdetect.
+
+    The profiles are loaded once and the detector is seeded so the same title
+    always gets the same language. A language provided by OpenAlex or given away
+    by the script of the title is used without running langdetect.
+    Results are memoized by a hash of the title.
+
+    With more than one process detect_many() uses a process pool that is started
+    on first use and kept until close(), so the profiles are loaded once per process."""
+    seed: int = 0
+    # Used when langdetect finds nothing to go by e.g. in a title with only digits
+    default_language: str = "en"
+    max_entries: int = 100000
+    processes: int = 1
+    _factory: Optional[DetectorFactory] = PrivateAttr(default=None)
+    _executor: Optional[ProcessPoolExecutor] = PrivateAttr(default=None)
+    _memo: "OrderedDict[bytes, str]" = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __get_factory__(self) -> DetectorFactory:
+        with self._lock:
+            if self._factory is None:
+                logger.info("Loading the language profiles of langdetect")
+                factory = DetectorFactory()
+                factory.load_profile(PROFILES_DIRECTORY)
+                factory.set_seed(self.seed)
+                self._factory = factory
+            return self._factory
+
+    def __detect_with_profiles__(self, title: str) -> str:
+        detector = self.__get_factory__().create()
+        detector.append(title)
+        try:
+            return detector.detect()
+        except LangDetectException:
+            return self.default_language
+
+    def __get_executor__(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned processes are safe to start from any thread, forking from
+                # the threads of the pipeline could copy a held lock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_initialize_process,
+                    initargs=(self.seed, self.default_language),
+                )
+            return self._executor
+
+    @staticmethod
+    def __key__(title: str) -> bytes:
+        return hashlib.blake2b(title.encode(), digest_size=16).digest()
+
+    def __remember__(self, key: bytes, language: str):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._memo[key] = language
+            if len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def __lookup__(self, title: str) -> Optional[str]:
+        """Returns the language if it is known without running langdetect"""
+        with self._lock:
+            key = self.__key__(title)
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        return script_language(title)
+
+    def detect(self, title: str, language: str = None) -> str:
+        """:param language is the language of the work if the source knows it"""
+        if language:
+            return language
+        detected_language = self.__lookup__(title)
+        if detected_language is None:
+            detected_language = self.__detect_with_profiles__(title)
+            self.__remember__(self.__key__(title), detected_language)
+        return detected_language
+
+    def detect_many(self, titles: List[str]) -> List[str]:
+        """Detects the languages of many titles in the same order.
+        With more than one process the titles unknown so far are spread over the process pool"""
+        languages = [self.__lookup__(title) for title in titles]
+        unknown_titles = sorted({title for title, language in zip(titles, languages) if language is None})
+        if self.processes > 1 and len(unknown_titles) > 1:
+            detected_languages = list(self.__get_executor__().map(
+                _detect_in_process,
+                unknown_titles,
+                chunksize=max(1, len(unknown_titles) // (self.processes * 4)),
+            ))
+        else:
+            detected_languages = [self.__detect_with_profiles__(title) for title in unknown_titles]
+        detected = dict(zip(unknown_titles, detected_languages))
+        for title, language in detected.items():
+            self.__remember__(self.__key__(title), language)
+        return [language if language is not None else detected[title]
+                for title, language in zip(titles, languages)]
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
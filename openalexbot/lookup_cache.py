@@ -0,0 +1,134 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from time import time
+from typing import Dict, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+from openalexbot.enums import KeyType
+
+logger = logging.getLogger(__name__)
+
+ORCID_PATTERN = re.compile(r"^\d{4}-\d{4}-\d{4}-\d{3}[\dX]$")
+
+
+class LookupCache(BaseModel):
+    """This is a persistent cache of CirrusSearch results backed by SQLite
+
+    Entries are keyed by the host of the MediaWiki API too,
+    so results of test.wikidata.org are never reused for Wikidata and the other way around.
+    Every entry expires after the time to live of its key type.
+    Empty results are cached too but never longer than negative_ttl.
+    When the cache grows beyond max_entries the least recently used entries are evicted."""
+    path: str
+    # Time to live in seconds per KeyType value
+    ttls: Dict[str, int]
+    negative_ttl: int
+    max_entries: int
+    hits: int = 0
+    misses: int = 0
+    _connection: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _writes_since_eviction: int = PrivateAttr(default=0)
+
+    @staticmethod
+    def key_type(query_string: str) -> KeyType:
+        if query_string.startswith("haswbstatement:P7363="):
+            return KeyType.ISSN_L
+        elif ORCID_PATTERN.match(query_string):
+            return KeyType.ORCID
+        elif query_string.startswith("10."):
+            return KeyType.DOI
+        else:
+            return KeyType.OTHER
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+    def __connect__(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(lookups)")]
+            if len(columns) > 0 and "wikibase" not in columns:
+                logger.warning(f"The lookup cache {self.path} does not know the Wikibase of its entries, "
+                               f"starting over")
+                self._connection.execute("DROP TABLE lookups")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS lookups ("
+                "wikibase TEXT NOT NULL, "
+                "query_string TEXT NOT NULL, "
+                "key_type TEXT NOT NULL, "
+                "result TEXT NOT NULL, "
+                "expires REAL NOT NULL, "
+                "accessed REAL NOT NULL, "
+                "PRIMARY KEY (wikibase, query_string))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)"
+            )
+        return self._connection
+
+    def __evict__(self, connection: sqlite3.Connection):
+        connection.execute("DELETE FROM lookups WHERE expires < ?", (time(),))
+        (count,) = connection.execute("SELECT COUNT(*) FROM lookups").fetchone()
+        if count > self.max_entries:
+            logger.debug(f"Evicting {count - self.max_entries} entries from the lookup cache")
+            connection.execute(
+                "DELETE FROM lookups WHERE rowid IN "
+                "(SELECT rowid FROM lookups ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def get(self, query_string: str, wikibase: str) -> Optional[dict]:
+        """Returns the cached result or None if missing or expired
+        :param wikibase is the host of the MediaWiki API the result came from"""
+        with self._lock:
+            connection = self.__connect__()
+            row = connection.execute(
+                "SELECT result, expires FROM lookups WHERE wikibase = ? AND query_string = ?",
+                (wikibase, query_string)
+            ).fetchone()
+            if row is None or row[1] <= time():
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE lookups SET accessed = ? WHERE wikibase = ? AND query_string = ?",
+                (time(), wikibase, query_string)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, query_string: str, wikibase: str, result: dict, negative: bool = False):
+        key_type = self.key_type(query_string)
+        ttl = self.ttls[key_type.value]
+        if negative:
+            ttl = min(ttl, self.negative_ttl)
+        now = time()
+        with self._lock:
+            connection = self.__connect__()
+            connection.execute(
+                "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?)",
+                (wikibase, query_string, key_type.value, json.dumps(result), now + ttl, now)
+            )
+            self._writes_since_eviction += 1
+            # Counting rows is not free so we only check the size once in a while
+            if self._writes_since_eviction >= 1000:
+                self.__evict__(connection)
+                self._writes_since_eviction = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self.__evict__(self._connection)
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,38 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from pydantic import BaseModel, PrivateAttr
+
+# Returned by get() for keys that are not in the memo
+MISSING = object()
+
+
+class LruMemo(BaseModel):
+    """This is a thread safe memo that forgets the least recently used entries
+    when it holds more than max_entries, so it stays bounded however long the run is.
+    None is a valid value, get() with MISSING as default tells it from a missing key."""
+    max_entries: int
+    _entries: "OrderedDict[Hashable, Any]" = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
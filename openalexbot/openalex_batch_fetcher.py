@@ -0,0 +1,135 @@
+import logging
+from typing import Any, Dict, List, Iterable, Iterator, Optional, Union
+
+import requests
+from openalexapi import Work
+from pydantic import BaseModel
+
+import config
+from openalexbot.helpers import chunks, normalize_doi, openalex_id_without_prefix
+from openalexbot.request_scheduler import RequestScheduler
+from openalexbot.slim_work import SlimWork, loads
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAlexBatchFetcher(BaseModel):
+    """This fetches many works from OpenAlex using the list endpoint
+    and an OR-filter e.g. filter=doi:10.1/a|10.1/b
+    See https://docs.openalex.org/api/get-lists-of-entities/filter-entity-lists"""
+    email: str
+    base_url = "https://api.openalex.org/"
+    # This is the maximum number of values in an OR-filter that OpenAlex accepts
+    chunk_size: int = 50
+    scheduler: Optional[RequestScheduler]
+
+    def __get_response__(self, url: str, params: dict, headers: dict) -> requests.Response:
+        if self.scheduler is not None:
+            return self.scheduler.request("GET", url, params=params, headers=headers)
+        else:
+            return requests.get(url, params=params, headers=headers)
+
+    @staticmethod
+    def __parse__(response: requests.Response) -> Any:
+        if config.slim_works:
+            return loads(response.content)
+        return response.json()
+
+    @staticmethod
+    def __to_work__(data: Dict[str, Any]) -> Union[Work, SlimWork]:
+        if config.slim_works:
+            return SlimWork(data)
+        return Work(**data)
+
+    def __get_works_using_filter__(self, filter_: str, per_page: int) -> List[Union[Work, SlimWork]]:
+        url = self.base_url + "works"
+        params = {
+            "filter": filter_,
+            "per-page": per_page,
+            "mailto": self.email,
+        }
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": config.user_agent,
+        }
+        logger.debug(f"Fetching works from OpenAlex with filter {filter_}")
+        response = self.__get_response__(url, params=params, headers=headers)
+        if response.status_code == 200:
+            return [self.__to_work__(result) for result in self.__parse__(response)["results"]]
+        else:
+            raise ValueError(f"Got {response.status_code} from OpenAlex")
+
+    def iterate_works(self, filter_: str, per_page: int = 200) -> Iterator[Union[Work, SlimWork]]:
+        """Yields every work matching the filter using cursor pagination.
+        See https://docs.openalex.org/api/get-lists-of-entities/paging"""
+        url = self.base_url + "works"
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": config.user_agent,
+        }
+        cursor = "*"
+        while cursor is not None:
+            params = {
+                "filter": filter_,
+                "per-page": per_page,
+                "cursor": cursor,
+                "mailto": self.email,
+            }
+            response = self.__get_response__(url, params=params, headers=headers)
+            if response.status_code != 200:
+                raise ValueError(f"Got {response.status_code} from OpenAlex")
+            data = self.__parse__(response)
+            for result in data["results"]:
+                yield self.__to_work__(result)
+            # The last page has a cursor too but no results
+            cursor = data["meta"].get("next_cursor") if len(data["results"]) > 0 else None
+
+    def __get_single_work__(self, id: str) -> Optional[Union[Work, SlimWork]]:
+        url = self.base_url + "works/" + id
+        params = {"mailto": self.email}
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": config.user_agent,
+        }
+        response = self.__get_response__(url, params=params, headers=headers)
+        if response.status_code == 200:
+            return self.__to_work__(self.__parse__(response))
+        elif response.status_code == 404:
+            return None
+        else:
+            raise ValueError(f"Got {response.status_code} from OpenAlex")
+
+    def get_works_by_dois(self, dois: Iterable[str]) -> Dict[str, Union[Work, SlimWork]]:
+        """Returns a dictionary with the normalized DOI as key.
+        DOIs that OpenAlex does not know about are missing from the result."""
+        works: Dict[str, Union[Work, SlimWork]] = {}
+        batchable = []
+        for doi in {normalize_doi(doi) for doi in dois}:
+            # The separators of the filter syntax cannot be escaped
+            if "|" in doi or "," in doi:
+                work = self.__get_single_work__(f"doi:{doi}")
+                if work is not None:
+                    works[doi] = work
+            else:
+                batchable.append(doi)
+        for chunk in chunks(sorted(batchable), self.chunk_size):
+            for work in self.__get_works_using_filter__(
+                    filter_=f"doi:{'|'.join(chunk)}",
+                    per_page=len(chunk)
+            ):
+                if work.ids.doi is not None:
+                    works[normalize_doi(work.ids.doi)] = work
+        logger.info(f"Fetched {len(works)} works from OpenAlex")
+        return works
+
+    def get_works_by_openalex_ids(self, ids: Iterable[str]) -> Dict[str, Union[Work, SlimWork]]:
+        """Returns a dictionary with the OpenAlex ID without prefix e.g. "W123" as key.
+        IDs that OpenAlex does not know about are missing from the result."""
+        works: Dict[str, Union[Work, SlimWork]] = {}
+        for chunk in chunks(sorted({openalex_id_without_prefix(id) for id in ids}), self.chunk_size):
+            for work in self.__get_works_using_filter__(
+                    filter_=f"openalex_id:{'|'.join(chunk)}",
+                    per_page=len(chunk)
+            ):
+                works[openalex_id_without_prefix(work.id)] = work
+        return works
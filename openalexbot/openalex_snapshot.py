@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from openalexapi import Work
+from pydantic import BaseModel, PrivateAttr
+
+import config
+from openalexbot.helpers import chunks, normalize_doi, openalex_id_without_prefix
+from openalexbot.slim_work import SlimWork, loads
+
+try:
+    import indexed_gzip  # type: ignore
+except ImportError:
+    indexed_gzip = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_EXTENSIONS = (".gz", ".jsonl", ".json")
+# Distance in the uncompressed stream between the seek points of a .gz file.
+# Reading a work decompresses at most this much, every seek point takes about 32 KB on disk.
+SEEK_POINT_SPACING = 4 * 1024 * 1024
+
+
+class OpenAlexSnapshot(BaseModel):
+    """This reads works from a local copy of the OpenAlex snapshot
+    instead of calling the API. See https://docs.openalex.org/download-snapshot
+
+    The path can be a single gzipped or plain JSON-lines file or a directory of them.
+    A sidecar SQLite index maps DOIs and OpenAlex IDs to the file and offset
+    of the line, so works can be read without scanning the snapshot.
+    A gzip stream cannot be entered in the middle, so reading .gz files needs the indexed_gzip
+    package. The seek points it finds while indexing are kept next to the index.
+    It has the same interface as OpenAlexBatchFetcher."""
+    path: str
+    index_path: str
+    _connection: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __connect__(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.index_path, check_same_thread=False)
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(files)")]
+            if len(columns) > 0 and "size" not in columns:
+                # Indexes made before the size was recorded are all indexed again
+                self._connection.execute("ALTER TABLE files ADD COLUMN size INTEGER NOT NULL DEFAULT -1")
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "id INTEGER PRIMARY KEY, filename TEXT UNIQUE NOT NULL, mtime REAL NOT NULL, "
+                "size INTEGER NOT NULL DEFAULT -1);"
+                "CREATE TABLE IF NOT EXISTS dois ("
+                "doi TEXT PRIMARY KEY, file_id INTEGER NOT NULL, offset INTEGER NOT NULL) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS openalex_ids ("
+                "id TEXT PRIMARY KEY, file_id INTEGER NOT NULL, offset INTEGER NOT NULL) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS dois_file_id ON dois (file_id);"
+                "CREATE INDEX IF NOT EXISTS openalex_ids_file_id ON openalex_ids (file_id);"
+            )
+        return self._connection
+
+    def __list_files__(self) -> List[str]:
+        if os.path.isfile(self.path):
+            return [self.path]
+        filenames = []
+        for directory, _, files in os.walk(self.path):
+            for file in files:
+                if file.endswith(SNAPSHOT_EXTENSIONS):
+                    filenames.append(os.path.join(directory, file))
+        # The snapshot has one directory per updated_date so sorting
+        # makes the newest version of a work win in the index
+        return sorted(filenames)
+
+    @property
+    def seek_points_directory(self) -> str:
+        return f"{self.index_path}.seek_points"
+
+    def __seek_points_path__(self, file_id: int) -> str:
+        return os.path.join(self.seek_points_directory, f"{file_id}.gzidx")
+
+    def __open__(self, filename: str, file_id: int) -> BinaryIO:
+        if not filename.endswith(".gz"):
+            return open(filename, "rb")
+        if indexed_gzip is None:
+            raise ValueError("Reading works from .gz snapshot files requires the indexed_gzip package, "
+                             "install it or decompress the snapshot")
+        seek_points = self.__seek_points_path__(file_id)
+        if os.path.exists(seek_points):
+            return indexed_gzip.IndexedGzipFile(filename, index_file=seek_points)
+        # The seek points are created while the file is read from the start
+        return indexed_gzip.IndexedGzipFile(filename, spacing=SEEK_POINT_SPACING)
+
+    def __drop_file__(self, connection: sqlite3.Connection, file_id: int):
+        connection.execute("DELETE FROM dois WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM openalex_ids WHERE file_id = ?", (file_id,))
+        if os.path.exists(self.__seek_points_path__(file_id)):
+            os.remove(self.__seek_points_path__(file_id))
+
+    def __index_file__(self, connection: sqlite3.Connection, filename: str):
+        stat = os.stat(filename)
+        # Keeping the id of a changed file keeps the rows of the other tables pointing at it
+        connection.execute(
+            "INSERT INTO files (filename, mtime, size) VALUES (?, ?, ?) "
+            "ON CONFLICT (filename) DO UPDATE SET mtime = excluded.mtime, size = excluded.size",
+            (filename, stat.st_mtime, stat.st_size)
+        )
+        (file_id,) = connection.execute("SELECT id FROM files WHERE filename = ?", (filename,)).fetchone()
+        # The offsets and seek points of a changed file are stale
+        self.__drop_file__(connection, file_id)
+        dois, openalex_ids = [], []
+        offset = 0
+        with self.__open__(filename, file_id) as file:
+            # The offset is in the uncompressed stream
+            for line in file:
+                if line.strip():
+                    record = loads(line)
+                    openalex_ids.append((openalex_id_without_prefix(record["id"]), file_id, offset))
+                    doi = record.get("doi") or record.get("ids", {}).get("doi")
+                    if doi:
+                        dois.append((normalize_doi(doi), file_id, offset))
+                offset += len(line)
+            if filename.endswith(".gz"):
+                os.makedirs(self.seek_points_directory, exist_ok=True)
+                file.build_full_index()
+                file.export_index(self.__seek_points_path__(file_id))
+        for table, key_column, rows in (("dois", "doi", dois), ("openalex_ids", "id", openalex_ids)):
+            # The work in the later file wins, also when an earlier file is indexed again
+            connection.executemany(
+                f"INSERT INTO {table} VALUES (?, ?, ?) "
+                f"ON CONFLICT ({key_column}) DO UPDATE SET file_id = excluded.file_id, offset = excluded.offset "
+                f"WHERE (SELECT filename FROM files WHERE id = excluded.file_id) "
+                f">= (SELECT filename FROM files WHERE id = {table}.file_id)",
+                rows
+            )
+        connection.commit()
+        logger.info(f"Indexed {len(openalex_ids)} works in {filename}")
+
+    def build_index(self):
+        """Indexes every file that is new or changed since it was indexed
+        and forgets the works of the files that are gone"""
+        with self._lock:
+            connection = self.__connect__()
+            indexed = {filename: (file_id, mtime, size) for file_id, filename, mtime, size
+                       in connection.execute("SELECT id, filename, mtime, size FROM files")}
+            filenames = self.__list_files__()
+            for filename in set(indexed) - set(filenames):
+                logger.info(f"{filename} is no longer in the snapshot, dropping its works from the index")
+                file_id = indexed[filename][0]
+                self.__drop_file__(connection, file_id)
+                connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            connection.commit()
+            for filename in filenames:
+                stat = os.stat(filename)
+                file_id, mtime, size = indexed.get(filename, (None, None, None))
+                if (mtime, size) != (stat.st_mtime, stat.st_size) or (
+                        filename.endswith(".gz") and not os.path.exists(self.__seek_points_path__(file_id))):
+                    self.__index_file__(connection, filename)
+
+    def __read_works__(self, table: str, keys: List[str]) -> Dict[str, Union[Work, SlimWork]]:
+        locations: List[Tuple[str, str, int, int]] = []
+        with self._lock:
+            connection = self.__connect__()
+            key_column = "doi" if table == "dois" else "id"
+            # SQLite limits the number of parameters of a query
+            for chunk in chunks(keys, 500):
+                locations.extend(connection.execute(
+                    f"SELECT {table}.{key_column}, files.filename, files.id, {table}.offset "
+                    f"FROM {table} JOIN files ON files.id = {table}.file_id "
+                    f"WHERE {table}.{key_column} IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ))
+        works: Dict[str, Union[Work, SlimWork]] = {}
+        # Each file is opened once and read with increasing offsets
+        locations.sort(key=lambda location: (location[1], location[3]))
+        current_filename, file = None, None
+        try:
+            for key, filename, file_id, offset in locations:
+                if filename != current_filename:
+                    if file is not None:
+                        file.close()
+                    current_filename, file = filename, self.__open__(filename, file_id)
+                file.seek(offset)
+                line = file.readline()
+                works[key] = SlimWork.parse(line) if config.slim_works else Work(**json.loads(line))
+        finally:
+            if file is not None:
+                file.close()
+        return works
+
+    def get_works_by_dois(self, dois: Iterable[str]) -> Dict[str, Union[Work, SlimWork]]:
+        """Returns a dictionary with the normalized DOI as key.
+        DOIs missing in the snapshot are missing from the result."""
+        works = self.__read_works__("dois", sorted({normalize_doi(doi) for doi in dois}))
+        logger.info(f"Read {len(works)} works from the OpenAlex snapshot")
+        return works
+
+    def get_works_by_openalex_ids(self, ids: Iterable[str]) -> Dict[str, Union[Work, SlimWork]]:
+        """Returns a dictionary with the OpenAlex ID without prefix e.g. "W123" as key."""
+        return self.__read_works__("openalex_ids", sorted({openalex_id_without_prefix(id) for id in ids}))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,15 @@
+from typing import List
+
+from openalexbot.enums import Property
+from openalexbot.qid_index import QidIndex
+
+
+class OrcidIndex(QidIndex):
+    """This maps ORCIDs of authors to QIDs"""
+    properties: List[str] = [Property.ORCID.value]
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        """Turns https://orcid.org/0000-0002-1825-009x into 0000-0002-1825-009X"""
+        value = value.strip()
+        return value[value.rfind("/") + 1:].upper()
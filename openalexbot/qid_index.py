@@ -0,0 +1,198 @@
+import bz2
+import csv
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+from openalexbot.helpers import chunks
+
+logger = logging.getLogger(__name__)
+
+
+class QidIndex(BaseModel):
+    """This is a local index from values of external identifier properties to QIDs.
+    It is stored in SQLite and opened lazily on the first lookup.
+
+    It can be built from a Wikidata JSON dump or from a CSV/TSV export
+    from the Wikidata Query Service with the columns item and value."""
+    path: str
+    # The properties are looked up in this order
+    properties: List[str]
+    _connection: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return value.strip()
+
+    def __connect__(self) -> sqlite3.Connection:
+        if self._connection is None:
+            logger.info(f"Opening the index {self.path}")
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "property TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "qid TEXT NOT NULL, "
+                "PRIMARY KEY (property, value)) WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, value: str) -> Optional[str]:
+        """Returns the QID of the value or None"""
+        value = self.normalize(value)
+        with self._lock:
+            connection = self.__connect__()
+            for property_ in self.properties:
+                row = connection.execute(
+                    "SELECT qid FROM entries WHERE property = ? AND value = ?",
+                    (property_, value)
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+        return None
+
+    def get_many(self, values: Iterable[str]) -> Dict[str, str]:
+        """Returns a dictionary with the normalized value as key and the QID as value.
+        Values missing in the index are missing from the result."""
+        remaining = {self.normalize(value) for value in values}
+        qids: Dict[str, str] = {}
+        with self._lock:
+            connection = self.__connect__()
+            for property_ in self.properties:
+                # SQLite limits the number of parameters of a query
+                for chunk in chunks(sorted(remaining), 500):
+                    rows = connection.execute(
+                        f"SELECT value, qid FROM entries WHERE property = ? "
+                        f"AND value IN ({','.join('?' * len(chunk))})",
+                        (property_, *chunk)
+                    )
+                    for value, qid in rows:
+                        qids[value] = qid
+                remaining -= qids.keys()
+        return qids
+
+    def upsert(self, rows: Iterable[Tuple[str, str, str]], dump_date: Optional[datetime] = None) -> int:
+        """Inserts or replaces (property, value, qid) rows and returns the number of rows
+        :param dump_date is when the data was taken from Wikidata, now if None"""
+        count = 0
+        with self._lock:
+            connection = self.__connect__()
+            for chunk in chunks(rows, 10000):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    [(property_, self.normalize(value), qid) for property_, value, qid in chunk]
+                )
+                count += len(chunk)
+                logger.debug(f"Wrote {count} rows to {self.path}")
+            now = datetime.now(timezone.utc)
+            connection.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                [("updated", now.isoformat()), ("dump_date", (dump_date or now).isoformat())]
+            )
+            connection.commit()
+        logger.info(f"Wrote {count} rows to the index {self.path}")
+        return count
+
+    def __get_date__(self, key: str) -> Optional[datetime]:
+        with self._lock:
+            row = self.__connect__().execute(
+                "SELECT value FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0])
+
+    @property
+    def updated(self) -> Optional[datetime]:
+        """When the index was last written to"""
+        return self.__get_date__("updated")
+
+    @property
+    def dump_date(self) -> Optional[datetime]:
+        """When the data of the last dump or export was taken from Wikidata"""
+        return self.__get_date__("dump_date")
+
+    @staticmethod
+    def __file_date__(filename: str) -> datetime:
+        """The date in the name of dumps like wikidata-20220103-all.json.gz,
+        otherwise when the file was written e.g. downloaded"""
+        match = re.search(r"(?<!\d)(\d{8})(?!\d)", os.path.basename(filename))
+        if match is not None:
+            try:
+                return datetime.strptime(match.group(1), "%Y%m%d").replace(tzinfo=timezone.utc)
+            except ValueError:
+                pass
+        return datetime.fromtimestamp(os.path.getmtime(filename), timezone.utc)
+
+    @staticmethod
+    def __open__(filename: str) -> TextIO:
+        if filename.endswith(".gz"):
+            return gzip.open(filename, "rt", encoding="utf-8")
+        elif filename.endswith(".bz2"):
+            return bz2.open(filename, "rt", encoding="utf-8")
+        else:
+            return open(filename, encoding="utf-8")
+
+    def __iterate_dump__(self, filename: str) -> Iterator[Tuple[str, str, str]]:
+        """Streams a Wikidata JSON dump e.g. latest-all.json.gz with one entity per line.
+        Only lines mentioning one of our properties are parsed."""
+        markers = [f'"{property_}"' for property_ in self.properties]
+        with self.__open__(filename) as file:
+            for line in file:
+                if not any(marker in line for marker in markers):
+                    continue
+                line = line.strip().rstrip(",")
+                if line in ("[", "]", ""):
+                    continue
+                entity = json.loads(line)
+                claims = entity.get("claims", {})
+                for property_ in self.properties:
+                    for claim in claims.get(property_, []):
+                        if claim.get("rank") == "deprecated":
+                            continue
+                        datavalue = claim["mainsnak"].get("datavalue")
+                        if datavalue is not None and isinstance(datavalue["value"], str):
+                            yield property_, datavalue["value"], entity["id"]
+
+    def __iterate_export__(self, filename: str, property_: str) -> Iterator[Tuple[str, str, str]]:
+        """Reads a CSV or TSV with the columns item and value e.g. from
+        SELECT ?item ?value WHERE { ?item wdt:P7363 ?value }"""
+        with self.__open__(filename) as file:
+            delimiter = "\t" if ".tsv" in filename else ","
+            for row in csv.DictReader(file, delimiter=delimiter):
+                # WDQS exports TSV with a leading ? and values wrapped in <> and ""
+                row = {key.lstrip("?"): value.strip("<>\"") for key, value in row.items()}
+                qid = row["item"][row["item"].rfind("/") + 1:]
+                yield property_, row["value"], qid
+
+    def build_from_dump(self, filename: str, dump_date: Optional[datetime] = None) -> int:
+        """:param dump_date defaults to the date in the filename or when the file was written"""
+        return self.upsert(self.__iterate_dump__(filename), dump_date=dump_date or self.__file_date__(filename))
+
+    def build_from_export(self, filename: str, property_: str, dump_date: Optional[datetime] = None) -> int:
+        """:param dump_date defaults to the date in the filename or when the file was written"""
+        if property_ not in self.properties:
+            raise ValueError(f"{property_} is not one of {self.properties}")
+        return self.upsert(self.__iterate_export__(filename, property_),
+                           dump_date=dump_date or self.__file_date__(filename))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,65 @@
+import logging
+import threading
+from time import monotonic, sleep
+from typing import Dict, List
+
+from pydantic import BaseModel, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter(BaseModel):
+    """This is a thread safe token bucket per host.
+    The bucket holds at most one second worth of tokens so bursts stay small.
+
+    The rate adapts to the server: it is halved when the server pushes back
+    and grows slowly back to the configured ceiling while requests succeed."""
+    # Maximum requests per second per host
+    rates: Dict[str, float]
+    default_rate: float = 1.0
+    minimum_rate: float = 0.1
+    # Fraction of the ceiling added to the rate after each successful request
+    increase_step: float = 0.05
+    _current_rates: Dict[str, float] = PrivateAttr(default_factory=dict)
+    # host -> [tokens, timestamp of last refill]
+    _buckets: Dict[str, List[float]] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def ceiling(self, host: str) -> float:
+        return self.rates.get(host, self.default_rate)
+
+    def rate(self, host: str) -> float:
+        return self._current_rates.get(host, self.ceiling(host))
+
+    def slow_down(self, host: str):
+        with self._lock:
+            rate = max(self.minimum_rate, self.rate(host) / 2)
+            self._current_rates[host] = rate
+        logger.info(f"Slowing down requests to {host} to {rate:.2f}/s")
+
+    def speed_up(self, host: str):
+        with self._lock:
+            if host in self._current_rates:
+                ceiling = self.ceiling(host)
+                rate = self._current_rates[host] + ceiling * self.increase_step
+                if rate >= ceiling:
+                    del self._current_rates[host]
+                else:
+                    self._current_rates[host] = rate
+
+    def acquire(self, host: str):
+        """Blocks until a request to the host is allowed"""
+        while True:
+            with self._lock:
+                rate = self.rate(host)
+                capacity = max(1.0, rate)
+                now = monotonic()
+                bucket = self._buckets.setdefault(host, [capacity, now])
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = (1 - bucket[0]) / rate
+            logger.debug(f"Rate limit for {host} reached, sleeping {wait:.3f}s")
+            sleep(wait)
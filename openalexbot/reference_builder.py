@@ -0,0 +1,57 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from time import time
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+from wikibaseintegrator import datatypes
+from wikibaseintegrator.models import Claim
+
+from openalexbot.enums import Property, StatedIn
+from openalexbot.helpers import openalex_id_without_prefix
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceBuilder(BaseModel):
+    """This builds the references pointing to OpenAlex.
+
+    The retrieved date and stated in claims are the same for every reference
+    made on the same day, so they are built once per day and shared.
+    Only the OpenAlex ID claim is new for every reference."""
+    _retrieved_date: Optional[Claim] = PrivateAttr(default=None)
+    _stated_in: Optional[Claim] = PrivateAttr(default=None)
+    # Unix time of the next midnight in UTC
+    _expires: float = PrivateAttr(default=0.0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __shared_claims__(self) -> Tuple[Claim, Claim]:
+        with self._lock:
+            if time() >= self._expires:
+                today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+                logger.debug(f"Building the shared reference claims for {today.date()}")
+                self._retrieved_date = datatypes.Time(
+                    prop_nr=Property.RETRIEVED.value,
+                    time=today.strftime("+%Y-%m-%dT%H:%M:%SZ")
+                )
+                self._stated_in = datatypes.Item(
+                    prop_nr=Property.STATED_IN.value,
+                    value=StatedIn.OPENALEX.value
+                )
+                self._expires = (today + timedelta(days=1)).timestamp()
+            return self._retrieved_date, self._stated_in
+
+    def build(self, openalex_id: str) -> List[Claim]:
+        """:param openalex_id with or without prefix e.g. https://openalex.org/A123"""
+        if openalex_id is None:
+            raise ValueError("openalex_id was None")
+        retrieved_date, stated_in = self.__shared_claims__()
+        return [
+            retrieved_date,
+            stated_in,
+            datatypes.ExternalID(
+                prop_nr=Property.OPENALEX_ID.value,
+                value=openalex_id_without_prefix(openalex_id)
+            ),
+        ]
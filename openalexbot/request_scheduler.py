@@ -0,0 +1,127 @@
+import logging
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import sleep
+from typing import Any, Callable, Optional, Tuple, Type
+from urllib.parse import urlparse
+
+import requests
+from pydantic import BaseModel
+
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.run_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# MediaWiki answers these with HTTP 200 and an error in the body
+RETRY_MEDIAWIKI_ERROR_CODES = {"maxlag", "ratelimited", "readonly"}
+
+
+class RequestScheduler(BaseModel):
+    """All network calls of the bot go through this class.
+    It waits for the rate limiter of the host, honors Retry-After and the
+    maxlag of Wikidata and retries with exponential backoff and full jitter."""
+    rate_limiter: RateLimiter
+    # A shared session reuses connections across requests
+    session: Optional[requests.Session]
+    max_retries: int = 8
+    backoff_base: float = 1.0
+    backoff_max: float = 120.0
+    # See https://www.mediawiki.org/wiki/Manual:Maxlag_parameter
+    maxlag: int = 5
+    # Counts the requests and response bytes per host
+    metrics: Optional[RunMetrics]
+
+    def __backoff__(self, attempt: int, retry_after: Optional[float]) -> float:
+        wait = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        return wait
+
+    @staticmethod
+    def __parse_retry_after__(response: requests.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        # It can also be a HTTP date
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def __retry_reason__(self, response: requests.Response,
+                         mediawiki: bool) -> Tuple[Optional[str], Optional[float]]:
+        """Returns why the request should be retried and how long the server asked us to wait"""
+        if response.status_code in RETRY_STATUS_CODES:
+            return f"HTTP {response.status_code}", self.__parse_retry_after__(response)
+        if mediawiki and response.status_code == 200:
+            try:
+                error = response.json().get("error", {})
+            except ValueError:
+                return None, None
+            code = error.get("code")
+            if code in RETRY_MEDIAWIKI_ERROR_CODES:
+                retry_after = self.__parse_retry_after__(response)
+                if code == "maxlag" and "lag" in error:
+                    retry_after = max(retry_after or 0, float(error["lag"]))
+                return code, retry_after
+        return None, None
+
+    def request(self, method: str, url: str, mediawiki: bool = False, **kwargs: Any) -> requests.Response:
+        """Sends a HTTP request and retries when the server is overloaded.
+        :param mediawiki adds maxlag to the data and checks the body for MediaWiki errors"""
+        host = urlparse(url).netloc
+        if mediawiki:
+            kwargs["data"] = dict(kwargs.get("data") or {}, format="json", maxlag=self.maxlag)
+        reason = None
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(host)
+            retry_after = None
+            try:
+                if self.session is not None:
+                    response = self.session.request(method, url, **kwargs)
+                else:
+                    response = requests.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason = type(e).__name__
+            else:
+                reason, retry_after = self.__retry_reason__(response, mediawiki)
+                if self.metrics is not None:
+                    self.metrics.add_transfer(host, len(response.content))
+                if reason is None:
+                    self.rate_limiter.speed_up(host)
+                    return response
+            self.rate_limiter.slow_down(host)
+            if attempt < self.max_retries:
+                wait = self.__backoff__(attempt, retry_after)
+                logger.warning(f"Got {reason} from {host}, retrying in {wait:.1f}s")
+                sleep(wait)
+        raise ValueError(f"Giving up on {url} after {self.max_retries} retries, last error was {reason}")
+
+    def call(self, host: str, function: Callable, *args: Any,
+             retry_on: Tuple[Type[BaseException], ...] = (), **kwargs: Any) -> Any:
+        """Calls a function doing its own networking e.g. item.write() of WikibaseIntegrator.
+        :param retry_on are the exceptions that are safe to retry"""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(host)
+            try:
+                result = function(*args, **kwargs)
+            except retry_on as e:
+                self.rate_limiter.slow_down(host)
+                if attempt == self.max_retries:
+                    raise
+                wait = self.__backoff__(attempt, None)
+                logger.warning(f"Got {type(e).__name__} from {host}, retrying in {wait:.1f}s")
+                sleep(wait)
+            else:
+                self.rate_limiter.speed_up(host)
+                return result
+
+    class Config:
+        arbitrary_types_allowed = True
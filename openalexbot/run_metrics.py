@@ -0,0 +1,268 @@
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, TypeVar
+
+from pydantic import BaseModel, PrivateAttr
+from rich.table import Table
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Durations are counted in buckets growing by 5 %, so the percentiles are within 5 %
+# of the exact value and the memory does not grow with the number of calls
+BUCKET_GROWTH = 1.05
+BUCKET_MIN_SECONDS = 1e-6
+
+
+def bucket_of(duration: float) -> int:
+    if duration <= BUCKET_MIN_SECONDS:
+        return 0
+    return math.ceil(math.log(duration / BUCKET_MIN_SECONDS, BUCKET_GROWTH))
+
+
+def bucket_upper_bound(bucket: int) -> float:
+    return BUCKET_MIN_SECONDS * BUCKET_GROWTH ** bucket
+
+
+class StageMetrics(BaseModel):
+    count: int = 0
+    errors: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    # Number of durations per log-scale bucket
+    buckets: Dict[int, int] = {}
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.maximum = max(self.maximum, duration)
+        bucket = bucket_of(duration)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other: "StageMetrics"):
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def percentile(self, quantile: float) -> float:
+        """Nearest-rank percentile as the upper bound of its bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(quantile * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(bucket_upper_bound(bucket), self.maximum)
+        return self.maximum
+
+    def quantiles(self) -> Dict[float, float]:
+        return {quantile: self.percentile(quantile) for quantile in QUANTILES}
+
+
+class TransferMetrics(BaseModel):
+    requests: int = 0
+    bytes: int = 0
+
+
+class CacheMetrics(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+
+class RunMetrics(BaseModel):
+    """This collects thread safe timings per stage, HTTP transfers per host
+    and cache hit rates during a run. Stages are named by what they do
+    e.g. "openalex_fetch" or "cirrussearch_orcid". A stage does not count the time
+    of the stages measured inside it on the same thread, so the stages of a thread
+    add up to its run time instead of overlapping."""
+    stages: Dict[str, StageMetrics] = {}
+    transfers: Dict[str, TransferMetrics] = {}
+    caches: Dict[str, CacheMetrics] = {}
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    # Per thread a list with the time of the nested stages of every open measure()
+    _nested: threading.local = PrivateAttr(default_factory=threading.local)
+
+    def record(self, stage: str, duration: float, error: bool = False):
+        with self._lock:
+            metrics = self.stages.setdefault(stage, StageMetrics())
+            metrics.add(duration)
+            if error:
+                metrics.errors += 1
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Times the body of the with statement without the stages measured inside it,
+        exceptions are counted as errors"""
+        open_stages = getattr(self._nested, "stages", None)
+        if open_stages is None:
+            open_stages = self._nested.stages = []
+        open_stages.append(0.0)
+        start = perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            duration = perf_counter() - start
+            nested = open_stages.pop()
+            if open_stages:
+                open_stages[-1] += duration
+            self.record(stage, duration - nested, error=error)
+
+    def measure_iterable(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Times the production of every item of a lazy iterable"""
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, perf_counter() - start)
+            yield item
+
+    def add_transfer(self, host: str, bytes: int):
+        with self._lock:
+            metrics = self.transfers.setdefault(host, TransferMetrics())
+            metrics.requests += 1
+            metrics.bytes += bytes
+
+    def add_cache_lookups(self, cache: str, hits: int = 0, misses: int = 0):
+        with self._lock:
+            metrics = self.caches.setdefault(cache, CacheMetrics())
+            metrics.hits += hits
+            metrics.misses += misses
+
+    def merge(self, other: "RunMetrics"):
+        """Adds the metrics of another run e.g. of a shard to these"""
+        with self._lock:
+            for name, metrics in other.stages.items():
+                self.stages.setdefault(name, StageMetrics()).merge(metrics)
+            for host, metrics in other.transfers.items():
+                transfer = self.transfers.setdefault(host, TransferMetrics())
+                transfer.requests += metrics.requests
+                transfer.bytes += metrics.bytes
+            for name, metrics in other.caches.items():
+                cache = self.caches.setdefault(name, CacheMetrics())
+                cache.hits += metrics.hits
+                cache.misses += metrics.misses
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return dict(
+                stages={
+                    name: dict(
+                        count=metrics.count,
+                        errors=metrics.errors,
+                        total_seconds=metrics.total,
+                        max_seconds=metrics.maximum,
+                        **{f"p{round(quantile * 100)}_seconds": value
+                           for quantile, value in metrics.quantiles().items()},
+                    )
+                    for name, metrics in sorted(self.stages.items())
+                },
+                transfers={host: metrics.dict() for host, metrics in sorted(self.transfers.items())},
+                caches={
+                    name: dict(hits=metrics.hits, misses=metrics.misses, hit_rate=metrics.hit_rate)
+                    for name, metrics in sorted(self.caches.items())
+                },
+            )
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text format"""
+        data = self.to_dict()
+        lines = [
+            "# HELP openalexbot_stage_duration_seconds Duration of the stages of the run",
+            "# TYPE openalexbot_stage_duration_seconds summary",
+        ]
+        for name, stage in data["stages"].items():
+            for quantile in QUANTILES:
+                lines.append(f'openalexbot_stage_duration_seconds{{stage="{name}",quantile="{quantile}"}} '
+                             f'{stage[f"p{round(quantile * 100)}_seconds"]}')
+            lines.append(f'openalexbot_stage_duration_seconds_sum{{stage="{name}"}} {stage["total_seconds"]}')
+            lines.append(f'openalexbot_stage_duration_seconds_count{{stage="{name}"}} {stage["count"]}')
+        lines.extend([
+            "# HELP openalexbot_stage_errors_total Number of stage calls that raised",
+            "# TYPE openalexbot_stage_errors_total counter",
+        ])
+        for name, stage in data["stages"].items():
+            lines.append(f'openalexbot_stage_errors_total{{stage="{name}"}} {stage["errors"]}')
+        lines.extend([
+            "# HELP openalexbot_http_requests_total Number of HTTP requests per host",
+            "# TYPE openalexbot_http_requests_total counter",
+        ])
+        for host, transfer in data["transfers"].items():
+            lines.append(f'openalexbot_http_requests_total{{host="{host}"}} {transfer["requests"]}')
+        lines.extend([
+            "# HELP openalexbot_http_response_bytes_total Size of the HTTP response bodies per host",
+            "# TYPE openalexbot_http_response_bytes_total counter",
+        ])
+        for host, transfer in data["transfers"].items():
+            lines.append(f'openalexbot_http_response_bytes_total{{host="{host}"}} {transfer["bytes"]}')
+        lines.extend([
+            "# HELP openalexbot_cache_lookups_total Number of cache lookups per result",
+            "# TYPE openalexbot_cache_lookups_total counter",
+        ])
+        for name, cache in data["caches"].items():
+            lines.append(f'openalexbot_cache_lookups_total{{cache="{name}",result="hit"}} {cache["hits"]}')
+            lines.append(f'openalexbot_cache_lookups_total{{cache="{name}",result="miss"}} {cache["misses"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary_table(self) -> Table:
+        table = Table(title="Run summary", caption="Stages exclude the stages measured inside them")
+        for column in ("Stage", "Count", "Errors", "Total (s)", "p50 (ms)", "p95 (ms)", "p99 (ms)"):
+            table.add_column(column, justify="left" if column == "Stage" else "right")
+        data = self.to_dict()
+        for name, stage in data["stages"].items():
+            table.add_row(
+                name,
+                str(stage["count"]),
+                str(stage["errors"]),
+                f'{stage["total_seconds"]:.1f}',
+                f'{stage["p50_seconds"] * 1000:.0f}',
+                f'{stage["p95_seconds"] * 1000:.0f}',
+                f'{stage["p99_seconds"] * 1000:.0f}',
+            )
+        for host, transfer in data["transfers"].items():
+            table.add_row(f"HTTP {host}", str(transfer["requests"]), "", f'{transfer["bytes"] / 1e6:.1f} MB',
+                          "", "", "")
+        for name, cache in data["caches"].items():
+            table.add_row(f"Cache {name}", str(cache["hits"] + cache["misses"]), "",
+                          f'{cache["hit_rate"]:.1%} hits', "", "", "")
+        return table
+
+    @staticmethod
+    def __write_atomically__(path: str, text: str):
+        # Dashboards reading the file should never see half of it
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temporary_path, path)
+
+    def write_json(self, path: str):
+        self.__write_atomically__(path, json.dumps(self.to_dict(), indent=2))
+        logger.info(f"Wrote the run metrics to {path}")
+
+    def write_prometheus(self, path: str):
+        self.__write_atomically__(path, self.to_prometheus())
+        logger.info(f"Wrote the run metrics to {path}")
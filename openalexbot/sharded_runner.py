@@ -0,0 +1,237 @@
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from rich import print
+
+import config
+from openalexbot import OpenAlexBot
+from openalexbot.doi_index import DoiIndex
+from openalexbot.doi_reader import DoiReader
+from openalexbot.journal import Journal
+from openalexbot.openalex_snapshot import OpenAlexSnapshot
+from openalexbot.run_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def _run_shard(email: str, work_directory: str, index: int, shards: int,
+               rates: Dict[str, float], default_rate: float):
+    """Imports one shard in its own process with its own login session"""
+    paths = ShardPaths(work_directory=work_directory, index=index)
+    config.rate_limits = rates
+    config.default_rate_limit = default_rate
+    config.streaming_csv = True
+    config.press_enter_to_continue = False
+    config.journal_enabled = True
+    config.journal_path = paths.journal
+    config.export_path = paths.export
+    # SQLite files written during the run are per shard, the shared indexes are only read
+    config.cache_path = paths.cache
+    # The runner writes the merged metrics
+    config.metrics_json_path = None
+    config.metrics_prometheus_path = None
+    logger.info(f"Starting shard {index + 1} of {shards}")
+    bot = OpenAlexBot(email=email, filename=paths.dois)
+    bot.start()
+    with open(paths.metrics, "w", encoding="utf-8") as file:
+        file.write(bot.metrics.json())
+
+
+class ShardPaths(BaseModel):
+    work_directory: str
+    index: int
+
+    @property
+    def dois(self) -> str:
+        return os.path.join(self.work_directory, f"shard-{self.index}.csv")
+
+    @property
+    def journal(self) -> str:
+        return os.path.join(self.work_directory, f"journal-{self.index}.sqlite")
+
+    @property
+    def export(self) -> str:
+        return os.path.join(self.work_directory, f"export-{self.index}")
+
+    @property
+    def metrics(self) -> str:
+        return os.path.join(self.work_directory, f"metrics-{self.index}.json")
+
+    @property
+    def cache(self) -> str:
+        return os.path.join(self.work_directory, f"lookup_cache-{self.index}.sqlite")
+
+
+class ShardedRunner(BaseModel):
+    """This splits the DOIs of a CSV by hash into shards and imports
+    every shard in its own process with its own WikibaseIntegrator login.
+
+    Every shard gets an equal slice of the rate limits and of the default rate limit
+    of the other hosts, so all shards together stay within the limits of the config.
+    The journals, exports and metrics of the shards are kept in the work directory
+    and merged at the end.
+
+    Several machines sharing the work directory can each run some of the shards
+    with shard_indexes. merge() is then called once all of them are done."""
+    email: str
+    filename: str
+    shards: int = 4
+    work_directory: str = "shards"
+    # The shards to run on this machine, None runs all of them
+    shard_indexes: Optional[List[int]]
+
+    @staticmethod
+    def shard_of(doi: str, shards: int) -> int:
+        """The shard of a DOI is the same on every machine and in every run"""
+        digest = hashlib.blake2b(doi.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % shards
+
+    def __paths__(self, index: int) -> ShardPaths:
+        return ShardPaths(work_directory=self.work_directory, index=index)
+
+    @property
+    def source_path(self) -> str:
+        return os.path.join(self.work_directory, "source.json")
+
+    @property
+    def hash_cache_path(self) -> str:
+        return os.path.join(self.work_directory, "source_hashes.json")
+
+    def __hash_file__(self) -> str:
+        """Hashing a large CSV takes a while, so the hash is kept in the work directory
+        by path, size and mtime and only computed again when the CSV changed"""
+        stat = os.stat(self.filename)
+        key = os.path.abspath(self.filename)
+        hashes: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.hash_cache_path):
+            with open(self.hash_cache_path, encoding="utf-8") as file:
+                hashes = json.load(file)
+        cached = hashes.get(key)
+        if cached is not None and (cached["size"], cached["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return cached["blake2b"]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.filename, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        hashes[key] = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, blake2b=digest.hexdigest())
+        os.makedirs(self.work_directory, exist_ok=True)
+        # Machines sharing the work directory never see a partly written file
+        with open(self.hash_cache_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(hashes, file)
+        os.replace(self.hash_cache_path + ".tmp", self.hash_cache_path)
+        return hashes[key]["blake2b"]
+
+    def __source__(self) -> Dict[str, Any]:
+        """Identifies the CSV and the number of shards the split was made from.
+        The content is hashed because the path and mtime differ between machines"""
+        source: Dict[str, Any] = dict(filename=os.path.basename(self.filename), shards=self.shards)
+        if os.path.isfile(self.filename):
+            source.update(size=os.path.getsize(self.filename), blake2b=self.__hash_file__())
+        return source
+
+    def split(self):
+        """Writes the unique DOIs of every shard to its own CSV in the work directory.
+        DOIs completed according to the journal of the config are left out.
+        Existing shard files are kept so a resumed run or another machine uses the same split.
+        A work directory split from another CSV or into another number of shards is refused."""
+        source = self.__source__()
+        if os.path.exists(self.source_path):
+            with open(self.source_path, encoding="utf-8") as file:
+                existing_source = json.load(file)
+            if existing_source != source:
+                raise ValueError(f"The shards in {self.work_directory} were split from "
+                                 f"{existing_source}, not {source}. Use another work directory")
+            if all(os.path.exists(self.__paths__(index).dois) for index in range(self.shards)):
+                logger.info(f"Using the existing shards in {self.work_directory}")
+                return
+        elif any(os.path.exists(self.__paths__(index).dois) for index in range(self.shards)):
+            raise ValueError(f"The shards in {self.work_directory} were split from an unknown CSV. "
+                             f"Use another work directory")
+        os.makedirs(self.work_directory, exist_ok=True)
+        journal = Journal(path=config.journal_path, dry_run=OpenAlexBot.dry_run()) if config.journal_enabled else None
+        files = [open(self.__paths__(index).dois + ".tmp", "w", encoding="utf-8", newline="")
+                 for index in range(self.shards)]
+        try:
+            writers = [csv.writer(file) for file in files]
+            for writer in writers:
+                writer.writerow(["doi"])
+            dois = DoiReader(filename=self.filename).read()
+            if journal is not None:
+                dois = journal.skip_completed(dois)
+            for doi in dois:
+                writers[self.shard_of(doi, self.shards)].writerow([doi])
+        finally:
+            for file in files:
+                file.close()
+            if journal is not None:
+                journal.close()
+        # Renaming last means a crash never leaves a partial split behind
+        for index in range(self.shards):
+            os.replace(self.__paths__(index).dois + ".tmp", self.__paths__(index).dois)
+        with open(self.source_path, "w", encoding="utf-8") as file:
+            json.dump(source, file)
+        logger.info(f"Split {self.filename} into {self.shards} shards in {self.work_directory}")
+
+    def run(self):
+        self.split()
+        if config.openalex_snapshot_path is not None:
+            # Indexing once here keeps the shards from writing to the index at the same time
+            snapshot = OpenAlexSnapshot(
+                path=config.openalex_snapshot_path,
+                index_path=config.openalex_snapshot_index_path,
+            )
+            snapshot.build_index()
+            snapshot.close()
+        if config.doi_index_path is not None:
+            # The shards only read the bloom filter when it exists
+            doi_index = DoiIndex(path=config.doi_index_path)
+            doi_index.__get_bloom_filter__()
+            doi_index.close()
+        indexes = self.shard_indexes if self.shard_indexes is not None else list(range(self.shards))
+        rates = {host: rate / self.shards for host, rate in config.rate_limits.items()}
+        default_rate = config.default_rate_limit / self.shards
+        # Spawned processes start from a clean state instead of copying open sessions and locks
+        with ProcessPoolExecutor(
+                max_workers=len(indexes),
+                mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(_run_shard, self.email, self.work_directory, index, self.shards, rates, default_rate)
+                for index in indexes
+            ]
+            for future in futures:
+                future.result()
+        if self.shard_indexes is None:
+            self.merge()
+
+    def merge(self):
+        """Merges the journals, exports and metrics of all shards that have them"""
+        metrics = RunMetrics()
+        journal = Journal(path=config.journal_path) if config.journal_enabled else None
+        for index in range(self.shards):
+            paths = self.__paths__(index)
+            if journal is not None and os.path.exists(paths.journal):
+                journal.merge(paths.journal)
+            if config.export_format is not None and os.path.exists(paths.export):
+                with open(paths.export, encoding="utf-8") as shard_export, \
+                        open(config.export_path, "a", encoding="utf-8") as export:
+                    for line in shard_export:
+                        export.write(line)
+                os.remove(paths.export)
+            if os.path.exists(paths.metrics):
+                metrics.merge(RunMetrics.parse_file(paths.metrics))
+        if journal is not None:
+            logger.info(f"Journal: {journal.get_counts()}")
+            journal.close()
+        print(metrics.summary_table())
+        if config.metrics_json_path is not None:
+            metrics.write_json(config.metrics_json_path)
+        if config.metrics_prometheus_path is not None:
+            metrics.write_prometheus(config.metrics_prometheus_path)
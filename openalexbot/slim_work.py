@@ -0,0 +1,116 @@
+from typing import Any, Dict, List, Optional, Union
+
+import orjson  # type: ignore
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Parses JSON with orjson, which is several times faster than json"""
+    return orjson.loads(raw)
+
+
+def without_prefix(url: Optional[str]) -> Optional[str]:
+    """Turns e.g. https://orcid.org/0000-0001-2345-6789 into 0000-0001-2345-6789"""
+    if url is None:
+        return None
+    return url[url.rfind("/") + 1:]
+
+
+class SlimIds:
+    __slots__ = ("doi",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.doi: Optional[str] = data.get("doi")
+
+    def __repr__(self):
+        return f"SlimIds(doi={self.doi!r})"
+
+
+class SlimHostVenue:
+    __slots__ = ("issn_l",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.issn_l: Optional[str] = data.get("issn_l")
+
+
+class SlimBiblio:
+    __slots__ = ("issue", "volume", "first_page", "last_page")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.issue: Optional[str] = data.get("issue")
+        self.volume: Optional[str] = data.get("volume")
+        self.first_page: Optional[str] = data.get("first_page")
+        self.last_page: Optional[str] = data.get("last_page")
+
+
+class SlimAuthor:
+    __slots__ = ("id", "display_name", "orcid")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id: Optional[str] = data.get("id")
+        self.display_name: Optional[str] = data.get("display_name")
+        self.orcid: Optional[str] = data.get("orcid")
+
+    @property
+    def orcid_id(self) -> Optional[str]:
+        return without_prefix(self.orcid)
+
+
+class SlimAuthorship:
+    __slots__ = ("author", "author_position")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.author = SlimAuthor(data.get("author") or {})
+        self.author_position: Optional[str] = data.get("author_position")
+
+
+class SlimConcept:
+    __slots__ = ("id", "display_name", "wikidata")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id: Optional[str] = data.get("id")
+        self.display_name: Optional[str] = data.get("display_name")
+        self.wikidata: Optional[str] = data.get("wikidata")
+
+    @property
+    def wikidata_id(self) -> Optional[str]:
+        return without_prefix(self.wikidata)
+
+
+class SlimWork:
+    """This holds only the fields of an OpenAlex work that the bot uses.
+
+    It is built straight from the parsed JSON without validation and
+    uses roughly a quarter of the memory of openalexapi.Work, which keeps
+    the abstract, the institutions of every author and much more.
+    See the memory table of benchmarks/run_benchmarks.py.
+    The attribute names are the same so it can be used in place of a Work."""
+    __slots__ = (
+        "id", "title", "display_name", "publication_year", "publication_date", "type", "language",
+        "ids", "host_venue", "biblio", "authorships", "concepts", "referenced_works",
+    )
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id: str = data["id"]
+        self.title: Optional[str] = data.get("title")
+        self.display_name: Optional[str] = data.get("display_name")
+        self.publication_year: Optional[int] = data.get("publication_year")
+        self.publication_date: Optional[str] = data.get("publication_date")
+        # A plain string e.g. "journal-article", see WorkTypeToQid
+        self.type: Optional[str] = data.get("type")
+        self.language: Optional[str] = data.get("language")
+        self.ids = SlimIds(data.get("ids") or {})
+        self.host_venue = SlimHostVenue(data.get("host_venue") or {})
+        self.biblio = SlimBiblio(data.get("biblio") or {})
+        self.authorships: List[SlimAuthorship] = [
+            SlimAuthorship(authorship) for authorship in data.get("authorships") or []
+        ]
+        self.concepts: List[SlimConcept] = [SlimConcept(concept) for concept in data.get("concepts") or []]
+        self.referenced_works: List[str] = data.get("referenced_works") or []
+
+    @property
+    def id_without_prefix(self) -> str:
+        return without_prefix(self.id)
+
+    @classmethod
+    def parse(cls, raw: Union[bytes, str]) -> "SlimWork":
+        return cls(loads(raw))
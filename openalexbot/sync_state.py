@@ -0,0 +1,36 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class SyncState(BaseModel):
+    """This stores the high-water mark of the incremental sync in a JSON file.
+    The mark is the date the last successful sync started, so works
+    updated while it ran are picked up again by the next one.
+    The DOIs that failed are stored too because the mark moves past them."""
+    path: str
+
+    def __read__(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def load(self) -> Optional[str]:
+        return self.__read__().get("high_water_mark")
+
+    def load_failed_dois(self) -> List[str]:
+        return self.__read__().get("failed_dois", [])
+
+    def save(self, high_water_mark: str, failed_dois: List[str] = None):
+        # Replacing the file at once means a crash never leaves a broken mark behind
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"high_water_mark": high_water_mark, "failed_dois": failed_dois or []}, file)
+        os.replace(temporary_path, self.path)
+        logger.info(f"Saved the high-water mark {high_water_mark} to {self.path}")
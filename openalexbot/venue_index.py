@@ -0,0 +1,13 @@
+from typing import List
+
+from openalexbot.enums import Property
+from openalexbot.qid_index import QidIndex
+
+
+class VenueIndex(QidIndex):
+    """This maps ISSN-L and plain ISSN of journals to QIDs"""
+    properties: List[str] = [Property.ISSN_L.value, Property.ISSN.value]
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return value.strip().upper()
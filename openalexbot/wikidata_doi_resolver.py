@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+import requests
+from pydantic import BaseModel
+
+import config
+from openalexbot.enums import Property
+from openalexbot.helpers import chunks, normalize_doi
+from openalexbot.request_scheduler import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class WikidataDoiResolver(BaseModel):
+    """This finds out which DOIs already exist in Wikidata
+    using one SPARQL query with a VALUES clause per chunk.
+
+    Wikidata stores most DOIs in uppercase but some in lowercase,
+    so both variants are asked for and the result is keyed by the normalized DOI.
+    Comparing in another case would scan every DOI in Wikidata, so DOIs stored
+    in mixed case are not found. The bot searches for the misses with CirrusSearch,
+    see wikidata_resolver_cirrussearch_fallback in the config."""
+    endpoint = "https://query.wikidata.org/sparql"
+    chunk_size: int = 200
+    scheduler: Optional[RequestScheduler]
+
+    @staticmethod
+    def __escape__(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+
+    def __build_query__(self, dois: Iterable[str]) -> str:
+        values = set()
+        for doi in dois:
+            values.add(doi.upper())
+            values.add(doi.lower())
+        values_string = " ".join(f'"{self.__escape__(value)}"' for value in sorted(values))
+        return (
+            "SELECT ?doi ?item WHERE { "
+            f"VALUES ?doi {{ {values_string} }} "
+            f"?item wdt:{Property.DOI.value} ?doi . "
+            "}"
+        )
+
+    def __execute_query__(self, query: str) -> dict:
+        headers = {
+            "Accept": "application/sparql-results+json",
+            "User-Agent": config.user_agent,
+        }
+        # POST avoids hitting the URL length limit with large VALUES clauses
+        if self.scheduler is not None:
+            response = self.scheduler.request("POST", self.endpoint, data={"query": query}, headers=headers)
+        else:
+            response = requests.post(self.endpoint, data={"query": query}, headers=headers)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise ValueError(f"Got {response.status_code} from WDQS")
+
+    def get_qids(self, dois: Iterable[str]) -> Dict[str, str]:
+        """Returns a dictionary with the normalized DOI as key and the QID as value.
+        DOIs not found in Wikidata are missing from the result."""
+        qids: Dict[str, str] = {}
+        for chunk in chunks(sorted({normalize_doi(doi) for doi in dois}), self.chunk_size):
+            result = self.__execute_query__(self.__build_query__(chunk))
+            for binding in result["results"]["bindings"]:
+                qid = binding["item"]["value"].replace("http://www.wikidata.org/entity/", "")
+                qids[normalize_doi(binding["doi"]["value"])] = qid
+        logger.info(f"Found {len(qids)} DOIs already in Wikidata")
+        return qids
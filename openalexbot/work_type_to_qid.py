@@ -1,18 +1,82 @@
-from openalexapi.work import WorkType, Work  # type: ignore
+from typing import Dict, Optional, Union
+
+from openalexapi.work import Work  # type: ignore
 from pydantic import BaseModel
 
+from openalexbot.slim_work import SlimWork
+
+
+class WorkTypeMapping(BaseModel):
+    qid: str
+    # The English description of new items, the publication year is appended
+    description: str
+
+
+# The Crossref type vocabulary that OpenAlex uses.
+# Types mapped to None are containers or not works on their own and are never imported.
+WORK_TYPES: Dict[str, Optional[WorkTypeMapping]] = {
+    "journal-article": WorkTypeMapping(qid="Q13442814", description="scientific article"),
+    "proceedings-article": WorkTypeMapping(qid="Q23927052", description="conference paper"),
+    "posted-content": WorkTypeMapping(qid="Q580922", description="preprint"),
+    "book": WorkTypeMapping(qid="Q571", description="book"),
+    "edited-book": WorkTypeMapping(qid="Q571", description="book"),
+    "monograph": WorkTypeMapping(qid="Q193495", description="monograph"),
+    "reference-book": WorkTypeMapping(qid="Q13136", description="reference work"),
+    "book-chapter": WorkTypeMapping(qid="Q21481766", description="academic chapter"),
+    "book-part": WorkTypeMapping(qid="Q21481766", description="academic chapter"),
+    "book-section": WorkTypeMapping(qid="Q21481766", description="academic chapter"),
+    "reference-entry": WorkTypeMapping(qid="Q17329259", description="encyclopedic article"),
+    "dissertation": WorkTypeMapping(qid="Q1385450", description="dissertation"),
+    "report": WorkTypeMapping(qid="Q10870555", description="report"),
+    "dataset": WorkTypeMapping(qid="Q1172284", description="dataset"),
+    "standard": WorkTypeMapping(qid="Q317623", description="technical standard"),
+    "book-series": None,
+    "book-set": None,
+    "book-track": None,
+    "component": None,
+    "database": None,
+    "grant": None,
+    "journal": None,
+    "journal-issue": None,
+    "journal-volume": None,
+    "other": None,
+    "peer-review": None,
+    "proceedings": None,
+    "proceedings-series": None,
+    "report-component": None,
+    "report-series": None,
+}
+
+
+def work_type_of(work: Union[Work, SlimWork]) -> Optional[str]:
+    # The type of a SlimWork is a plain string
+    return getattr(work.type, "value", work.type)
+
+
+def is_supported(work: Union[Work, SlimWork]) -> bool:
+    return WORK_TYPES.get(work_type_of(work)) is not None
+
 
 class WorkTypeToQid(BaseModel):
-    work: Work
-
-    def get_qid(self):
-        if self.work.type == WorkType.BOOK:
-            return "Q13442814"
-        elif self.work.type == WorkType.JOURNAL_ARTICLE:
-            return "Q13442814"
-        elif self.work.type == WorkType.BOOK_CHAPTER:
-            return "Q21481766"
-        else:
-            raise ValueError(f"{self.work.type} is not "
+    work: Union[Work, SlimWork]
+
+    def __get_mapping__(self) -> WorkTypeMapping:
+        work_type = work_type_of(self.work)
+        mapping = WORK_TYPES.get(work_type)
+        if mapping is None:
+            raise ValueError(f"{work_type} is not "
                              f"supported, report an issue here "
-                             f"https://github.com/dpriskorn/OpenAlexBot/issues.")
\ No newline at end of file
+                             f"https://github.com/dpriskorn/OpenAlexBot/issues.")
+        return mapping
+
+    def get_qid(self) -> str:
+        return self.__get_mapping__().qid
+
+    def get_description(self) -> str:
+        description = self.__get_mapping__().description
+        if self.work.publication_year is None:
+            return description
+        return f"{description} from {self.work.publication_year}"
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -1,9 +1,24 @@
-# import json
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
 from unittest import TestCase
+from unittest.mock import Mock, patch
 
+import requests
 from pydantic import ValidationError
+from wikibaseintegrator import WikibaseIntegrator
 
+import config
 from openalexbot import OpenAlexBot
+from openalexbot.enums import Outcome
+from openalexbot.journal import Journal
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+from openalexbot.slim_work import SlimWork
 
 
 # from openalexapi import Work
@@ -51,6 +66,160 @@ class TestOpenAlexBot(TestCase):
     def test_import_with_valid_email(self):
         oa = OpenAlexBot(email="test@example.com", filename="test_data/10_dois.csv")
 
+    def test_import_new_item_is_recorded_as_imported(self):
+        item = WikibaseIntegrator().item.new()
+
+        def write(**kwargs):
+            # Like WikibaseIntegrator the written item gets its id
+            item.id = "Q7"
+            return item
+
+        item.write = write
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(path=os.path.join(directory, "journal.sqlite"))
+            bot = OpenAlexBot(email="test@example.com", journal=journal)
+            with patch.object(config, "upload_enabled", True), \
+                    patch.object(config, "export_format", None), \
+                    patch.object(config, "press_enter_to_continue", False), \
+                    patch.object(OpenAlexBot, "__prepare_item__", return_value=item), \
+                    patch("openalexbot.print") as print_:
+                bot.__import_new_item__(doi="10.1/1", work=None, wbi=WikibaseIntegrator())
+            self.assertEqual(journal.get_outcome("10.1/1"), Outcome.IMPORTED)
+            self.assertIn("Added new item", print_.call_args[0][0])
+            journal.close()
+
+    def __unsupported_bot__(self, directory: str, fetched_works: dict) -> OpenAlexBot:
+        class Fetcher(OpenAlexBatchFetcher):
+            def get_works_by_dois(self, dois):
+                return {doi: fetched_works[doi] for doi in dois if doi in fetched_works}
+
+        return OpenAlexBot(
+            email="test@example.com",
+            fetcher=Fetcher(email="test@example.com"),
+            journal=Journal(path=os.path.join(directory, "journal.sqlite")),
+            wbi=WikibaseIntegrator(),
+        )
+
+    @staticmethod
+    def __issue__(doi: str) -> SlimWork:
+        return SlimWork({"id": "https://openalex.org/W1", "type": "journal-issue",
+                         "ids": {"doi": f"https://doi.org/{doi}"}})
+
+    def test_unsupported_prefetched_work_is_skipped_before_wikidata(self):
+        with tempfile.TemporaryDirectory() as directory:
+            bot = self.__unsupported_bot__(directory, fetched_works={})
+            bot.prefetched_works["10.1/issue"] = self.__issue__("10.1/issue")
+            with patch.object(config, "pipeline_enabled", False), \
+                    patch.object(OpenAlexBot, "__get_existing_dois__", side_effect=AssertionError) as existing, \
+                    patch.object(OpenAlexBot, "__resolve_qid__", side_effect=AssertionError):
+                bot.__process_dois__(dois=["10.1/issue"], skip_completed=False)
+            existing.assert_not_called()
+            self.assertEqual(bot.journal.get_outcome("10.1/issue"), Outcome.UNSUPPORTED_TYPE)
+            self.assertEqual(bot.prefetched_works, {})
+            bot.journal.close()
+
+    def test_unsupported_fetched_work_is_skipped_before_preparing(self):
+        for pipeline_enabled in (False, True):
+            with self.subTest(pipeline_enabled=pipeline_enabled), tempfile.TemporaryDirectory() as directory:
+                bot = self.__unsupported_bot__(directory, fetched_works={"10.1/issue": self.__issue__("10.1/issue")})
+                with patch.object(config, "pipeline_enabled", pipeline_enabled), \
+                        patch.object(config, "press_enter_to_continue", False), \
+                        patch.object(config, "update_existing_items", False), \
+                        patch.object(OpenAlexBot, "__get_existing_dois__", return_value={}), \
+                        patch.object(OpenAlexBot, "__resolve_qid__", side_effect=AssertionError) as resolve_qid, \
+                        patch.object(OpenAlexBot, "__prepare_item__", side_effect=AssertionError) as prepare:
+                    bot.__process_dois__(dois=["10.1/issue"], skip_completed=False)
+                # Neither authors, venues nor citations are looked up
+                resolve_qid.assert_not_called()
+                prepare.assert_not_called()
+                self.assertEqual(bot.journal.get_outcome("10.1/issue"), Outcome.UNSUPPORTED_TYPE)
+                bot.journal.close()
+
+    def test_resolve_qid_asks_once(self):
+        bot = OpenAlexBot(email="test@example.com")
+        other_bot = OpenAlexBot(email="test@example.com")
+        found = {"query": {"search": [{"title": "Q1"}]}}
+        with patch.object(OpenAlexBot, "__call_cirrussearch_api__", return_value=found) as call:
+            self.assertEqual(bot.__resolve_qid__("10.1/a"), "Q1")
+            self.assertEqual(bot.__resolve_qid__("10.1/a"), "Q1")
+            self.assertEqual(call.call_count, 1)
+            # Misses are remembered too
+            call.return_value = {"query": {"search": []}}
+            self.assertIsNone(bot.__resolve_qid__("10.1/b"))
+            self.assertIsNone(bot.__resolve_qid__("10.1/b"))
+            self.assertEqual(call.call_count, 2)
+            # Every bot has its own memo
+            self.assertIsNone(other_bot.__resolve_qid__("10.1/a"))
+            self.assertEqual(call.call_count, 3)
+        self.assertIsNot(bot.qid_memo, other_bot.qid_memo)
+
+    def test_resolve_dois_keeps_the_input_order(self):
+        bot = OpenAlexBot(email="test@example.com")
+        dois = [f"10.1/{number}" for number in range(8)]
+
+        def resolve_qid(query_string, purpose="doi"):
+            # The first DOIs take longest so they finish last
+            sleep((8 - int(query_string[5:])) / 500)
+            return None if query_string == "10.1/3" else f"Q{query_string[5:]}"
+
+        with patch.object(config, "reference_workers", 4), \
+                patch.object(config, "doi_index_path", None), \
+                patch.object(OpenAlexBot, "__resolve_qid__", side_effect=resolve_qid):
+            qids = bot.__resolve_dois__(dois=dois)
+        self.assertEqual(qids, ["Q0", "Q1", "Q2", None, "Q4", "Q5", "Q6", "Q7"])
+
+    def test_prepare_workers_share_the_lookup_threads(self):
+        bot = OpenAlexBot(email="test@example.com")
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def resolve_qid(query_string, purpose="doi"):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return None
+
+        with patch.object(config, "reference_workers", 2), \
+                patch.object(config, "doi_index_path", None), \
+                patch.object(OpenAlexBot, "__resolve_qid__", side_effect=resolve_qid):
+            # Like four prepare workers resolving the references of their works
+            with ThreadPoolExecutor(max_workers=4) as prepare_workers:
+                list(prepare_workers.map(
+                    lambda worker: bot.__resolve_dois__(dois=[f"10.{worker}/{number}" for number in range(6)]),
+                    range(4)
+                ))
+        self.assertLessEqual(running[1], 2)
+        bot.lookup_executor.shutdown()
+
+    def test_referenced_works_are_fetched_in_batches(self):
+        def request(method, url, params=None, headers=None):
+            ids = params["filter"].replace("openalex_id:", "").split("|")
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps({"results": [
+                {"id": f"https://openalex.org/{id}", "ids": {"doi": f"https://doi.org/10.1/{id}"}} for id in ids
+            ]}).encode()
+            return response
+
+        session = Mock(spec=requests.Session)
+        session.request.side_effect = request
+        fetcher = OpenAlexBatchFetcher(
+            email="test@example.com",
+            scheduler=RequestScheduler(rate_limiter=RateLimiter(rates={}, default_rate=1e9), session=session),
+        )
+        bot = OpenAlexBot(email="test@example.com", fetcher=fetcher)
+        work = SlimWork({"id": "https://openalex.org/W1",
+                         "referenced_works": [f"https://openalex.org/W{number}" for number in range(2, 122)]})
+        with patch.object(OpenAlexBot, "__resolve_dois__", side_effect=lambda dois: [None] * len(dois)) as resolve:
+            bot.__prepare_cites_works__(work=work, reference=[])
+        filters = [call.kwargs["params"]["filter"] for call in session.request.call_args_list]
+        self.assertEqual([len(filter_.split("|")) for filter_ in filters], [50, 50, 20])
+        # The DOIs of the references are resolved in the order they are cited
+        self.assertEqual(resolve.call_args.kwargs["dois"], [f"10.1/w{number}" for number in range(2, 122)])
+
         # oa.start()
 #     def test__prepare_new_item__(self):
 #         oab = OpenAlexBot(filename="test_data/test.csv")
@@ -0,0 +1,31 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from openalexbot.bloom_filter import BloomFilter
+
+
+class TestBloomFilter(TestCase):
+    def test_no_false_negatives(self):
+        bloom_filter = BloomFilter.for_capacity(1000)
+        dois = [f"10.1234/{number}" for number in range(1000)]
+        for doi in dois:
+            bloom_filter.add(doi)
+        self.assertTrue(all(bloom_filter.might_contain(doi) for doi in dois))
+
+    def test_few_false_positives(self):
+        bloom_filter = BloomFilter.for_capacity(1000, error_rate=0.01)
+        for number in range(1000):
+            bloom_filter.add(f"10.1234/{number}")
+        false_positives = sum(bloom_filter.might_contain(f"10.5678/{number}") for number in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_save_and_load(self):
+        bloom_filter = BloomFilter.for_capacity(10)
+        bloom_filter.add("10.7717/peerj.4375")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dois.bloom")
+            bloom_filter.save(path)
+            loaded = BloomFilter.load(path)
+        self.assertTrue(loaded.might_contain("10.7717/peerj.4375"))
+        self.assertEqual(loaded.size, bloom_filter.size)
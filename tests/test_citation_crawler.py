@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from wikibaseintegrator import WikibaseIntegrator
+
+import config
+from openalexbot import OpenAlexBot
+from openalexbot.citation_crawler import CitationCrawler
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+
+
+def work(id, doi, referenced_works=(), type_="journal-article", issn_l="1234-5678"):
+    return SimpleNamespace(
+        id=f"https://openalex.org/{id}",
+        type=type_,
+        ids=SimpleNamespace(doi=f"https://doi.org/{doi}" if doi else None),
+        host_venue=SimpleNamespace(issn_l=issn_l),
+        referenced_works=[f"https://openalex.org/{reference}" for reference in referenced_works],
+    )
+
+
+# W1 cites W2 and W3, W2 cites W3 and W4, W3 is already in Wikidata, W4 cites W5.
+# W6 and W7 cite each other, W8 is an issue and cites W9, W10 cites W11 which lacks an ISSN-L
+WORKS = {
+    "W1": work("W1", "10.1/1", ["W2", "W3"]),
+    "W2": work("W2", "10.1/2", ["W3", "W4"]),
+    "W3": work("W3", "10.1/3"),
+    "W4": work("W4", "10.1/4", ["W5"]),
+    "W5": work("W5", "10.1/5"),
+    "W6": work("W6", "10.1/6", ["W7", "W8"]),
+    "W7": work("W7", "10.1/7", ["W6"]),
+    "W8": work("W8", "10.1/8", ["W9"], type_="journal-issue"),
+    "W9": work("W9", "10.1/9"),
+    "W10": work("W10", "10.1/10", ["W11"]),
+    "W11": work("W11", "10.1/11", issn_l=None),
+}
+
+
+class FakeFetcher(OpenAlexBatchFetcher):
+    calls: int = 0
+
+    def get_works_by_openalex_ids(self, ids):
+        self.calls += 1
+        return {id: WORKS[id] for id in ids if id in WORKS}
+
+    def get_works_by_dois(self, dois):
+        return {doi: work_ for work_ in WORKS.values() for doi in dois if work_.ids.doi == f"https://doi.org/{doi}"}
+
+
+class TestCitationCrawler(TestCase):
+    def crawler(self, **kwargs) -> CitationCrawler:
+        return CitationCrawler(
+            fetch_works=lambda ids: {id: WORKS[id] for id in ids if id in WORKS},
+            get_existing_dois=lambda dois: {doi: "Q3" for doi in dois if doi == "10.1/3"},
+            **kwargs
+        )
+
+    @staticmethod
+    def dois(levels):
+        return [[doi for doi, _ in level] for level in levels]
+
+    def test_cited_works_come_first(self):
+        levels = self.crawler(max_depth=3).crawl(seeds=[("10.1/1", WORKS["W1"])])
+        self.assertEqual(self.dois(levels), [["10.1/5"], ["10.1/4"], ["10.1/2"], ["10.1/1"]])
+
+    def test_depth_limit(self):
+        levels = self.crawler(max_depth=1).crawl(seeds=[("10.1/1", WORKS["W1"])])
+        self.assertEqual(self.dois(levels), [["10.1/2"], ["10.1/1"]])
+
+    def test_budget_is_shared_between_crawls(self):
+        crawler = self.crawler(max_depth=3, max_works=1)
+        self.assertEqual(self.dois(crawler.crawl(seeds=[("10.1/1", WORKS["W1"])])), [["10.1/2"], ["10.1/1"]])
+        # W2 was visited already and the budget is used up
+        self.assertEqual(self.dois(crawler.crawl(seeds=[("10.1/4", WORKS["W4"])])), [["10.1/4"]])
+
+    def test_citation_cycle_goes_last(self):
+        levels = self.crawler(max_depth=3).crawl(seeds=[("10.1/1", WORKS["W1"]), ("10.1/6", WORKS["W6"])])
+        self.assertEqual(self.dois(levels), [["10.1/5"], ["10.1/4"], ["10.1/2"], ["10.1/1"], ["10.1/6", "10.1/7"]])
+
+    def test_unsupported_types_are_left_out(self):
+        crawler = self.crawler(max_depth=3, max_works=1)
+        # The issue W8 neither gets added nor uses up the budget
+        self.assertEqual(self.dois(crawler.crawl(seeds=[("10.1/6", WORKS["W6"])])), [["10.1/6", "10.1/7"]])
+        self.assertEqual(crawler.added_works, 1)
+
+    def test_references_without_issn_l_are_left_out(self):
+        crawler = self.crawler(max_depth=3)
+        self.assertEqual(self.dois(crawler.crawl(seeds=[("10.1/10", WORKS["W10"])])), [["10.1/10"]])
+        self.assertEqual(crawler.added_works, 0)
+
+    def test_crawl_checks_every_doi_once(self):
+        bot = OpenAlexBot(email="test@example.com", fetcher=FakeFetcher(email="test@example.com"),
+                          wbi=WikibaseIntegrator())
+        imported = []
+        with patch.object(config, "citation_crawl_max_depth", 1), \
+                patch.object(config, "pipeline_enabled", False), \
+                patch.object(config, "journal_enabled", False), \
+                patch.object(config, "doi_index_path", None), \
+                patch.object(config, "press_enter_to_continue", False), \
+                patch.object(config, "language_detection_processes", 1), \
+                patch.object(OpenAlexBot, "__get_existing_dois__", return_value={"10.1/3": "Q3"}) as get_existing, \
+                patch.object(OpenAlexBot, "__import_new_item__",
+                             side_effect=lambda doi, work, wbi: imported.append(doi)):
+            bot.__crawl_and_process_dois__(dois=["10.1/1"])
+        # The seed once before the crawl and the references once by the crawler
+        self.assertEqual([call.kwargs["dois"] for call in get_existing.call_args_list],
+                         [["10.1/1"], ["10.1/2", "10.1/3"]])
+        self.assertEqual(imported, ["10.1/2", "10.1/1"])
+
+    def test_only_references_are_remembered(self):
+        crawler = self.crawler(max_depth=1)
+        crawler.crawl(seeds=[("10.1/4", WORKS["W4"])])
+        self.assertEqual(crawler._visited, {"10.1/5"})
+
+    def test_prepare_reuses_the_crawl(self):
+        fetcher = FakeFetcher(email="test@example.com")
+        bot = OpenAlexBot(email="test@example.com", fetcher=fetcher)
+        crawler = CitationCrawler(
+            fetch_works=bot.__fetch_referenced_works__,
+            get_existing_dois=bot.__get_crawled_existing_dois__,
+        )
+        with patch.object(OpenAlexBot, "__get_existing_dois__", return_value={"10.1/3": "Q3"}):
+            crawler.crawl(seeds=[("10.1/1", WORKS["W1"])])
+        self.assertEqual(fetcher.calls, 1)
+        # W2 is imported before W1 is prepared
+        bot.qid_memo.set("10.1/2", "Q2")
+        with patch.object(OpenAlexBot, "__call_cirrussearch_api__", side_effect=AssertionError):
+            claims = bot.__prepare_cites_works__(
+                work=WORKS["W1"], reference=bot.__prepare_reference_claim__(work=WORKS["W1"])
+            )
+        self.assertEqual([claim.mainsnak.datavalue["value"]["id"] for claim in claims], ["Q2", "Q3"])
+        self.assertEqual(fetcher.calls, 1)
@@ -0,0 +1,42 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+
+from openalexbot.doi_index import DoiIndex
+
+
+class TestDoiIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = DoiIndex(path=os.path.join(self.directory.name, "dois.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def __write_dump__(self, name: str) -> str:
+        entity = {
+            "id": "Q42",
+            "claims": {"P356": [{"rank": "normal", "mainsnak": {"datavalue": {"value": "10.1/ABC"}}}]},
+        }
+        filename = os.path.join(self.directory.name, name)
+        with gzip.open(filename, "wt") as file:
+            file.write(f"[\n{json.dumps(entity)}\n]\n")
+        return filename
+
+    def test_build_from_dump(self):
+        self.index.build_from_dump(self.__write_dump__("latest-all.json.gz"))
+        self.assertEqual(self.index.get_many(["10.1/abc", "10.1/missing"]), {"10.1/abc": "Q42"})
+        self.assertFalse(self.index.is_stale(max_age=timedelta(days=7)))
+
+    def test_old_dump_is_stale(self):
+        # The index is new but the dump it was built from is not
+        self.index.build_from_dump(self.__write_dump__("wikidata-20220103-all.json.gz"))
+        self.assertEqual(self.index.dump_date, datetime(2022, 1, 3, tzinfo=timezone.utc))
+        self.assertTrue(self.index.is_stale(max_age=timedelta(days=7)))
+        self.index.build_from_dump(self.__write_dump__("latest-all.json.gz"),
+                                   dump_date=datetime.now(timezone.utc) - timedelta(days=1))
+        self.assertFalse(self.index.is_stale(max_age=timedelta(days=7)))
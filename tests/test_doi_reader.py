@@ -0,0 +1,24 @@
+import gzip
+import os
+import tempfile
+from unittest import TestCase
+
+from openalexbot.doi_reader import DoiReader
+
+
+class TestDoiReader(TestCase):
+    def test_read_lowercase(self):
+        dois = list(DoiReader(filename="test_data/test_doi_lowercase.csv").read())
+        self.assertEqual(dois, ["10.7717/peerj.4375"])
+
+    def test_read_uppercase_column_missing(self):
+        with self.assertRaises(ValueError):
+            list(DoiReader(filename="test_data/test_doi_uppercase.csv").read())
+
+    def test_read_gzip_deduplicates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dois.csv.gz")
+            with gzip.open(filename, "wt") as file:
+                file.write("doi\nhttps://doi.org/10.7717/PEERJ.4375\n\n10.7717/peerj.4375\n")
+            dois = list(DoiReader(filename=filename).read())
+        self.assertEqual(dois, ["10.7717/peerj.4375"])
@@ -0,0 +1,18 @@
+from unittest import TestCase
+
+from openalexbot.helpers import chunks, normalize_doi
+
+
+class TestHelpers(TestCase):
+    def test_normalize_doi_with_prefix(self):
+        self.assertEqual(normalize_doi("https://doi.org/10.7717/PEERJ.4375"), "10.7717/peerj.4375")
+
+    def test_normalize_doi_naked(self):
+        self.assertEqual(normalize_doi(" 10.7717/peerj.4375 "), "10.7717/peerj.4375")
+
+    def test_chunks(self):
+        self.assertEqual(list(chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_chunks_invalid_size(self):
+        with self.assertRaises(ValueError):
+            list(chunks(range(5), 0))
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from openalexbot.import_pipeline import ImportPipeline, Stage
+
+
+class TestImportPipeline(TestCase):
+    def test_all_items_pass_all_stages(self):
+        results = []
+        pipeline = ImportPipeline(
+            stages=[
+                Stage(name="double", function=lambda number: [number * 2], workers=3),
+                Stage(name="collect", function=lambda number: results.append(number) or []),
+            ],
+            queue_size=2,
+        )
+        pipeline.run(source=range(100))
+        self.assertEqual(sorted(results), [number * 2 for number in range(100)])
+
+    def test_error_in_stage_is_raised(self):
+        def fail(number):
+            raise ValueError(f"failed on {number}")
+
+        pipeline = ImportPipeline(stages=[Stage(name="fail", function=fail, workers=2)])
+        with self.assertRaises(ValueError):
+            pipeline.run(source=range(10))
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from openalexbot.enums import ExportFormat
+from openalexbot.item_exporter import ItemExporter
+
+
+def snak(property_, datavalue):
+    return {"snaktype": "value", "property": property_, "datavalue": datavalue}
+
+
+class TestItemExporter(TestCase):
+    def test_to_quickstatements(self):
+        exporter = ItemExporter(path="unused", format=ExportFormat.QUICKSTATEMENTS)
+        item_json = {
+            "labels": {"en": {"language": "en", "value": "A title"}},
+            "descriptions": {"en": {"language": "en", "value": "scientific article"}},
+            "claims": {
+                "P31": [{
+                    "mainsnak": snak("P31", {"type": "wikibase-entityid", "value": {"id": "Q13442814"}}),
+                    "references": [{"snaks": {
+                        "P248": [snak("P248", {"type": "wikibase-entityid", "value": {"id": "Q107507571"}})]
+                    }}],
+                }],
+                "P356": [{
+                    "mainsnak": snak("P356", {"type": "string", "value": "10.1/ABC"}),
+                }],
+                "P1476": [{
+                    "mainsnak": snak("P1476", {"type": "monolingualtext",
+                                               "value": {"language": "en", "text": "A title"}}),
+                    "qualifiers": {"P407": [{"snaktype": "novalue", "property": "P407"}]},
+                }],
+            },
+        }
+        self.assertEqual(
+            exporter.to_quickstatements(item_json),
+            "CREATE\n"
+            'LAST\tLen\t"A title"\n'
+            'LAST\tDen\t"scientific article"\n'
+            "LAST\tP31\tQ13442814\tS248\tQ107507571\n"
+            'LAST\tP356\t"10.1/ABC"\n'
+            'LAST\tP1476\ten:"A title"'
+        )
+
+    def test_to_quickstatements_of_existing_item(self):
+        exporter = ItemExporter(path="unused", format=ExportFormat.QUICKSTATEMENTS)
+        item_json = {
+            "id": "Q42",
+            "claims": {"P2860": [{"mainsnak": snak("P2860", {"type": "wikibase-entityid", "value": {"id": "Q1"}})}]},
+        }
+        self.assertEqual(exporter.to_quickstatements(item_json), "Q42\tP2860\tQ1")
+
+    def test_to_quickstatements_escapes_titles(self):
+        exporter = ItemExporter(path="unused", format=ExportFormat.QUICKSTATEMENTS)
+        title = 'The "best"\tmodel\nof all'
+        item_json = {
+            "labels": {"en": {"language": "en", "value": title}},
+            "claims": {
+                "P1476": [{
+                    "mainsnak": snak("P1476", {"type": "monolingualtext",
+                                               "value": {"language": "en", "text": title}}),
+                }],
+            },
+        }
+        self.assertEqual(
+            exporter.to_quickstatements(item_json),
+            "CREATE\n"
+            'LAST\tLen\t"The \\"best\\" model of all"\n'
+            'LAST\tP1476\ten:"The \\"best\\" model of all"'
+        )
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from wikibaseintegrator import WikibaseIntegrator, datatypes
+
+from openalexbot.enums import Property
+from openalexbot.item_updater import ItemUpdater
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+
+
+def author(prop_nr, value, ordinal):
+    qualifiers = [datatypes.String(prop_nr=Property.SERIES_ORDINAL.value, value=ordinal)]
+    if prop_nr == Property.AUTHOR.value:
+        return datatypes.Item(prop_nr=prop_nr, value=value, qualifiers=qualifiers)
+    return datatypes.String(prop_nr=prop_nr, value=value, qualifiers=qualifiers)
+
+
+class TestItemUpdater(TestCase):
+    def test_missing_claims(self):
+        updater = ItemUpdater(
+            mediawiki_api_url="https://www.wikidata.org/w/api.php",
+            scheduler=RequestScheduler(rate_limiter=RateLimiter(rates={})),
+        )
+        existing = WikibaseIntegrator().item.new()
+        existing.add_claims([
+            datatypes.Item(prop_nr=Property.PUBLISHED_IN.value, value="Q1"),
+            datatypes.Item(prop_nr=Property.CITES_WORK.value, value="Q10"),
+            author(Property.AUTHOR_NAME_STRING.value, "Jane Doe", "1"),
+        ])
+        prepared = WikibaseIntegrator().item.new()
+        prepared.add_claims([
+            # Another venue does not replace the existing one
+            datatypes.Item(prop_nr=Property.PUBLISHED_IN.value, value="Q2"),
+            datatypes.Item(prop_nr=Property.CITES_WORK.value, value="Q10"),
+            datatypes.Item(prop_nr=Property.CITES_WORK.value, value="Q11"),
+            # The first author is already there as a name string
+            author(Property.AUTHOR.value, "Q20", "1"),
+            author(Property.AUTHOR.value, "Q21", "2"),
+        ])
+        missing = updater.missing_claims(existing_claims=existing.get_json()["claims"], item=prepared)
+        self.assertEqual(
+            sorted((claim.mainsnak.property_number, claim.mainsnak.datavalue["value"]["id"]) for claim in missing),
+            [(Property.CITES_WORK.value, "Q11"), (Property.AUTHOR.value, "Q21")]
+        )
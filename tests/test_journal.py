@@ -0,0 +1,59 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from openalexbot.enums import Outcome
+from openalexbot.journal import Journal
+
+
+class TestJournal(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_completed_survives_restart(self):
+        journal = Journal(path=self.path)
+        journal.record("10.1/imported", Outcome.IMPORTED, qid="Q1")
+        journal.record("10.1/failed", Outcome.FAILED, reason="ValueError")
+        journal.close()
+        journal = Journal(path=self.path)
+        self.assertTrue(journal.is_completed("10.1/imported"))
+        self.assertFalse(journal.is_completed("10.1/failed"))
+        self.assertEqual(journal.get_counts(), {"imported": 1, "failed": 1})
+        journal.close()
+
+    def test_merge(self):
+        shard_path = os.path.join(self.directory.name, "journal-0.sqlite")
+        shard = Journal(path=shard_path)
+        shard.record("10.1/b", Outcome.IMPORTED, qid="Q2")
+        shard.close()
+        journal = Journal(path=self.path)
+        journal.record("10.1/a", Outcome.IMPORTED, qid="Q1")
+        journal.record("10.1/b", Outcome.FAILED, reason="ValueError")
+        journal.merge(shard_path)
+        self.assertTrue(journal.is_completed("10.1/b"))
+        self.assertEqual(journal.get_outcome("10.1/b"), Outcome.IMPORTED)
+        self.assertEqual(journal.get_counts(), {"imported": 2})
+        journal.close()
+
+    def test_skip_completed(self):
+        journal = Journal(path=self.path)
+        journal.record("10.1/a", Outcome.IMPORTED, qid="Q1")
+        journal.record("10.1/c", Outcome.FAILED, reason="ValueError")
+        dois = ["10.1/a", "10.1/b", "10.1/c", "10.1/d"]
+        self.assertEqual(list(journal.skip_completed(dois, chunk_size=3)), ["10.1/b", "10.1/c", "10.1/d"])
+        journal.close()
+
+    def test_dry_run(self):
+        journal = Journal(path=self.path, dry_run=True)
+        journal.record("10.1/a", Outcome.DRY_RUN)
+        # Resuming the dry run skips the DOI
+        self.assertTrue(journal.is_completed("10.1/a"))
+        journal.close()
+        # A real run imports it
+        journal = Journal(path=self.path)
+        self.assertFalse(journal.is_completed("10.1/a"))
+        journal.close()
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from openalexbot.language_detector import LanguageDetector, script_language
+
+
+class TestLanguageDetector(TestCase):
+    def test_script_language(self):
+        self.assertEqual(script_language("日本語の論文"), "ja")
+        self.assertEqual(script_language("한국어 제목"), "ko")
+        self.assertEqual(script_language("Ελληνικά 2022"), "el")
+        # Han alone and Latin are shared by several languages
+        self.assertIsNone(script_language("中文标题"))
+        self.assertIsNone(script_language("A title"))
+
+    def test_provided_language_wins(self):
+        self.assertEqual(LanguageDetector().detect(title="A title in English", language="sv"), "sv")
+
+    def test_detection_is_deterministic(self):
+        title = "Ab initio"
+        languages = {LanguageDetector().detect(title=title) for _ in range(5)}
+        self.assertEqual(len(languages), 1)
+
+    def test_default_language_without_features(self):
+        self.assertEqual(LanguageDetector(default_language="en").detect(title="1234"), "en")
+
+    def test_detect_many_keeps_order(self):
+        titles = [
+            "Die Entwicklung der Wirtschaft in Deutschland nach dem Krieg",
+            "La economía de España en el siglo veinte",
+            "Die Entwicklung der Wirtschaft in Deutschland nach dem Krieg",
+            "Ελληνικά",
+        ]
+        self.assertEqual(LanguageDetector().detect_many(titles), ["de", "es", "de", "el"])
+
+    def test_detect_many_reuses_the_process_pool(self):
+        detector = LanguageDetector(processes=2)
+        try:
+            self.assertEqual(
+                detector.detect_many(["Die Entwicklung der Wirtschaft in Deutschland nach dem Krieg",
+                                      "La economía de España en el siglo veinte"]),
+                ["de", "es"]
+            )
+            executor = detector._executor
+            self.assertIsNotNone(executor)
+            self.assertEqual(
+                detector.detect_many(["The development of the economy after the war",
+                                      "Le développement de l'économie française après la guerre"]),
+                ["en", "fr"]
+            )
+            self.assertIs(detector._executor, executor)
+        finally:
+            detector.close()
+        self.assertIsNone(detector._executor)
@@ -0,0 +1,75 @@
+import itertools
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from openalexbot.enums import KeyType
+from openalexbot.lookup_cache import LookupCache
+
+WIKIDATA = "www.wikidata.org"
+
+
+class TestLookupCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LookupCache(
+            path=os.path.join(self.directory.name, "cache.sqlite"),
+            ttls=dict(doi=100, issn_l=100, orcid=100, other=100),
+            negative_ttl=0,
+            max_entries=10,
+        )
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_key_type(self):
+        self.assertEqual(LookupCache.key_type("10.7717/peerj.4375"), KeyType.DOI)
+        self.assertEqual(LookupCache.key_type("0000-0002-1825-009X"), KeyType.ORCID)
+        self.assertEqual(LookupCache.key_type("haswbstatement:P7363=0924-9338"), KeyType.ISSN_L)
+        self.assertEqual(LookupCache.key_type("haswbstatement:P31=Q5"), KeyType.OTHER)
+
+    def test_hit_and_miss(self):
+        result = {"query": {"search": [{"title": "Q1"}]}}
+        self.assertIsNone(self.cache.get("10.7717/peerj.4375", wikibase=WIKIDATA))
+        self.cache.set("10.7717/peerj.4375", wikibase=WIKIDATA, result=result)
+        self.assertEqual(self.cache.get("10.7717/peerj.4375", wikibase=WIKIDATA), result)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_negative_entries_expire_sooner(self):
+        self.cache.set("10.7717/missing", wikibase=WIKIDATA, result={"query": {"search": []}}, negative=True)
+        self.assertIsNone(self.cache.get("10.7717/missing", wikibase=WIKIDATA))
+
+    def test_wikibases_are_kept_apart(self):
+        self.cache.set("10.7717/peerj.4375", wikibase="test.wikidata.org",
+                       result={"query": {"search": [{"title": "Q2"}]}})
+        self.assertIsNone(self.cache.get("10.7717/peerj.4375", wikibase=WIKIDATA))
+        self.cache.set("10.7717/peerj.4375", wikibase=WIKIDATA, result={"query": {"search": [{"title": "Q1"}]}})
+        self.assertEqual(self.cache.get("10.7717/peerj.4375", wikibase="test.wikidata.org"),
+                         {"query": {"search": [{"title": "Q2"}]}})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        # Every call of time() is a second later so the order of access is unambiguous
+        with patch("openalexbot.lookup_cache.time", side_effect=itertools.count(1000)):
+            for number in range(12):
+                self.cache.set(f"10.1/{number}", wikibase=WIKIDATA, result={"query": {"search": []}})
+            # Reading the first entry makes it recently used
+            self.assertIsNotNone(self.cache.get("10.1/0", wikibase=WIKIDATA))
+            self.cache.close()
+            remaining = [number for number in range(12)
+                         if self.cache.get(f"10.1/{number}", wikibase=WIKIDATA) is not None]
+        self.assertEqual(remaining, [0] + list(range(3, 12)))
+
+    def test_cache_without_wikibase_is_started_over(self):
+        connection = sqlite3.connect(self.cache.path)
+        connection.execute("CREATE TABLE lookups (query_string TEXT PRIMARY KEY, key_type TEXT NOT NULL, "
+                           "result TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)")
+        connection.execute("INSERT INTO lookups VALUES ('10.1/1', 'doi', '{}', 1e12, 0)")
+        connection.commit()
+        connection.close()
+        self.assertIsNone(self.cache.get("10.1/1", wikibase=WIKIDATA))
+        self.cache.set("10.1/1", wikibase=WIKIDATA, result={"query": {"search": []}})
+        self.assertEqual(self.cache.get("10.1/1", wikibase=WIKIDATA), {"query": {"search": []}})
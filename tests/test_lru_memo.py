@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from openalexbot.lru_memo import MISSING, LruMemo
+
+
+class TestLruMemo(TestCase):
+    def test_get_and_set(self):
+        memo = LruMemo(max_entries=10)
+        self.assertIs(memo.get("10.1/a", MISSING), MISSING)
+        memo.set("10.1/a", None)
+        # A memoized None is not a missing entry
+        self.assertIsNone(memo.get("10.1/a", MISSING))
+        memo.set("10.1/a", "Q1")
+        self.assertEqual(memo.get("10.1/a"), "Q1")
+        self.assertEqual(len(memo), 1)
+
+    def test_least_recently_used_entries_are_forgotten(self):
+        memo = LruMemo(max_entries=3)
+        for number in range(3):
+            memo.set(number, f"Q{number}")
+        # Reading 0 makes 1 the least recently used
+        memo.get(0)
+        memo.set(3, "Q3")
+        self.assertEqual(len(memo), 3)
+        self.assertIs(memo.get(1, MISSING), MISSING)
+        self.assertEqual([memo.get(number) for number in (0, 2, 3)], ["Q0", "Q2", "Q3"])
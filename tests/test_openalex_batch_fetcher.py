@@ -0,0 +1,94 @@
+import json
+from typing import List
+from unittest import TestCase
+from unittest.mock import Mock
+
+import requests
+
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+
+
+class FakeScheduler(RequestScheduler):
+    """Answers with pages of works keyed by cursor"""
+    pages: dict
+    cursors: List[str] = []
+
+    def request(self, method, url, mediawiki=False, **kwargs):
+        cursor = kwargs["params"]["cursor"]
+        self.cursors.append(cursor)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.pages[cursor].encode()
+        return response
+
+
+def page(ids, next_cursor):
+    results = ",".join(f'{{"id": "https://openalex.org/{id}"}}' for id in ids)
+    return f'{{"meta": {{"next_cursor": "{next_cursor}"}}, "results": [{results}]}}'
+
+
+def response(data: dict) -> requests.Response:
+    response_ = requests.Response()
+    response_.status_code = 200
+    response_._content = json.dumps(data).encode()
+    return response_
+
+
+def work(id, doi):
+    return {"id": f"https://openalex.org/{id}", "ids": {"openalex": f"https://openalex.org/{id}", "doi": doi}}
+
+
+# What OpenAlex knows, with the DOIs in the case and form it returns them
+OPENALEX = {
+    "10.1/a": work("W1", "https://doi.org/10.1/A"),
+    "10.1/b": work("W2", "https://doi.org/10.1/b"),
+    "10.1/c": work("W3", "https://doi.org/10.1/C"),
+    "10.1/d": work("W4", "https://doi.org/10.1/d"),
+}
+
+
+class TestOpenAlexBatchFetcher(TestCase):
+    def __fetcher__(self) -> OpenAlexBatchFetcher:
+        def request(method, url, params=None, headers=None):
+            dois = params["filter"].replace("doi:", "").split("|")
+            return response({"results": [OPENALEX[doi.lower()] for doi in dois if doi.lower() in OPENALEX]})
+
+        self.session = Mock(spec=requests.Session)
+        self.session.request.side_effect = request
+        return OpenAlexBatchFetcher(
+            email="test@example.com",
+            chunk_size=2,
+            scheduler=RequestScheduler(rate_limiter=RateLimiter(rates={}, default_rate=1e9), session=self.session),
+        )
+
+    def test_get_works_by_dois_in_batches(self):
+        fetcher = self.__fetcher__()
+        fetcher.get_works_by_dois(["10.1/a", "10.1/b", "10.1/c", "10.1/d", "10.1/e"])
+        filters = [call.kwargs["params"]["filter"] for call in self.session.request.call_args_list]
+        self.assertEqual(filters, ["doi:10.1/a|10.1/b", "doi:10.1/c|10.1/d", "doi:10.1/e"])
+        self.assertEqual([call.kwargs["params"]["per-page"] for call in self.session.request.call_args_list],
+                         [2, 2, 1])
+
+    def test_get_works_by_dois_keys_by_normalized_doi(self):
+        fetcher = self.__fetcher__()
+        works = fetcher.get_works_by_dois(["https://doi.org/10.1/A", "10.1/c", "10.1/C", "10.1/missing"])
+        # Duplicates are asked for once and OpenAlex returns the uppercase DOIs as they are
+        self.assertEqual(self.session.request.call_count, 2)
+        self.assertEqual(sorted(works), ["10.1/a", "10.1/c"])
+        self.assertEqual(works["10.1/a"].id, "https://openalex.org/W1")
+        self.assertEqual(works["10.1/c"].id, "https://openalex.org/W3")
+        # A DOI that OpenAlex does not know is missing from the result
+        self.assertNotIn("10.1/missing", works)
+
+    def test_iterate_works_follows_the_cursor(self):
+        scheduler = FakeScheduler(
+            rate_limiter=RateLimiter(rates={}),
+            pages={"*": page(["W1", "W2"], "a"), "a": page(["W3"], "b"), "b": page([], "c")},
+        )
+        fetcher = OpenAlexBatchFetcher(email="test@example.com", scheduler=scheduler)
+        works = list(fetcher.iterate_works(filter_="from_updated_date:2022-03-01"))
+        self.assertEqual([work.id_without_prefix for work in works], ["W1", "W2", "W3"])
+        # The empty last page ends the paging
+        self.assertEqual(scheduler.cursors, ["*", "a", "b"])
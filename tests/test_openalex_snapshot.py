@@ -0,0 +1,113 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+
+from openalexbot import openalex_snapshot
+from openalexbot.openalex_snapshot import OpenAlexSnapshot
+
+
+def work(id, doi):
+    return {"id": f"https://openalex.org/{id}", "display_name": f"Work {id}", "type": "journal-article",
+            "ids": {"openalex": f"https://openalex.org/{id}", "doi": f"https://doi.org/{doi}"}}
+
+
+class TestOpenAlexSnapshot(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot_directory = os.path.join(self.directory.name, "works")
+        os.makedirs(os.path.join(self.snapshot_directory, "updated_date=2022-01-01"))
+        self.filename = os.path.join(self.snapshot_directory, "updated_date=2022-01-01", "part_000.jsonl")
+        self.snapshot = OpenAlexSnapshot(
+            path=self.snapshot_directory,
+            index_path=os.path.join(self.directory.name, "index.sqlite"),
+        )
+
+    def tearDown(self):
+        self.snapshot.close()
+        self.directory.cleanup()
+
+    def __write__(self, works, mtime, filename=None):
+        filename = filename or self.filename
+        with (gzip.open if filename.endswith(".gz") else open)(filename, "wt") as file:
+            for work_ in works:
+                file.write(json.dumps(work_) + "\n")
+        os.utime(filename, (mtime, mtime))
+
+    def test_read_works(self):
+        self.__write__([work("W1", "10.1/A"), work("W2", "10.1/B")], mtime=1000)
+        self.snapshot.build_index()
+        works = self.snapshot.get_works_by_dois(["10.1/b", "10.1/missing"])
+        self.assertEqual(list(works), ["10.1/b"])
+        self.assertEqual(works["10.1/b"].display_name, "Work W2")
+        works = self.snapshot.get_works_by_openalex_ids(["https://openalex.org/W1"])
+        self.assertEqual(works["W1"].ids.doi, "https://doi.org/10.1/A")
+
+    def test_reindex(self):
+        self.__write__([work("W1", "10.1/A"), work("W2", "10.1/B")], mtime=1000)
+        self.snapshot.build_index()
+        # The new work moves the others to other offsets and W1 is gone
+        self.__write__([work("W3", "10.1/C"), work("W2", "10.1/B")], mtime=2000)
+        self.snapshot.build_index()
+        works = self.snapshot.get_works_by_dois(["10.1/a", "10.1/b", "10.1/c"])
+        self.assertEqual(sorted(works), ["10.1/b", "10.1/c"])
+        self.assertEqual(works["10.1/b"].display_name, "Work W2")
+        self.assertEqual(works["10.1/c"].display_name, "Work W3")
+        self.assertEqual(self.snapshot.get_works_by_openalex_ids(["W2"])["W2"].display_name, "Work W2")
+        connection = self.snapshot.__connect__()
+        for table in ("dois", "openalex_ids"):
+            (orphans,) = connection.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE file_id NOT IN (SELECT id FROM files)"
+            ).fetchone()
+            self.assertEqual(orphans, 0)
+
+    def test_later_file_wins(self):
+        self.__write__([work("W1", "10.1/A")], mtime=1000)
+        newer = os.path.join(self.snapshot_directory, "updated_date=2022-02-01", "part_000.jsonl")
+        os.makedirs(os.path.dirname(newer))
+        self.__write__([dict(work("W1", "10.1/A"), display_name="Newer")], mtime=1000, filename=newer)
+        self.snapshot.build_index()
+        # Indexing the older file again does not override the newer version
+        self.__write__([work("W1", "10.1/A")], mtime=2000)
+        self.snapshot.build_index()
+        self.assertEqual(self.snapshot.get_works_by_dois(["10.1/a"])["10.1/a"].display_name, "Newer")
+
+    def test_deleted_and_resized_files_are_dropped(self):
+        self.__write__([work("W1", "10.1/A")], mtime=1000)
+        other = os.path.join(self.snapshot_directory, "updated_date=2022-01-01", "part_001.jsonl")
+        self.__write__([work("W2", "10.1/B")], mtime=1000, filename=other)
+        self.snapshot.build_index()
+        os.remove(other)
+        # Same mtime but another size
+        self.__write__([work("W3", "10.1/CCC")], mtime=1000)
+        self.snapshot.build_index()
+        self.assertEqual(sorted(self.snapshot.get_works_by_dois(["10.1/a", "10.1/b", "10.1/ccc"])), ["10.1/ccc"])
+        connection = self.snapshot.__connect__()
+        self.assertEqual(list(connection.execute("SELECT filename FROM files")), [(self.filename,)])
+        self.assertEqual(list(connection.execute("SELECT id FROM openalex_ids")), [("W3",)])
+
+    @skipIf(openalex_snapshot.indexed_gzip is None, "indexed_gzip is not installed")
+    def test_read_works_from_gzip(self):
+        filename = os.path.join(self.snapshot_directory, "updated_date=2022-01-01", "part_000.gz")
+        self.__write__([work(f"W{number}", f"10.1/{number}") for number in range(1000)], mtime=1000,
+                       filename=filename)
+        self.snapshot.build_index()
+        self.assertEqual(len(os.listdir(self.snapshot.seek_points_directory)), 1)
+        works = self.snapshot.get_works_by_openalex_ids(["W999", "W3"])
+        self.assertEqual(works["W999"].display_name, "Work W999")
+        self.assertEqual(works["W3"].display_name, "Work W3")
+        # Without its seek points the file is indexed again
+        for seek_points in os.listdir(self.snapshot.seek_points_directory):
+            os.remove(os.path.join(self.snapshot.seek_points_directory, seek_points))
+        self.snapshot.build_index()
+        self.assertEqual(len(os.listdir(self.snapshot.seek_points_directory)), 1)
+        self.assertEqual(self.snapshot.get_works_by_dois(["10.1/500"])["10.1/500"].display_name, "Work W500")
+
+    def test_gzip_needs_indexed_gzip(self):
+        filename = os.path.join(self.snapshot_directory, "updated_date=2022-01-01", "part_000.gz")
+        self.__write__([work("W1", "10.1/A")], mtime=1000, filename=filename)
+        with patch.object(openalex_snapshot, "indexed_gzip", None):
+            with self.assertRaises(ValueError):
+                self.snapshot.build_index()
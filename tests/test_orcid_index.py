@@ -0,0 +1,36 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from openalexbot import OpenAlexBot
+from openalexbot.enums import Property
+from openalexbot.orcid_index import OrcidIndex
+
+
+class TestOrcidIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = OrcidIndex(path=os.path.join(self.directory.name, "orcids.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def test_normalize(self):
+        self.assertEqual(OrcidIndex.normalize("https://orcid.org/0000-0002-1825-009x"), "0000-0002-1825-009X")
+        self.assertEqual(OrcidIndex.normalize("http://orcid.org/0000-0002-1825-0097"), "0000-0002-1825-0097")
+        self.assertEqual(OrcidIndex.normalize(" 0000-0002-1825-009x\n"), "0000-0002-1825-009X")
+
+    def test_resolve_orcids(self):
+        self.index.upsert([
+            (Property.ORCID.value, "0000-0002-1825-009X", "Q1"),
+            (Property.ORCID.value, "0000-0001-5109-3700", "Q2"),
+        ])
+        bot = OpenAlexBot(email="test@example.com", filename="unused.csv", orcid_index=self.index)
+        orcids = ["0000-0002-1825-009x", "https://orcid.org/0000-0001-5109-3700", "0000-0003-1613-5981"]
+        with patch.object(OpenAlexBot, "__resolve_qid__", return_value="Q3") as resolve_qid:
+            qids = bot.__resolve_orcids__(orcids)
+        self.assertEqual(qids, dict(zip(orcids, ["Q1", "Q2", "Q3"])))
+        # Only the miss is looked up with CirrusSearch
+        resolve_qid.assert_called_once_with(query_string="0000-0003-1613-5981", purpose="orcid")
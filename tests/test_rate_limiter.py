@@ -0,0 +1,21 @@
+from time import monotonic
+from unittest import TestCase
+
+from openalexbot.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(TestCase):
+    def test_acquire_waits_when_bucket_is_empty(self):
+        rate_limiter = RateLimiter(rates={"example.org": 20})
+        start = monotonic()
+        for _ in range(30):
+            rate_limiter.acquire("example.org")
+        # 20 tokens are available at once, the remaining 10 take about 0.5s
+        self.assertGreater(monotonic() - start, 0.4)
+
+    def test_hosts_have_separate_buckets(self):
+        rate_limiter = RateLimiter(rates={"a.example.org": 1, "b.example.org": 1})
+        start = monotonic()
+        rate_limiter.acquire("a.example.org")
+        rate_limiter.acquire("b.example.org")
+        self.assertLess(monotonic() - start, 0.5)
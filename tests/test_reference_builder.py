@@ -0,0 +1,25 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from openalexbot.enums import Property
+from openalexbot.reference_builder import ReferenceBuilder
+
+
+class TestReferenceBuilder(TestCase):
+    def test_build(self):
+        builder = ReferenceBuilder()
+        retrieved_date, stated_in, openalex_id = builder.build("https://openalex.org/A123")
+        self.assertEqual(retrieved_date.mainsnak.property_number, Property.RETRIEVED.value)
+        self.assertEqual(stated_in.mainsnak.property_number, Property.STATED_IN.value)
+        self.assertEqual(openalex_id.mainsnak.datavalue["value"], "A123")
+        self.assertEqual(builder.build("W456")[2].mainsnak.datavalue["value"], "W456")
+
+    def test_shared_claims_are_reused_until_midnight(self):
+        builder = ReferenceBuilder()
+        first = builder.build("A1")
+        second = builder.build("A2")
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[1], second[1])
+        with patch("openalexbot.reference_builder.time", return_value=builder._expires):
+            third = builder.build("A3")
+        self.assertIsNot(first[0], third[0])
@@ -0,0 +1,49 @@
+import json
+from unittest import TestCase
+
+from requests import Response
+
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+
+
+def make_response(status_code: int, body: dict = None, headers: dict = None) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+class TestRequestScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = RequestScheduler(rate_limiter=RateLimiter(rates={}))
+
+    def test_retry_after_is_honored(self):
+        reason, retry_after = self.scheduler.__retry_reason__(
+            make_response(429, headers={"Retry-After": "7"}), mediawiki=False
+        )
+        self.assertEqual(reason, "HTTP 429")
+        self.assertEqual(retry_after, 7)
+        self.assertGreaterEqual(self.scheduler.__backoff__(0, retry_after), 7)
+
+    def test_maxlag(self):
+        reason, retry_after = self.scheduler.__retry_reason__(
+            make_response(200, body={"error": {"code": "maxlag", "lag": 3}}), mediawiki=True
+        )
+        self.assertEqual(reason, "maxlag")
+        self.assertEqual(retry_after, 3)
+
+    def test_success_is_not_retried(self):
+        reason, _ = self.scheduler.__retry_reason__(
+            make_response(200, body={"query": {}}), mediawiki=True
+        )
+        self.assertIsNone(reason)
+
+    def test_slow_down_and_speed_up(self):
+        rate_limiter = RateLimiter(rates={"example.org": 10})
+        rate_limiter.slow_down("example.org")
+        self.assertEqual(rate_limiter.rate("example.org"), 5)
+        for _ in range(20):
+            rate_limiter.speed_up("example.org")
+        self.assertEqual(rate_limiter.rate("example.org"), 10)
@@ -0,0 +1,89 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from openalexbot.run_metrics import RunMetrics, StageMetrics
+
+
+class TestRunMetrics(TestCase):
+    def test_percentile_uses_nearest_rank(self):
+        stage = StageMetrics()
+        for value in range(1, 101):
+            stage.add(float(value))
+        self.assertAlmostEqual(stage.percentile(0.5), 50.0, delta=50.0 * 0.05)
+        self.assertAlmostEqual(stage.percentile(0.95), 95.0, delta=95.0 * 0.05)
+        self.assertAlmostEqual(stage.percentile(0.99), 99.0, delta=99.0 * 0.05)
+        self.assertEqual(stage.percentile(1.0), 100.0)
+        self.assertEqual(StageMetrics().percentile(0.5), 0.0)
+
+    def test_memory_does_not_grow_with_calls(self):
+        stage = StageMetrics()
+        for _ in range(100000):
+            stage.add(0.01)
+        self.assertEqual(len(stage.buckets), 1)
+        self.assertEqual(stage.count, 100000)
+
+    def test_merge(self):
+        metrics = RunMetrics()
+        metrics.record("write", 0.1)
+        shard = RunMetrics()
+        shard.record("write", 0.3, error=True)
+        # Shards write their metrics as JSON
+        metrics.merge(RunMetrics.parse_raw(shard.json()))
+        stage = metrics.to_dict()["stages"]["write"]
+        self.assertEqual((stage["count"], stage["errors"], stage["max_seconds"]), (2, 1, 0.3))
+        self.assertAlmostEqual(stage["total_seconds"], 0.4)
+
+    def test_measure_counts_errors_and_reraises(self):
+        metrics = RunMetrics()
+        with metrics.measure("write"):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.measure("write"):
+                raise ValueError("boom")
+        stage = metrics.to_dict()["stages"]["write"]
+        self.assertEqual(stage["count"], 2)
+        self.assertEqual(stage["errors"], 1)
+
+    def test_measure_leaves_out_nested_stages(self):
+        metrics = RunMetrics()
+        # prepare_claims starts at 0, langdetect runs from 1 to 3 and prepare_claims ends at 4
+        with patch("openalexbot.run_metrics.perf_counter", side_effect=[0.0, 1.0, 3.0, 4.0]):
+            with metrics.measure("prepare_claims"):
+                with metrics.measure("langdetect"):
+                    pass
+        stages = metrics.to_dict()["stages"]
+        self.assertEqual(stages["langdetect"]["total_seconds"], 2.0)
+        self.assertEqual(stages["prepare_claims"]["total_seconds"], 2.0)
+
+    def test_measure_keeps_stages_of_other_threads(self):
+        metrics = RunMetrics()
+
+        def lookup():
+            with metrics.measure("cirrussearch_doi"):
+                pass
+
+        with patch("openalexbot.run_metrics.perf_counter", side_effect=[0.0, 1.0, 3.0, 4.0]):
+            with metrics.measure("prepare_claims"):
+                thread = threading.Thread(target=lookup)
+                thread.start()
+                thread.join()
+        stages = metrics.to_dict()["stages"]
+        self.assertEqual(stages["cirrussearch_doi"]["total_seconds"], 2.0)
+        self.assertEqual(stages["prepare_claims"]["total_seconds"], 4.0)
+
+    def test_measure_iterable_times_every_item(self):
+        metrics = RunMetrics()
+        self.assertEqual(list(metrics.measure_iterable("read_csv", ["a", "b"])), ["a", "b"])
+        self.assertEqual(metrics.to_dict()["stages"]["read_csv"]["count"], 2)
+
+    def test_to_prometheus(self):
+        metrics = RunMetrics()
+        metrics.add_transfer("api.openalex.org", 1000)
+        metrics.add_transfer("api.openalex.org", 500)
+        metrics.add_cache_lookups("qid_memo", hits=3, misses=1)
+        text = metrics.to_prometheus()
+        self.assertIn('openalexbot_http_response_bytes_total{host="api.openalex.org"} 1500\n', text)
+        self.assertIn('openalexbot_http_requests_total{host="api.openalex.org"} 2\n', text)
+        self.assertIn('openalexbot_cache_lookups_total{cache="qid_memo",result="hit"} 3\n', text)
+        self.assertEqual(metrics.to_dict()["caches"]["qid_memo"]["hit_rate"], 0.75)
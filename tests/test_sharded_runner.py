@@ -0,0 +1,131 @@
+import csv
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import config
+from openalexbot import OpenAlexBot
+from openalexbot.sharded_runner import ShardedRunner, _run_shard
+
+
+class TestShardedRunner(TestCase):
+    def test_shard_of_is_stable(self):
+        shard = ShardedRunner.shard_of("10.7717/peerj.4375", 8)
+        self.assertIn(shard, range(8))
+        self.assertEqual(ShardedRunner.shard_of("10.7717/peerj.4375", 8), shard)
+
+    def test_split_writes_every_doi_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dois.csv")
+            with open(filename, "w") as file:
+                file.write("doi\n" + "".join(f"https://doi.org/10.1/{number}\n" for number in range(100)))
+                file.write("10.1/0\n")
+            runner = ShardedRunner(
+                email="test@example.com",
+                filename=filename,
+                shards=3,
+                work_directory=os.path.join(directory, "shards"),
+            )
+            with patch.object(config, "journal_enabled", False):
+                runner.split()
+            dois = []
+            for index in range(3):
+                with open(os.path.join(directory, "shards", f"shard-{index}.csv")) as file:
+                    shard_dois = [row["doi"] for row in csv.DictReader(file)]
+                self.assertTrue(all(ShardedRunner.shard_of(doi, 3) == index for doi in shard_dois))
+                dois.extend(shard_dois)
+            self.assertEqual(sorted(dois), sorted(f"10.1/{number}" for number in range(100)))
+
+    def test_split_refuses_shards_of_another_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            work_directory = os.path.join(directory, "shards")
+            filename = os.path.join(directory, "dois.csv")
+            with open(filename, "w") as file:
+                file.write("doi\n10.1/a\n")
+            with patch.object(config, "journal_enabled", False):
+                ShardedRunner(email="test@example.com", filename=filename, shards=2,
+                              work_directory=work_directory).split()
+                # The same CSV reuses the split
+                ShardedRunner(email="test@example.com", filename=filename, shards=2,
+                              work_directory=work_directory).split()
+                with self.assertRaises(ValueError):
+                    ShardedRunner(email="test@example.com", filename=filename, shards=3,
+                                  work_directory=work_directory).split()
+                with open(filename, "w") as file:
+                    file.write("doi\n10.1/b\n")
+                with self.assertRaises(ValueError):
+                    ShardedRunner(email="test@example.com", filename=filename, shards=2,
+                                  work_directory=work_directory).split()
+
+    def test_hash_of_the_csv_is_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dois.csv")
+            with open(filename, "w") as file:
+                file.write("doi\n10.1/a\n")
+            runner = ShardedRunner(email="test@example.com", filename=filename, shards=2,
+                                   work_directory=os.path.join(directory, "shards"))
+            digest = runner.__source__()["blake2b"]
+            with open(runner.hash_cache_path) as file:
+                hashes = json.load(file)
+            hashes[os.path.abspath(filename)]["blake2b"] = "cached"
+            with open(runner.hash_cache_path, "w") as file:
+                json.dump(hashes, file)
+            # The unchanged CSV is not read again
+            self.assertEqual(runner.__source__()["blake2b"], "cached")
+            os.utime(filename, (1000, 1000))
+            self.assertEqual(runner.__source__()["blake2b"], digest)
+
+    def test_run_slices_every_rate(self):
+        submitted = []
+
+        class Executor:
+            def __init__(self, **kwargs):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def submit(self, function, *args):
+                submitted.append(args)
+                return Executor
+
+            @staticmethod
+            def result():
+                return None
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dois.csv")
+            with open(filename, "w") as file:
+                file.write("doi\n10.1/a\n")
+            runner = ShardedRunner(email="test@example.com", filename=filename, shards=2,
+                                   work_directory=os.path.join(directory, "shards"), shard_indexes=[0, 1])
+            with patch.object(config, "journal_enabled", False), \
+                    patch.object(config, "openalex_snapshot_path", None), \
+                    patch.object(config, "doi_index_path", None), \
+                    patch.object(config, "rate_limits", {"api.openalex.org": 10}), \
+                    patch.object(config, "default_rate_limit", 1.0), \
+                    patch("openalexbot.sharded_runner.ProcessPoolExecutor", Executor):
+                runner.run()
+        self.assertEqual([args[-2:] for args in submitted], [({"api.openalex.org": 5}, 0.5)] * 2)
+
+    def test_shard_uses_its_default_rate(self):
+        def start(bot):
+            limiter = bot.__get_scheduler__().rate_limiter
+            self.assertEqual(limiter.ceiling("api.crossref.org"), 0.5)
+            self.assertEqual(limiter.ceiling("api.openalex.org"), 5)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.multiple(config, rate_limits=config.rate_limits, default_rate_limit=config.default_rate_limit,
+                               streaming_csv=config.streaming_csv, journal_enabled=config.journal_enabled,
+                               journal_path=config.journal_path, export_path=config.export_path,
+                               cache_path=config.cache_path, metrics_json_path=config.metrics_json_path,
+                               metrics_prometheus_path=config.metrics_prometheus_path,
+                               press_enter_to_continue=config.press_enter_to_continue), \
+                patch.object(OpenAlexBot, "start", autospec=True, side_effect=start) as start_:
+            _run_shard("test@example.com", directory, 0, 2, {"api.openalex.org": 5}, 0.5)
+        self.assertEqual(start_.call_count, 1)
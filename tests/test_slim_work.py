@@ -0,0 +1,76 @@
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from wikibaseintegrator import WikibaseIntegrator
+
+from openalexbot import OpenAlexBot
+from openalexbot.enums import Property
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+from openalexbot.slim_work import SlimWork
+
+WORK = {
+    "id": "https://openalex.org/W2741809807",
+    "display_name": "The state of OA",
+    "title": "The state of OA",
+    "publication_year": 2018,
+    "publication_date": "2018-02-13",
+    "type": "journal-article",
+    "ids": {"openalex": "https://openalex.org/W2741809807", "doi": "https://doi.org/10.7717/peerj.4375"},
+    "host_venue": {"issn_l": "2167-8359", "display_name": "PeerJ"},
+    "biblio": {"volume": "6", "issue": None, "first_page": "e4375", "last_page": "e4375"},
+    "authorships": [{
+        "author_position": "first",
+        "author": {"id": "https://openalex.org/A1", "display_name": "Heather Piwowar",
+                   "orcid": "https://orcid.org/0000-0003-1613-5981"},
+        "institutions": [{"display_name": "Impactstory"}],
+    }],
+    "concepts": [{"id": "https://openalex.org/C1", "display_name": "Citation",
+                  "wikidata": "https://www.wikidata.org/wiki/Q1713", "score": 0.5}],
+    "referenced_works": ["https://openalex.org/W2"],
+    "abstract_inverted_index": {"Despite": [0]},
+}
+
+
+class EmptyFetcher(OpenAlexBatchFetcher):
+    def get_works_by_openalex_ids(self, ids):
+        return {}
+
+
+class TestSlimWork(TestCase):
+    def test_parse(self):
+        work = SlimWork.parse(json.dumps(WORK).encode())
+        self.assertEqual(work.id_without_prefix, "W2741809807")
+        self.assertEqual(work.type, "journal-article")
+        self.assertEqual(work.ids.doi, "https://doi.org/10.7717/peerj.4375")
+        self.assertEqual(work.host_venue.issn_l, "2167-8359")
+        self.assertEqual(work.biblio.first_page, "e4375")
+        self.assertIsNone(work.biblio.issue)
+        self.assertEqual(work.authorships[0].author.orcid_id, "0000-0003-1613-5981")
+        self.assertEqual(work.concepts[0].wikidata_id, "Q1713")
+        self.assertEqual(work.referenced_works, ["https://openalex.org/W2"])
+        self.assertFalse(hasattr(work, "__dict__"))
+
+    def test_missing_fields(self):
+        work = SlimWork({"id": "https://openalex.org/W1"})
+        self.assertIsNone(work.ids.doi)
+        self.assertIsNone(work.host_venue.issn_l)
+        self.assertEqual(work.authorships, [])
+        self.assertIsNone(work.language)
+
+    def test_prepare_new_item(self):
+        work = SlimWork.parse(json.dumps(WORK).encode())
+        bot = OpenAlexBot(email="test@example.com", fetcher=EmptyFetcher(email="test@example.com"))
+        with patch.object(OpenAlexBot, "__resolve_qid__", return_value="Q5"):
+            item = bot.__prepare_new_item__(doi="10.7717/peerj.4375", work=work, wbi=WikibaseIntegrator())
+        self.assertEqual(item.labels.get("en").value, "The state of OA")
+        self.assertEqual(item.descriptions.get("en").value, "scientific article from 2018")
+
+        def values(property: Property):
+            return [claim.mainsnak.datavalue["value"] for claim in item.claims.get(property.value)]
+
+        self.assertEqual(values(Property.INSTANCE_OF)[0]["id"], "Q13442814")
+        self.assertEqual(values(Property.AUTHOR)[0]["id"], "Q5")
+        self.assertEqual(values(Property.MAIN_SUBJECT)[0]["id"], "Q1713")
+        self.assertEqual(values(Property.PUBLISHED_IN)[0]["id"], "Q5")
+        self.assertEqual(values(Property.DOI), ["10.7717/peerj.4375"])
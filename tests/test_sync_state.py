@@ -0,0 +1,93 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import List
+from unittest import TestCase
+from unittest.mock import patch
+
+import config
+from openalexbot import OpenAlexBot
+from openalexbot.enums import Outcome
+from openalexbot.journal import Journal
+from openalexbot.openalex_batch_fetcher import OpenAlexBatchFetcher
+from openalexbot.slim_work import SlimWork
+from openalexbot.sync_state import SyncState
+
+
+class FakeFetcher(OpenAlexBatchFetcher):
+    works: List[SlimWork] = []
+    filters: List[str] = []
+
+    def iterate_works(self, filter_: str, per_page: int = 200):
+        self.filters.append(filter_)
+        yield from self.works
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+def work(id, doi):
+    return SlimWork({"id": f"https://openalex.org/{id}", "ids": {"doi": f"https://doi.org/{doi}"}})
+
+
+class TestSyncState(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sync_state.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        state = SyncState(path=self.path)
+        self.assertIsNone(state.load())
+        self.assertEqual(state.load_failed_dois(), [])
+        state.save("2022-03-01")
+        state.save("2022-03-02", failed_dois=["10.1/a"])
+        self.assertEqual(SyncState(path=state.path).load(), "2022-03-02")
+        self.assertEqual(SyncState(path=state.path).load_failed_dois(), ["10.1/a"])
+
+    def __sync__(self, works: List[SlimWork], failing_dois: List[str], since: str) -> List[List[str]]:
+        """Runs a sync where the given DOIs fail and returns the DOIs of every __process_dois__ call"""
+        bot = OpenAlexBot(
+            email="test@example.com",
+            fetcher=FakeFetcher(email="test@example.com", works=works),
+            journal=Journal(path=os.path.join(self.directory.name, "journal.sqlite")),
+        )
+        calls = []
+
+        def process_dois(dois, skip_completed=True):
+            self.assertFalse(skip_completed)
+            self.assertTrue(bot.__updates_existing_items__())
+            calls.append(list(dois))
+            for doi in calls[-1]:
+                if doi in failing_dois:
+                    bot.__handle_failure__(doi=doi, error=ValueError("boom"))
+                else:
+                    bot.__record__(doi=doi, outcome=Outcome.IMPORTED, qid="Q1")
+
+        with patch.object(OpenAlexBot, "__process_dois__", side_effect=process_dois), \
+                patch.object(config, "sync_state_path", self.path), \
+                patch.object(config, "sync_start_date", "2022-03-01"), \
+                patch.object(config, "update_existing_items", False), \
+                patch.object(config, "metrics_json_path", None), \
+                patch.object(config, "metrics_prometheus_path", None):
+            bot.sync()
+            # Later runs do not update existing items unless the config says so
+            self.assertFalse(config.update_existing_items)
+            self.assertFalse(bot.__updates_existing_items__())
+        self.assertEqual(bot.fetcher.filters, [f"from_updated_date:{since}"])
+        return calls
+
+    def test_sync_retries_failed_works(self):
+        today = datetime.now(timezone.utc).date().isoformat()
+        calls = self.__sync__(works=[work("W1", "10.1/a"), work("W2", "10.1/b")], failing_dois=["10.1/b"],
+                              since="2022-03-01")
+        self.assertEqual(calls, [["10.1/a", "10.1/b"]])
+        state = SyncState(path=self.path)
+        self.assertEqual(state.load(), today)
+        self.assertEqual(state.load_failed_dois(), ["10.1/b"])
+        # The next sync starts at the new mark and retries the failed work first
+        calls = self.__sync__(works=[work("W3", "10.1/c")], failing_dois=[], since=today)
+        self.assertEqual(calls, [["10.1/b"], ["10.1/c"]])
+        self.assertEqual(state.load_failed_dois(), [])
@@ -0,0 +1,40 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from openalexbot.venue_index import VenueIndex
+
+
+class TestVenueIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = VenueIndex(path=os.path.join(self.directory.name, "venues.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def test_build_from_dump(self):
+        entity = {
+            "id": "Q15716652",
+            "claims": {
+                "P7363": [{"rank": "normal", "mainsnak": {"datavalue": {"value": "0924-9338"}}}],
+                "P236": [{"rank": "normal", "mainsnak": {"datavalue": {"value": "1778-3585"}}}],
+            },
+        }
+        filename = os.path.join(self.directory.name, "dump.json.gz")
+        with gzip.open(filename, "wt") as file:
+            file.write(f"[\n{json.dumps(entity)},\n{json.dumps({'id': 'Q1', 'claims': {}})}\n]\n")
+        self.assertEqual(self.index.build_from_dump(filename), 2)
+        self.assertEqual(self.index.get("0924-9338"), "Q15716652")
+        self.assertEqual(self.index.get("1778-3585"), "Q15716652")
+        self.assertIsNone(self.index.get("0000-0000"))
+
+    def test_build_from_export(self):
+        filename = os.path.join(self.directory.name, "issn_l.tsv")
+        with open(filename, "w") as file:
+            file.write('?item\t?value\n<http://www.wikidata.org/entity/Q15716652>\t"0924-9338"\n')
+        self.index.build_from_export(filename, property_="P7363")
+        self.assertEqual(self.index.get_many(["0924-9338", "0000-0000"]), {"0924-9338": "Q15716652"})
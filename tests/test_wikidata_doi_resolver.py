@@ -0,0 +1,76 @@
+from typing import List
+from unittest import TestCase
+from unittest.mock import patch
+
+from wikibaseintegrator import WikibaseIntegrator
+
+import config
+from openalexbot import OpenAlexBot
+from openalexbot.rate_limiter import RateLimiter
+from openalexbot.request_scheduler import RequestScheduler
+from openalexbot.wikidata_doi_resolver import WikidataDoiResolver
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+class FakeScheduler(RequestScheduler):
+    """Answers every query with the items of the DOIs in Wikidata"""
+    items: dict
+    queries: List[str] = []
+
+    def request(self, method, url, data=None, headers=None):
+        self.queries.append(data["query"])
+        bindings = [
+            {"doi": {"value": doi}, "item": {"value": f"http://www.wikidata.org/entity/{qid}"}}
+            for doi, qid in self.items.items() if f'"{doi}"' in data["query"]
+        ]
+        return FakeResponse({"results": {"bindings": bindings}})
+
+
+class TestWikidataDoiResolver(TestCase):
+    def test_build_query(self):
+        query = WikidataDoiResolver().__build_query__(["10.1/ab\"c"])
+        self.assertIn('"10.1/AB\\"C" "10.1/ab\\"c"', query)
+        self.assertIn("wdt:P356 ?doi", query)
+
+    def test_get_qids(self):
+        scheduler = FakeScheduler(rate_limiter=RateLimiter(rates={}), items={"10.1/ABC": "Q1", "10.2/def": "Q2"})
+        resolver = WikidataDoiResolver(chunk_size=2, scheduler=scheduler)
+        qids = resolver.get_qids(["https://doi.org/10.1/abc", "10.2/DEF", "10.3/ghi"])
+        # Both cases are asked for and the result is keyed by the normalized DOI
+        self.assertEqual(qids, {"10.1/abc": "Q1", "10.2/def": "Q2"})
+        self.assertEqual(len(scheduler.queries), 2)
+
+    def test_process_dois(self):
+        scheduler = FakeScheduler(rate_limiter=RateLimiter(rates={}), items={"10.1/A": "Q1"})
+        bot = OpenAlexBot(email="test@example.com", scheduler=scheduler, wbi=WikibaseIntegrator())
+        fetched = []
+
+        def search(query_string, purpose="doi"):
+            # Only CirrusSearch finds the DOI that Wikidata has in mixed case
+            return "Q2" if query_string == "10.1/mixed" else None
+
+        with patch.object(config, "use_test_wikidata", False), \
+                patch.object(config, "wikidata_resolver_cirrussearch_fallback", True), \
+                patch.object(config, "wikidata_resolver_batch_size", 2), \
+                patch.object(config, "openalex_batch_size", 1), \
+                patch.object(config, "pipeline_enabled", False), \
+                patch.object(config, "journal_enabled", False), \
+                patch.object(config, "doi_index_path", None), \
+                patch.object(config, "update_existing_items", False), \
+                patch.object(OpenAlexBot, "__resolve_qid__", side_effect=search) as resolve_qid, \
+                patch.object(OpenAlexBot, "__fetch_works__", side_effect=lambda dois: fetched.append(dois) or []):
+            bot.__process_dois__(dois=iter(["10.1/a", "10.1/mixed", "10.1/b", "10.1/c"]))
+        # Two SPARQL queries of two DOIs each, then one OpenAlex chunk per missing DOI
+        self.assertEqual(len(scheduler.queries), 2)
+        self.assertEqual(sorted(call.args[0] for call in resolve_qid.call_args_list),
+                         ["10.1/b", "10.1/c", "10.1/mixed"])
+        self.assertEqual(fetched, [["10.1/b"], ["10.1/c"]])
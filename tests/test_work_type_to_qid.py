@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from openalexbot.slim_work import SlimWork
+from openalexbot.work_type_to_qid import WORK_TYPES, WorkTypeToQid, is_supported
+
+
+def work(type_, publication_year=2020):
+    return SlimWork({"id": "https://openalex.org/W1", "type": type_, "publication_year": publication_year})
+
+
+class TestWorkTypeToQid(TestCase):
+    def test_get_qid(self):
+        self.assertEqual(WorkTypeToQid(work=work("journal-article")).get_qid(), "Q13442814")
+        self.assertEqual(WorkTypeToQid(work=work("book-chapter")).get_qid(), "Q21481766")
+        self.assertEqual(WorkTypeToQid(work=work("posted-content")).get_qid(), "Q580922")
+
+    def test_get_description(self):
+        self.assertEqual(WorkTypeToQid(work=work("journal-article")).get_description(),
+                         "scientific article from 2020")
+        self.assertEqual(WorkTypeToQid(work=work("dataset", publication_year=None)).get_description(), "dataset")
+
+    def test_unsupported(self):
+        self.assertFalse(is_supported(work("journal-issue")))
+        self.assertFalse(is_supported(work("not-a-type")))
+        self.assertTrue(is_supported(work("proceedings-article")))
+        with self.assertRaises(ValueError):
+            WorkTypeToQid(work=work("journal-issue")).get_qid()
+
+    def test_mappings(self):
+        for mapping in WORK_TYPES.values():
+            if mapping is not None:
+                self.assertRegex(mapping.qid, r"^Q\d+$")